@@ -0,0 +1,27 @@
+# Compute backends evaluate a simulated drawable's forces (e.g. SpringMassGridSquare.force()) and may fuse
+# them with an integrator step. They read the model's state and parameters and write into its workspace.
+import numpy as np
+
+
+class BaseBackend:
+    name: str = "base"
+
+    def force(self, model) -> np.ndarray:
+        """ Total force (V, 3) with fixed vertices clamped - a workspace array, overwritten by the next call """
+        ...
+
+    def explicit_euler_step(self, model, dt: float) -> np.ndarray:
+        """
+        v' = v + dt * f(x, v) / m, then x' = x + dt * v', in place on the model. Returns the force used.
+        Backends that can fuse the force with the update override this.
+        """
+        force = model.force()
+        np.divide(force, model.mass, out=model.acceleration)
+        increment = model.workspace.array("integrator_increment", model.velocity.shape)  # V, 3
+        np.add(model.velocity, np.multiply(dt, model.acceleration, out=increment), out=model.velocity)
+        np.add(model.vertices, np.multiply(dt, model.velocity, out=increment), out=model.vertices)
+        return force
+
+    def close(self) -> None:
+        """ Releases threads or other resources the backend holds """
+        ...
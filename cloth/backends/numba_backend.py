@@ -0,0 +1,129 @@
+import logging
+import numpy as np
+from typing import List, Optional, Tuple
+from cloth.force_field.base_field import BaseField
+from cloth.force_field.composite_field import CompositeField
+from cloth.force_field.modulated_field import ModulatedField
+from cloth.force_field.wind_cylinder_field import WindCylinderField
+from .base_backend import BaseBackend
+
+
+logger = logging.getLogger(__name__)
+
+
+class NumbaBackend(BaseBackend):
+    """
+    Gravity, damping, wind cylinders and springs fused into one compiled kernel (two passes: vertices, then
+    springs), and explicit Euler fused on top of it. Kernels are compiled on first use and cached on disk.
+
+    WindCylinderFields, also inside CompositeFields and ModulatedFields, are evaluated in the kernel; any other
+    field is accumulated with NumPy first and passed in as an extra force. Parameters (mass, damping, springs,
+    fixed vertices) are read on the first step: topology and parameters are fixed for the lifetime of the model.
+    Raises ImportError when numba is not installed - cloth.backends.registry.make_backend falls back to NumPy.
+    """
+    name: str = "numba"
+
+    def __init__(self):
+        from cloth.backends import numba_kernels
+        self.kernels = numba_kernels
+        self.gravity = None
+        self.wind_key = None
+
+    def prepare(self, model) -> None:
+        # imported here: the drawable itself imports the backends
+        from cloth.drawables.spring_mass_grid_square import _EPSILON
+        self.epsilon = _EPSILON
+        n_vertices = model.vertices.shape[0]
+        # the batched engine keeps per-vertex gravity and damping, a single cloth per-cloth scalars
+        gravity = getattr(model, "gravity", None)
+        if gravity is None:
+            gravity = model.mass * model.gravity_coefficient
+        self.gravity = np.ascontiguousarray(gravity[:, 0], dtype=np.float32)  # V
+        damping = np.asarray(model.damping_force_coefficient, dtype=np.float32).reshape(-1)
+        self.damping = np.ascontiguousarray(np.broadcast_to(damping, (n_vertices,)))  # V
+        self.fixed_vertices = np.asarray(model.fixed_vertices, dtype=np.int64)  # F
+        self.spring_end_points = np.ascontiguousarray(model.spring_end_points, dtype=np.int64)  # S, 2
+        self.no_extra_force = np.zeros((0, 3), dtype=np.float32)
+
+    @staticmethod
+    def wind_sources(model) -> List[Tuple[BaseField, Optional[np.ndarray]]]:
+        """ (field, vertex indices or None for all) """
+        sources = getattr(model, "wind_fields", None)  # the batched engine's
+        if sources is None:
+            sources = [] if model.wind_field is None else [(model.wind_field, None)]
+        return sources
+
+    @staticmethod
+    def flatten_cylinders(field: BaseField, t: Optional[float], scale: float, out: List[Tuple[WindCylinderField, float]]) -> bool:
+        """ Appends (cylinder, coefficient scale) for every cylinder `field` sums; False if it is anything else """
+        if isinstance(field, WindCylinderField):
+            out.append((field, scale))
+            return True
+        if isinstance(field, CompositeField):
+            return all(NumbaBackend.flatten_cylinders(child, t, scale, out) for child in field.fields)
+        if isinstance(field, ModulatedField) and t is not None:
+            return NumbaBackend.flatten_cylinders(field.field, t, scale * field.schedule.sample(t), out)
+        return False
+
+    def wind_arguments(self, model) -> Tuple[np.ndarray, ...]:
+        """ Kernel arguments: cylinder origins, directions, radii, coefficients, lengths and the extra force """
+        cylinders = []
+        others = []
+        for field, indices in self.wind_sources(model):
+            flat = []
+            if indices is None and self.flatten_cylinders(field, model.t, 1.0, flat):
+                cylinders.extend(flat)
+            else:
+                others.append((field, indices))
+
+        key = tuple(id(cylinder) for cylinder, _ in cylinders)
+        if key != self.wind_key:
+            self.wind_key = key
+            self.wind_origins = np.array([cylinder.origin for cylinder, _ in cylinders], dtype=np.float32).reshape(-1, 3)  # W, 3
+            self.wind_directions = np.array([cylinder.direction for cylinder, _ in cylinders], dtype=np.float32).reshape(-1, 3)  # W, 3
+            self.wind_radii = np.array([cylinder.radius for cylinder, _ in cylinders], dtype=np.float32)  # W
+            self.wind_lengths = np.array(
+                [-1.0 if cylinder.length is None else cylinder.length for cylinder, _ in cylinders], dtype=np.float32,
+            )  # W
+            self.wind_coefficients = np.empty(len(cylinders), dtype=np.float32)  # W
+        # schedules change the coefficients from step to step
+        for w, (cylinder, scale) in enumerate(cylinders):
+            self.wind_coefficients[w] = scale * cylinder.coefficient
+
+        extra_force = self.no_extra_force
+        if others:
+            extra_force = model.workspace.array("backend_extra_force", model.vertices.shape)  # V, 3
+            extra_force.fill(0)
+            for field, indices in others:
+                if indices is None:
+                    field.accumulate(model.vertices, model.t, extra_force, model.workspace)
+                else:
+                    extra_force[indices] += field.evaluate(model.vertices[indices], model.t)
+        return self.wind_origins, self.wind_directions, self.wind_radii, self.wind_coefficients, self.wind_lengths, extra_force
+
+    def force_arguments(self, model) -> Tuple:
+        if self.gravity is None:
+            self.prepare(model)
+        return (
+            self.gravity,
+            self.damping,
+            self.spring_end_points,
+            model.spring_resting_lengths,
+            model.spring_stiffness,
+            self.fixed_vertices,
+            *self.wind_arguments(model),
+            self.epsilon,
+            model.workspace.array("backend_spring_sums", model.vertices.shape, np.float64),  # V, 3
+            model.workspace.array("force", model.vertices.shape),  # V, 3
+        )
+
+    def force(self, model) -> np.ndarray:
+        arguments = self.force_arguments(model)
+        self.kernels.accumulate_forces(model.vertices, model.velocity, *arguments)
+        return arguments[-1]
+
+    def explicit_euler_step(self, model, dt: float) -> np.ndarray:
+        arguments = self.force_arguments(model)
+        # float32 like NumPy's dt * acceleration
+        self.kernels.explicit_euler(model.vertices, model.velocity, model.acceleration, model.mass, *arguments, np.float32(dt))
+        return arguments[-1]
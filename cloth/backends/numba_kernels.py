@@ -0,0 +1,103 @@
+""" Fused force and explicit Euler kernels, compiled by Numba (an optional dependency: import this lazily). """
+import math
+import numba
+
+
+@numba.njit(cache=True)
+def cylinder_falloff(x, y, z, origin, direction, radius, length):
+    """ WindCylinderField's 3 (1 - u)^2 - 2 (1 - u)^3 at one point, 0 outside the cylinder """
+    dx, dy, dz = x - origin[0], y - origin[1], z - origin[2]
+    along = dx * direction[0] + dy * direction[1] + dz * direction[2]
+    if length >= 0.0 and (along < 0.0 or along > length):
+        return 0.0
+    rx = dx - direction[0] * along
+    ry = dy - direction[1] * along
+    rz = dz - direction[2] * along
+    u = min(math.sqrt(rx * rx + ry * ry + rz * rz) / radius, 1.0)
+    falloff = 1.0 - u
+    return 3.0 * falloff * falloff - 2.0 * falloff * falloff * falloff
+
+
+@numba.njit(cache=True)
+def accumulate_forces(
+    vertices,  # V, 3
+    velocity,  # V, 3
+    gravity,  # V
+    damping,  # V
+    spring_end_points,  # S, 2
+    spring_resting_lengths,  # S, 1
+    spring_stiffness,  # S, 1
+    fixed_vertices,  # F
+    wind_origins,  # W, 3
+    wind_directions,  # W, 3
+    wind_radii,  # W
+    wind_coefficients,  # W
+    wind_lengths,  # W, < 0 for infinite cylinders
+    extra_force,  # V, 3 or 0, 3: forces evaluated elsewhere (e.g. fields the kernel doesn't know)
+    epsilon,
+    spring_sums,  # V, 3 float64 scratch
+    force,  # V, 3 out
+):
+    """ Gravity, damping and wind in one pass over vertices, springs in one pass over springs """
+    n_vertices = vertices.shape[0]
+    for v in range(n_vertices):
+        force[v, 0] = -damping[v] * velocity[v, 0]
+        force[v, 1] = -gravity[v] - damping[v] * velocity[v, 1]
+        force[v, 2] = -damping[v] * velocity[v, 2]
+        for w in range(wind_radii.shape[0]):
+            magnitude = wind_coefficients[w] * cylinder_falloff(
+                vertices[v, 0], vertices[v, 1], vertices[v, 2], wind_origins[w], wind_directions[w], wind_radii[w], wind_lengths[w],
+            )
+            for k in range(3):
+                force[v, k] += magnitude * wind_directions[w, k]
+        if extra_force.shape[0] > 0:
+            for k in range(3):
+                force[v, k] += extra_force[v, k]
+        for k in range(3):
+            spring_sums[v, k] = 0.0
+
+    # springs are summed in float64 like IncidenceOperator.matmul, then rounded once
+    for s in range(spring_end_points.shape[0]):
+        i, j = spring_end_points[s, 0], spring_end_points[s, 1]
+        dx = vertices[j, 0] - vertices[i, 0]
+        dy = vertices[j, 1] - vertices[i, 1]
+        dz = vertices[j, 2] - vertices[i, 2]
+        length = math.sqrt(dx * dx + dy * dy + dz * dz)
+        change = length - spring_resting_lengths[s, 0]
+        # coinciding end points exert no force, as in spring_force_vectors
+        if abs(change) <= epsilon or length == 0.0:
+            continue
+        magnitude = spring_stiffness[s, 0] * change / length
+        spring_sums[i, 0] += magnitude * dx
+        spring_sums[i, 1] += magnitude * dy
+        spring_sums[i, 2] += magnitude * dz
+        spring_sums[j, 0] -= magnitude * dx
+        spring_sums[j, 1] -= magnitude * dy
+        spring_sums[j, 2] -= magnitude * dz
+
+    for v in range(n_vertices):
+        for k in range(3):
+            force[v, k] += spring_sums[v, k]
+    for f in range(fixed_vertices.shape[0]):
+        for k in range(3):
+            force[fixed_vertices[f], k] = 0.0
+
+
+@numba.njit(cache=True)
+def explicit_euler(
+    vertices, velocity, acceleration, mass, gravity, damping, spring_end_points, spring_resting_lengths, spring_stiffness,
+    fixed_vertices, wind_origins, wind_directions, wind_radii, wind_coefficients, wind_lengths, extra_force, epsilon,
+    spring_sums, force, dt,
+):
+    """ accumulate_forces, then v += dt * f / m and x += dt * v in one more pass over vertices """
+    accumulate_forces(
+        vertices, velocity, gravity, damping, spring_end_points, spring_resting_lengths, spring_stiffness,
+        fixed_vertices, wind_origins, wind_directions, wind_radii, wind_coefficients, wind_lengths, extra_force, epsilon,
+        spring_sums, force,
+    )
+    for v in range(vertices.shape[0]):
+        for k in range(3):
+            acceleration[v, k] = force[v, k] / mass[v, 0]
+            velocity[v, k] += dt * acceleration[v, k]
+            vertices[v, k] += dt * velocity[v, k]
+
@@ -0,0 +1,17 @@
+import numpy as np
+from .base_backend import BaseBackend
+
+
+class NumpyBackend(BaseBackend):
+    """
+    The reference backend: vectorized NumPy passes over vertices and springs, temporaries in the model's workspace.
+    Every other backend is checked against this one (python -m cloth.backends.parity).
+    """
+    name: str = "numpy"
+
+    def force(self, model) -> np.ndarray:
+        force = model.external_force()  # V, 3
+        np.add(force, model.spring_force(), out=force)
+        # clamp fixed vertices
+        force[model.fixed_vertices, :] = 0
+        return force
@@ -0,0 +1,33 @@
+import logging
+from typing import Any, Dict, Optional, Type
+from .base_backend import BaseBackend
+from .numpy_backend import NumpyBackend
+from .numba_backend import NumbaBackend
+from .threaded_backend import ThreadedBackend
+
+
+logger = logging.getLogger(__name__)
+
+
+BackendRegistry: Dict[str, Type[BaseBackend]] = {
+    "numpy": NumpyBackend,
+    "numba": NumbaBackend,
+    "threaded": ThreadedBackend,
+}
+
+
+def make_backend(name: str = "numpy", backend_kwargs: Optional[Dict[str, Any]] = None) -> BaseBackend:
+    """ BackendRegistry[name](**backend_kwargs), or the NumPy reference backend if an optional dependency is missing """
+    try:
+        return BackendRegistry[name](**(backend_kwargs or {}))
+    except ImportError as error:
+        logger.warning(f"The {name} backend is unavailable ({error}), falling back to numpy")
+        return NumpyBackend()
+
+
+def with_threads(model_kwargs: Dict[str, Any], n_threads: int) -> Dict[str, Any]:
+    """ model_kwargs switched to the threaded backend on n_threads threads (unchanged for a single thread) """
+    if n_threads <= 1:
+        return model_kwargs
+    backend_kwargs = {**model_kwargs.get("backend_kwargs", {}), "n_threads": n_threads}
+    return {**model_kwargs, "backend": "threaded", "backend_kwargs": backend_kwargs}
@@ -0,0 +1,73 @@
+""" Thread scaling of the threaded backend: update() time, speedup and parallel efficiency per thread count.
+python -m cloth.backends.scaling --threads 1 2 4 8 16 --sizes 200 400
+"""
+import os
+import argparse
+import json
+import logging
+from typing import Any, Dict, List
+from cloth.benchmark import environment, time_case
+from cloth.simulate import make_model
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", help="Thread counts to time", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--sizes", type=int, nargs="+", help="Grid points per side", default=[200, 400])
+    parser.add_argument("--min_repeats", type=int, help="Timed steps per case at least", default=5)
+    parser.add_argument("--max_repeats", type=int, help="Timed steps per case at most", default=100)
+    parser.add_argument("--min_seconds", type=float, help="Keep stepping a case until it ran this long in total", default=1.0)
+    parser.add_argument("--output", type=str, help="Save the report as json here", default=None)
+    parser.add_argument("--log_level", type=str, help="Python logging level (results are always logged)", default="WARNING")
+    return parser
+
+
+def time_update(n: int, model_kwargs: Dict[str, Any], min_repeats: int, max_repeats: int, min_seconds: float) -> float:
+    model = make_model(n_points_per_side=n, **model_kwargs)
+    timing = time_case(((lambda t: model.update(t)), (lambda: model.t + 0.01)), min_repeats, max_repeats, min_seconds)
+    model.backend.close()
+    return timing["min_seconds"]
+
+
+def run(threads: List[int], sizes: List[int], min_repeats: int = 5, max_repeats: int = 100, min_seconds: float = 1.0) -> Dict[str, Any]:
+    """
+    speedup = (threaded backend on 1 thread) / (on k threads), efficiency = speedup / k. The NumPy backend's
+    time is reported next to them: the threaded backend on one thread only adds dispatch overhead to it.
+    """
+    results = []
+    for n in sizes:
+        numpy_seconds = time_update(n, {"backend": "numpy"}, min_repeats, max_repeats, min_seconds)
+        single_thread_seconds = None
+        # one thread is always timed first, it is what speedups are relative to
+        for n_threads in sorted(set(threads) | {1}):
+            seconds = time_update(n, {"backend": "threaded", "backend_kwargs": {"n_threads": n_threads}}, min_repeats, max_repeats, min_seconds)
+            single_thread_seconds = single_thread_seconds or seconds
+            speedup = single_thread_seconds / seconds
+            result = {
+                "n_points_per_side": n,
+                "n_threads": n_threads,
+                "numpy_seconds": numpy_seconds,
+                "seconds": seconds,
+                "speedup": speedup,
+                "efficiency": speedup / n_threads,
+            }
+            logger.info(
+                f"n={n:<5} threads={n_threads:<3} {1e3 * seconds:.3f}ms (numpy {1e3 * numpy_seconds:.3f}ms) "
+                f"speedup={speedup:.2f}x efficiency={100 * result['efficiency']:.0f}%"
+            )
+            results.append(result)
+    return {"environment": {**environment(), "cpu_count": os.cpu_count()}, "results": results}
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+    logging.basicConfig(level=args.log_level)
+    logger.setLevel(logging.INFO)
+    report = run(args.threads, args.sizes, args.min_repeats, args.max_repeats, args.min_seconds)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,102 @@
+import os
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from cloth.workspace import Workspace
+from .base_backend import BaseBackend
+
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_bounds(n: int, n_chunks: int) -> List[Tuple[int, int]]:
+    """ n items split into at most n_chunks contiguous, non-empty (start, stop) ranges of near equal size """
+    bounds = np.linspace(0, n, max(min(n_chunks, n), 1) + 1).astype(np.int64)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+class ThreadedBackend(BaseBackend):
+    """
+    The NumPy backend's passes split over a persistent thread pool; NumPy releases the GIL inside its loops,
+    so chunks run on separate cores. One step is two parallel phases:
+        1. springs, in n_threads ranges: Hooke's law per spring into a shared (S, 3) array
+        2. vertices, in n_threads ranges: gravity, damping and wind, plus the sum of the range's own rows of
+           vertex_to_spring (and, fused, the explicit Euler update of those vertices)
+    Each vertex is only ever written by the chunk owning it and sums its springs in the same order as
+    IncidenceOperator.matmul, so results are bit-for-bit those of the NumPy backend for any thread count.
+    Every chunk has its own workspace; topology is split once, on the first step.
+    """
+    name: str = "threaded"
+
+    def __init__(self, n_threads: Optional[int] = None, min_chunk_size: int = 1024):
+        self.n_threads = n_threads or os.cpu_count() or 1
+        # chunks smaller than this cost more in dispatch than they gain
+        self.min_chunk_size = min_chunk_size
+        self.executor = ThreadPoolExecutor(max_workers=self.n_threads, thread_name_prefix="cloth_force")
+        self.spring_chunks = None
+
+    def prepare(self, model) -> None:
+        from cloth.drawables.spring_mass_grid_square import spring_force_vectors
+        self.spring_force_vectors = spring_force_vectors
+        n_vertices = model.vertices.shape[0]
+        n_springs = model.spring_end_points.shape[0]
+        self.spring_chunks = chunk_bounds(n_springs, min(self.n_threads, max(n_springs // self.min_chunk_size, 1)))
+        self.vertex_chunks = chunk_bounds(n_vertices, min(self.n_threads, max(n_vertices // self.min_chunk_size, 1)))
+        self.spring_workspaces = [Workspace() for _ in self.spring_chunks]
+        self.vertex_workspaces = [Workspace() for _ in self.vertex_chunks]
+        self.vertex_to_spring_blocks = [model.vertex_to_spring.row_block(start, stop) for start, stop in self.vertex_chunks]
+        fixed_vertices = np.asarray(model.fixed_vertices, dtype=np.int64)
+        self.fixed_vertex_blocks = [
+            fixed_vertices[(fixed_vertices >= start) & (fixed_vertices < stop)] - start for start, stop in self.vertex_chunks
+        ]
+        logger.info(f"{self.n_threads} threads: {len(self.spring_chunks)} spring and {len(self.vertex_chunks)} vertex chunks")
+
+    def spring_chunk(self, model, chunk: int, spring_force: np.ndarray) -> None:
+        start, stop = self.spring_chunks[chunk]
+        self.spring_force_vectors(
+            model.vertices,
+            model.spring_end_points[start:stop],
+            model.spring_resting_lengths[start:stop],
+            model.spring_stiffness[start:stop],
+            out=spring_force[start:stop],
+            workspace=self.spring_workspaces[chunk],
+        )
+
+    def vertex_chunk(self, model, chunk: int, spring_force: np.ndarray, force: np.ndarray, dt: Optional[float]) -> None:
+        start, stop = self.vertex_chunks[chunk]
+        workspace = self.vertex_workspaces[chunk]
+        rows = slice(start, stop)
+        model.external_force(rows, out=force[rows], workspace=workspace)
+        spring_sums = self.vertex_to_spring_blocks[chunk].matmul(
+            spring_force, out=workspace.array("spring_force", (stop - start, 3)), workspace=workspace,
+        )  # R, 3
+        np.add(force[rows], spring_sums, out=force[rows])
+        force[rows][self.fixed_vertex_blocks[chunk], :] = 0
+        if dt is not None:
+            # BaseBackend.explicit_euler_step on these rows only: nothing else reads them any more this step
+            acceleration = np.divide(force[rows], model.mass[rows], out=model.acceleration[rows])
+            increment = workspace.array("integrator_increment", (stop - start, 3))  # R, 3
+            np.add(model.velocity[rows], np.multiply(dt, acceleration, out=increment), out=model.velocity[rows])
+            np.add(model.vertices[rows], np.multiply(dt, model.velocity[rows], out=increment), out=model.vertices[rows])
+
+    def run(self, model, dt: Optional[float]) -> np.ndarray:
+        if self.spring_chunks is None:
+            self.prepare(model)
+        spring_force = model.workspace.array("spring_force_vectors", (model.spring_end_points.shape[0], 3))  # S, 3
+        force = model.workspace.array("force", model.vertices.shape)  # V, 3
+        # phase 2 reads every spring of phase 1: wait for all of them in between
+        for future in [self.executor.submit(self.spring_chunk, model, chunk, spring_force) for chunk in range(len(self.spring_chunks))]:
+            future.result()
+        for future in [self.executor.submit(self.vertex_chunk, model, chunk, spring_force, force, dt) for chunk in range(len(self.vertex_chunks))]:
+            future.result()
+        return force
+
+    def force(self, model) -> np.ndarray:
+        return self.run(model, None)
+
+    def explicit_euler_step(self, model, dt: float) -> np.ndarray:
+        return self.run(model, dt)
+
+    def close(self) -> None:
+        self.executor.shutdown()
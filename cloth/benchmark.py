@@ -0,0 +1,254 @@
+""" Benchmarks of the cloth and rendering hot paths across grid sizes: time and peak memory, saved as json.
+python -m cloth.benchmark --sizes 25 50 100 200 400 --output benchmarks/baseline.json
+python -m cloth.benchmark --sizes 25 50 100 200 400 --baseline benchmarks/baseline.json  # flags regressions
+"""
+import sys
+import gc
+import argparse
+import json
+import logging
+import platform
+import time
+import tracemalloc
+import numpy as np
+from typing import Any, Callable, Dict, List, Tuple
+from cloth.drawables.spring_mass_grid_square import SpringMassGridSquare
+from cloth.geometry.triangle_mesh import TriangleMesh
+from cloth.ray_tracing.render import build_scene, camera_rays, trace
+from cloth.simulate import make_model
+
+
+logger = logging.getLogger(__name__)
+BENCHMARK_VERSION: int = 1
+# a benchmark function and the setup that builds its (untimed) input, called once per repeat
+Case = Tuple[Callable[[Any], Any], Callable[[], Any]]
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", help="Grid points per side to benchmark", default=[25, 50, 100, 200, 400])
+    parser.add_argument("--cases", type=str, nargs="+", choices=list(CASES), help="Benchmarks to run", default=list(CASES))
+    parser.add_argument("--min_repeats", type=int, help="Timed runs per case at least", default=5)
+    parser.add_argument("--max_repeats", type=int, help="Timed runs per case at most", default=100)
+    parser.add_argument("--min_seconds", type=float, help="Keep repeating a case until it ran this long in total", default=0.5)
+    parser.add_argument("--image_size", type=int, help="Side of the square image for the intersect case", default=128)
+    parser.add_argument("--output", type=str, help="Save the results as json here", default=None)
+    parser.add_argument("--baseline", type=str, help="Compare against these saved results; exits with 1 on regressions", default=None)
+    parser.add_argument("--results", type=str, help="With --baseline: compare these saved results instead of running", default=None)
+    parser.add_argument("--threshold", type=float, help="Relative slowdown (or memory growth) that counts as a regression", default=0.1)
+    parser.add_argument("--log_level", type=str, help="Python logging level (progress and comparisons are always logged)", default="WARNING")
+    return parser
+
+
+def cloth_triangles(model: SpringMassGridSquare) -> TriangleMesh:
+    return TriangleMesh(model.vertices.astype(np.float32), model.elements.astype(np.int64))
+
+
+def init_case(n: int, image_size: int) -> Case:
+    return (lambda _: make_model(n_points_per_side=n)), (lambda: None)
+
+
+def force_case(n: int, image_size: int) -> Case:
+    model = make_model(n_points_per_side=n)
+    return (lambda _: model.force()), (lambda: None)
+
+
+def vertex_normals_case(n: int, image_size: int) -> Case:
+    model = make_model(n_points_per_side=n)
+    return (lambda _: model.vertex_normals), (lambda: None)
+
+
+def update_case(n: int, image_size: int) -> Case:
+    model = make_model(n_points_per_side=n)
+    # the state moves on every call, like in a real run: step sizes and therefore costs stay the same
+    return (lambda t: model.update(t)), (lambda: model.t + 0.01)
+
+
+def init_elements_case(n: int, image_size: int) -> Case:
+    model = make_model(n_points_per_side=n)
+    return (lambda _: model.init_elements()), (lambda: None)
+
+
+def wind_case(n: int, image_size: int) -> Case:
+    model = make_model(n_points_per_side=n)
+    return (lambda _: model.wind_field.get_force_field(model.vertices, model.t)), (lambda: None)
+
+
+def intersect_case(n: int, image_size: int) -> Case:
+    """ Closest hits of one camera ray per pixel with the cloth triangles; the BVH build is not timed """
+    model = make_model(n_points_per_side=n)
+    triangles, bvh = build_scene(cloth_triangles(model))
+    origins, directions = camera_rays(image_size, image_size)
+    return (lambda _: trace(triangles, bvh, origins, directions)), (lambda: None)
+
+
+CASES: Dict[str, Callable[[int, int], Case]] = {
+    "init": init_case,
+    "force": force_case,
+    "vertex_normals": vertex_normals_case,
+    "update": update_case,
+    "init_elements": init_elements_case,
+    "wind": wind_case,
+    "intersect": intersect_case,
+}
+
+
+def time_case(case: Case, min_repeats: int, max_repeats: int, min_seconds: float) -> Dict[str, Any]:
+    """
+    One untimed warm-up run, then timed runs until both min_repeats and min_seconds are reached (or max_repeats).
+    Peak memory is measured on one more, separate run: tracemalloc (which numpy reports its buffers to)
+    slows allocations down, so it never runs while timing.
+    """
+    function, setup = case
+    function(setup())
+    timings = []
+    total_ns = 0
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(timings) < max_repeats and (len(timings) < min_repeats or total_ns < min_seconds * 1e9):
+            argument = setup()
+            t0 = time.perf_counter_ns()
+            function(argument)
+            elapsed_ns = time.perf_counter_ns() - t0
+            timings.append(elapsed_ns)
+            total_ns += elapsed_ns
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    argument = setup()
+    tracemalloc.start()
+    try:
+        function(argument)
+        _, peak_memory_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = np.asarray(timings, dtype=np.float64) * 1e-9
+    return {
+        "repeats": len(timings),
+        "min_seconds": float(seconds.min()),
+        "median_seconds": float(np.median(seconds)),
+        "mean_seconds": float(seconds.mean()),
+        "std_seconds": float(seconds.std()),
+        "peak_memory_bytes": int(peak_memory_bytes),
+    }
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def run(
+    sizes: List[int],
+    cases: List[str],
+    min_repeats: int = 5,
+    max_repeats: int = 100,
+    min_seconds: float = 0.5,
+    image_size: int = 128,
+) -> Dict[str, Any]:
+    np.random.seed(0)
+    results = []
+    for n in sizes:
+        for name in cases:
+            case = CASES[name](n, image_size)
+            result = {
+                "case": name,
+                "n_points_per_side": n,
+                "n_vertices": n * n,
+                **time_case(case, min_repeats, max_repeats, min_seconds),
+            }
+            logger.info(
+                f"{name:<16} n={n:<5} min={1e3 * result['min_seconds']:.3f}ms median={1e3 * result['median_seconds']:.3f}ms "
+                f"peak={result['peak_memory_bytes'] / 2**20:.2f}MiB repeats={result['repeats']}"
+            )
+            results.append(result)
+    return {
+        "version": BENCHMARK_VERSION,
+        "environment": environment(),
+        "config": {"min_repeats": min_repeats, "max_repeats": max_repeats, "min_seconds": min_seconds, "image_size": image_size},
+        "results": results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.1) -> Dict[str, Any]:
+    """
+    Matches results to the baseline by (case, n_points_per_side). Times are compared by their minimum - the
+    run least disturbed by the rest of the machine - and a case regresses when its time or peak memory
+    grows by more than `threshold` (relative); it improved when its time shrinks by as much.
+    """
+    baseline_results = {(result["case"], result["n_points_per_side"]): result for result in baseline["results"]}
+    comparisons = []
+    for result in results["results"]:
+        key = (result["case"], result["n_points_per_side"])
+        if key not in baseline_results:
+            continue
+        reference = baseline_results[key]
+        time_ratio = result["min_seconds"] / reference["min_seconds"]
+        memory_ratio = (result["peak_memory_bytes"] + 1) / (reference["peak_memory_bytes"] + 1)
+        if time_ratio > 1.0 + threshold or memory_ratio > 1.0 + threshold:
+            status = "regression"
+        elif time_ratio < 1.0 / (1.0 + threshold):
+            status = "improvement"
+        else:
+            status = "unchanged"
+        comparisons.append({
+            "case": result["case"],
+            "n_points_per_side": result["n_points_per_side"],
+            "baseline_min_seconds": reference["min_seconds"],
+            "min_seconds": result["min_seconds"],
+            "time_ratio": time_ratio,
+            "baseline_peak_memory_bytes": reference["peak_memory_bytes"],
+            "peak_memory_bytes": result["peak_memory_bytes"],
+            "memory_ratio": memory_ratio,
+            "status": status,
+        })
+    if results.get("environment") != baseline.get("environment"):
+        logger.warning(f"Comparing runs from different environments: {baseline.get('environment')} vs {results.get('environment')}")
+    return {
+        "threshold": threshold,
+        "n_regressions": sum(comparison["status"] == "regression" for comparison in comparisons),
+        "n_improvements": sum(comparison["status"] == "improvement" for comparison in comparisons),
+        "comparisons": comparisons,
+    }
+
+
+def format_comparison(comparison: Dict[str, Any]) -> str:
+    lines = [f"{'case':<16} {'n':>5} {'baseline ms':>12} {'ms':>10} {'time':>7} {'memory':>7}  status"]
+    for row in comparison["comparisons"]:
+        lines.append(
+            f"{row['case']:<16} {row['n_points_per_side']:>5} {1e3 * row['baseline_min_seconds']:>12.3f} "
+            f"{1e3 * row['min_seconds']:>10.3f} {row['time_ratio']:>6.2f}x {row['memory_ratio']:>6.2f}x  {row['status']}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+    logging.basicConfig(level=args.log_level)
+    logger.setLevel(logging.INFO)
+    if args.results is not None:
+        with open(args.results) as f:
+            report = json.load(f)
+    else:
+        report = run(args.sizes, args.cases, args.min_repeats, args.max_repeats, args.min_seconds, args.image_size)
+        if args.output is not None:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Saved benchmark results to {args.output}")
+
+    if args.baseline is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(report, baseline, args.threshold)
+        logger.info(f"Compared with {args.baseline}:\n{format_comparison(comparison)}")
+        print(json.dumps(comparison, indent=2))
+        sys.exit(1 if comparison["n_regressions"] > 0 else 0)
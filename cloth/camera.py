@@ -42,6 +42,8 @@ class Camera:
     computation functions:
         .view_matrix()
         .projection_matrix()
+    Both matrices are cached: whoever changes pos/pitch/yaw must set view_dirty,
+    whoever changes fov/aspect/z_near/z_far must set projection_dirty.
     """
     def __init__(self):
         self.pos = np.array((0.0, 0.0, 2.0), np.float32)
@@ -54,8 +56,24 @@ class Camera:
         self.z_near = 0.01
         self.z_far = 100.0
         self.aspect = 1.0
+        self.view_dirty = True
+        self.projection_dirty = True
+        self._view_matrix = None
+        self._projection_matrix = None
 
     def projection_matrix(self) -> np.ndarray:
+        if self.projection_dirty:
+            self._projection_matrix = self.compute_projection_matrix()
+            self.projection_dirty = False
+        return self._projection_matrix
+
+    def view_matrix(self) -> np.ndarray:
+        if self.view_dirty:
+            self._view_matrix = self.compute_view_matrix()
+            self.view_dirty = False
+        return self._view_matrix
+
+    def compute_projection_matrix(self) -> np.ndarray:
         tan_fov = np.tan(self.fov / 2.0)
         result = np.zeros((4, 4), np.float32)
         result[0, 0] = 1.0 / (self.aspect * tan_fov)
@@ -65,8 +83,12 @@ class Camera:
         result[2, 3] = -(2.0 * self.z_far * self.z_near) / (self.z_far - self.z_near)
         return result
 
-    def view_matrix(self) -> np.ndarray:
-        return look_at(self.pos, self.pos + self.front(), self.up())
+    def compute_view_matrix(self) -> np.ndarray:
+        # same as look_at(pos, pos + front(), up()) with front() computed once
+        front = self.front()
+        right = normalized(np.cross(front, np.array((0, 1, 0), np.float32)))
+        up = normalized(np.cross(right, front))
+        return look_at(self.pos, self.pos + front, up)
 
     def front(self) -> np.ndarray:
         return get_spherical_coords(self.pitch, self.yaw)
@@ -0,0 +1,176 @@
+""" Simulation checkpoints (resume bit-for-bit) and per-frame state recordings (replay without physics). """
+import os
+import json
+import logging
+import importlib
+import numpy as np
+from typing import Any, Optional, Tuple
+from cloth.drawables.square import Square
+
+
+logger = logging.getLogger(__name__)
+CHECKPOINT_VERSION: int = 1
+# everything the integrators carry from one step to the next; the rest is rebuilt from the constructor kwargs
+STATE_ARRAYS: Tuple[str, ...] = ("vertices", "velocity", "acceleration")
+# modules (and their submodules) whose classes decode_object may instantiate: checkpoints only hold wind fields and their schedules
+DECODABLE_MODULES: Tuple[str, ...] = ("cloth.force_field", "cloth.timeseries")
+
+
+def encode_object(value: Any) -> Any:
+    """ JSON-friendly description of fields / schedules / arrays, restorable with decode_object """
+    if isinstance(value, np.ndarray):
+        return {"array": value.tolist(), "dtype": str(value.dtype)}
+    if isinstance(value, np.generic):
+        return {"scalar": value.item(), "dtype": str(value.dtype)}
+    if isinstance(value, (list, tuple)):
+        return [encode_object(item) for item in value]
+    if hasattr(value, "__dict__"):
+        cls = value.__class__
+        return {
+            "class": f"{cls.__module__}.{cls.__qualname__}",
+            "attributes": {name: encode_object(attribute) for name, attribute in vars(value).items()},
+        }
+    return value
+
+
+def decode_object(value: Any) -> Any:
+    """ Inverse of encode_object. Only classes from DECODABLE_MODULES are restored, anything else raises ValueError """
+    if isinstance(value, list):
+        return [decode_object(item) for item in value]
+    if isinstance(value, dict) and "array" in value:
+        return np.array(value["array"], dtype=value["dtype"])
+    if isinstance(value, dict) and "scalar" in value:
+        return np.dtype(value["dtype"]).type(value["scalar"])
+    if isinstance(value, dict) and "class" in value:
+        module_name, class_name = value["class"].rsplit(".", 1)
+        if not any(module_name == allowed or module_name.startswith(f"{allowed}.") for allowed in DECODABLE_MODULES):
+            raise ValueError(f"Refusing to decode {value['class']}: not in {DECODABLE_MODULES}")
+        cls = getattr(importlib.import_module(module_name), class_name, None)
+        if not isinstance(cls, type):
+            raise ValueError(f"{value['class']} is not a class")
+        # like unpickling: attributes are restored as saved, the constructor is not run again
+        obj = cls.__new__(cls)
+        obj.__dict__.update({name: decode_object(attribute) for name, attribute in value["attributes"].items()})
+        return obj
+    return value
+
+
+def save_checkpoint(path: str, model, frame_index: int) -> None:
+    """
+    One compressed .npz: the state arrays with their exact dtypes, t as float64 and json metadata
+    (frame, wind field parameters). Written to a temporary file and renamed, so a crash never leaves a
+    truncated checkpoint behind.
+    """
+    metadata = {
+        "version": CHECKPOINT_VERSION,
+        "model_class": model.__class__.__name__,
+        "frame_index": frame_index,
+        "wind_field": encode_object(model.wind_field),
+    }
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        t=np.float64(model.t),
+        metadata=np.array(json.dumps(metadata)),
+        **{name: getattr(model, name) for name in STATE_ARRAYS},
+    )
+    os.replace(tmp_path, path)
+    logger.info(f"Saved checkpoint {path=} {frame_index=} t={model.t}")
+
+
+def load_checkpoint(path: str, model, restore_fields: bool = True) -> int:
+    """ Restores the model (built with the same kwargs as the checkpointed run) in place, returns the frame index """
+    with np.load(path) as checkpoint:
+        metadata = json.loads(str(checkpoint["metadata"]))
+        if metadata["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {metadata['version']} in {path}")
+        for name in STATE_ARRAYS:
+            array = checkpoint[name]
+            if array.shape != getattr(model, name).shape:
+                raise ValueError(f"Checkpoint {name} has shape {array.shape}, model has {getattr(model, name).shape}")
+            setattr(model, name, array.copy())
+        model.t = float(checkpoint["t"])
+    if restore_fields:
+        model.wind_field = decode_object(metadata["wind_field"])
+    # refresh normals and the vertex buffer for drawing
+    Square.update(model, model.t)
+    logger.info(f"Loaded checkpoint {path=} frame_index={metadata['frame_index']} t={model.t}")
+    return metadata["frame_index"]
+
+
+def latest_checkpoint(checkpoint_dir: str) -> Optional[str]:
+    names = sorted(name for name in os.listdir(checkpoint_dir) if name.startswith("checkpoint_") and name.endswith(".npz"))
+    return os.path.join(checkpoint_dir, names[-1]) if names else None
+
+
+class Checkpointer:
+    """ Saves {checkpoint_dir}/checkpoint_{frame:08d}.npz every `every` frames """
+
+    def __init__(self, checkpoint_dir: str, every: int):
+        self.checkpoint_dir = checkpoint_dir
+        self.every = every
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def path(self, frame_index: int) -> str:
+        return os.path.join(self.checkpoint_dir, f"checkpoint_{frame_index:08d}.npz")
+
+    def maybe_save(self, model, frame_index: int) -> None:
+        if frame_index % self.every == 0:
+            save_checkpoint(self.path(frame_index), model, frame_index)
+
+
+class StateRecorder:
+    """
+    Appends every frame's (t, vertices) to {record_dir}/times.f64 and vertices.f32, raw and uncompressed
+    so recording costs one write per frame, and StateReplay can memory-map them.
+    """
+
+    def __init__(self, record_dir: str, n_vertices: int, first_frame_index: int = 0):
+        self.record_dir = record_dir
+        os.makedirs(record_dir, exist_ok=True)
+        with open(os.path.join(record_dir, "recording.json"), "w") as f:
+            json.dump({"n_vertices": n_vertices, "first_frame_index": first_frame_index}, f)
+        self.times_file = open(os.path.join(record_dir, "times.f64"), "wb")
+        self.vertices_file = open(os.path.join(record_dir, "vertices.f32"), "wb")
+
+    def record(self, model) -> None:
+        self.times_file.write(np.float64(model.t).tobytes())
+        self.vertices_file.write(np.ascontiguousarray(model.vertices, dtype=np.float32).tobytes())
+
+    def close(self) -> None:
+        self.times_file.close()
+        self.vertices_file.close()
+
+    def __enter__(self) -> "StateRecorder":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class StateReplay:
+    """ Frames of a StateRecorder directory; a frame cut short by a crash is ignored """
+
+    def __init__(self, record_dir: str):
+        with open(os.path.join(record_dir, "recording.json")) as f:
+            info = json.load(f)
+        self.n_vertices = info["n_vertices"]
+        self.first_frame_index = info["first_frame_index"]
+        times = np.fromfile(os.path.join(record_dir, "times.f64"), dtype=np.float64)
+        vertices_path = os.path.join(record_dir, "vertices.f32")
+        if os.path.getsize(vertices_path) > 0:
+            vertices = np.memmap(vertices_path, dtype=np.float32, mode="r")
+        else:
+            vertices = np.zeros(0, dtype=np.float32)
+        self.n_frames = min(times.shape[0], vertices.shape[0] // (3 * self.n_vertices))
+        self.times = times[:self.n_frames]
+        self.vertices = vertices[:self.n_frames * 3 * self.n_vertices].reshape(self.n_frames, self.n_vertices, 3)
+
+    def __len__(self) -> int:
+        return self.n_frames
+
+    def apply(self, model, frame: int) -> None:
+        """ Puts recorded frame into the model for drawing only - no physics """
+        model.vertices = np.array(self.vertices[frame])
+        model.t = float(self.times[frame])
+        Square.update(model, model.t)
@@ -0,0 +1,94 @@
+import numpy as np
+import logging
+from typing import Optional, Sequence
+from cloth.geometry.bvh import BVH
+from cloth.geometry.triangle_mesh import TriangleMesh, load_obj, closest_points_on_triangles
+
+
+logger = logging.getLogger(__name__)
+
+
+class MeshObstacle:
+    """
+    A static triangle mesh (outward-facing winding) that cloth vertices cannot enter.
+
+    The BVH over its triangles is built once. Every step all vertices are queried at once: boxes of
+    half-size query_radius around the vertices are pushed through the BVH as a wavefront, candidate
+    triangles get a vectorized closest-point test, and every vertex closer than `thickness` to the surface
+    (or behind it) is projected back out to `thickness` with its inward velocity removed and its
+    tangential velocity scaled by (1 - friction). Vertices deeper than query_radius inside are not found.
+    """
+
+    def __init__(
+        self,
+        mesh: TriangleMesh,
+        thickness: float = 0.005,
+        friction: float = 0.1,
+        query_radius: Optional[float] = None,
+        leaf_size: int = 4,
+    ):
+        self.mesh = mesh
+        self.thickness = thickness
+        self.friction = friction
+        self.query_radius = 4 * thickness if query_radius is None else query_radius
+        self.triangles = mesh.triangles  # F, 3, 3
+        self.face_normals = mesh.face_normals()  # F, 3
+        self.bvh = BVH.build_lbvh(self.triangles.min(axis=1), self.triangles.max(axis=1), leaf_size=leaf_size)
+        self.last_candidate_pairs = 0
+        self.last_contacts = 0
+
+    @staticmethod
+    def from_obj(
+        obj_path: str,
+        scale: float = 1.0,
+        translation: Optional[Sequence[float]] = None,
+        **kwargs,
+    ) -> "MeshObstacle":
+        return MeshObstacle(load_obj(obj_path, scale=scale, translation=translation), **kwargs)
+
+    def closest_faces(self, points: np.ndarray):
+        """ For every point within query_radius of the mesh: (point indices, closest points, face indices) """
+        radius = np.float32(self.query_radius)
+        queries, faces = self.bvh.overlap_pairs(points - radius, points + radius)
+        self.last_candidate_pairs = queries.shape[0]
+        triangles = self.triangles[faces]  # P, 3, 3
+        closest = closest_points_on_triangles(points[queries], triangles[:, 0], triangles[:, 1], triangles[:, 2])
+        distance = np.linalg.norm(points[queries] - closest, axis=1)  # P
+        # keep the nearest face per point: sort by (point, distance), take the first of each point
+        order = np.lexsort((distance, queries))
+        queries, first = np.unique(queries[order], return_index=True)
+        best = order[first]
+        return queries, closest[best], faces[best]
+
+    def apply(self, model) -> None:
+        vertices = model.vertices
+        indices, closest, faces = self.closest_faces(vertices)
+        if indices.shape[0] == 0:
+            self.last_contacts = 0
+            return
+        offset = vertices[indices] - closest  # C, 3
+        normal = self.face_normals[faces]  # C, 3
+        signed_distance = np.sum(offset * normal, axis=1)  # C, negative behind the surface
+        contact = signed_distance < self.thickness
+        movable = np.ones(vertices.shape[0], dtype=bool)
+        movable[model.fixed_vertices] = False
+        contact &= movable[indices]
+        indices, closest, offset, normal, signed_distance = (
+            indices[contact], closest[contact], offset[contact], normal[contact], signed_distance[contact],
+        )
+        self.last_contacts = indices.shape[0]
+        if self.last_contacts == 0:
+            return
+
+        # outside: push away from the closest point (handles edges/corners), inside: along the face normal
+        distance = np.linalg.norm(offset, axis=1, keepdims=True)
+        outside = (signed_distance > 0)[:, None] & (distance > 0)
+        direction = np.where(outside, offset / np.where(distance > 0, distance, 1.0), normal)  # C, 3
+        model.vertices[indices] = closest + self.thickness * direction
+
+        velocity = model.velocity[indices]
+        normal_speed = np.sum(velocity * direction, axis=1, keepdims=True)  # C, 1
+        tangential = velocity - normal_speed * direction
+        model.velocity[indices] = np.maximum(normal_speed, 0.0) * direction + (1.0 - self.friction) * tangential
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Mesh obstacle: {self.last_candidate_pairs=} {self.last_contacts=}")
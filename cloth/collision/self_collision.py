@@ -0,0 +1,95 @@
+import numpy as np
+import logging
+from typing import Optional
+from .spatial_hash import SpatialHashGrid
+
+
+logger = logging.getLogger(__name__)
+
+
+class SelfCollision:
+    """
+    Keeps vertices of a cloth at least `thickness` apart, so folds don't pass through each other.
+
+    Every step, vertices are binned into a SpatialHashGrid of `cell_size` (>= thickness, defaults to it),
+    candidate pairs are read from neighbouring cells, and pairs closer than thickness are pushed apart
+    along the line between them (weighted by inverse mass, averaged per vertex) with their approaching
+    normal velocity removed. Pairs that are already closer than thickness at rest (grid neighbours) are ignored.
+
+    last_candidate_pairs / last_contacts (and running totals) are kept to tune cell_size.
+    """
+
+    def __init__(
+        self,
+        thickness: Optional[float] = None,
+        cell_size: Optional[float] = None,
+        n_iterations: int = 1,
+    ):
+        self.thickness = thickness
+        self.cell_size = cell_size
+        self.n_iterations = n_iterations
+        self.last_candidate_pairs = 0
+        self.last_contacts = 0
+        self.total_candidate_pairs = 0
+        self.n_steps = 0
+
+    def attach(self, model) -> None:
+        """ Call with the model in its rest configuration """
+        if self.thickness is None:
+            # half the shortest spring: grid neighbours never count as contacts
+            self.thickness = 0.5 * float(np.min(model.spring_resting_lengths))
+        if self.cell_size is None:
+            self.cell_size = self.thickness
+        if self.cell_size < self.thickness:
+            raise ValueError(f"{self.cell_size=} must be >= {self.thickness=}, or contacts are missed")
+        self.grid = SpatialHashGrid(self.cell_size)
+        self.rest_vertices = model.vertices.copy()
+        inverse_mass = 1.0 / model.mass  # V, 1
+        inverse_mass[model.fixed_vertices] = 0.0
+        self.inverse_mass = inverse_mass[:, 0]  # V
+        logger.info(f"Self collision with {self.thickness=} {self.cell_size=}")
+
+    def apply(self, model) -> None:
+        for _ in range(self.n_iterations):
+            self.resolve(model)
+        self.n_steps += 1
+        self.total_candidate_pairs += self.last_candidate_pairs
+
+    def resolve(self, model) -> None:
+        vertices = model.vertices
+        self.grid.build(vertices)
+        first, second = self.grid.candidate_pairs()
+        self.last_candidate_pairs = first.shape[0]
+
+        displacement = vertices[second] - vertices[first]  # P, 3
+        distance = np.linalg.norm(displacement, axis=1)  # P
+        rest_distance = np.linalg.norm(self.rest_vertices[second] - self.rest_vertices[first], axis=1)  # P
+        contact = (distance < self.thickness) & (rest_distance >= self.thickness)
+        first, second = first[contact], second[contact]
+        displacement, distance = displacement[contact], distance[contact]
+        self.last_contacts = first.shape[0]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Self collision: {self.last_candidate_pairs=} {self.last_contacts=}")
+        if self.last_contacts == 0:
+            return
+
+        normal = displacement / np.maximum(distance, np.finfo(np.float32).tiny)[:, None]  # P, 3
+        weight_first = self.inverse_mass[first]  # P
+        weight_second = self.inverse_mass[second]  # P
+        total_weight = weight_first + weight_second
+        movable = total_weight > 0
+        share = np.where(movable, (self.thickness - distance) / np.where(movable, total_weight, 1.0), 0.0)  # P
+
+        # relative velocity along the normal: < 0 means approaching
+        relative_velocity = np.sum((model.velocity[second] - model.velocity[first]) * normal, axis=1)  # P
+        impulse = np.where(movable, np.minimum(relative_velocity, 0.0) / np.where(movable, total_weight, 1.0), 0.0)
+
+        n_vertices = vertices.shape[0]
+        indices = np.concatenate((first, second))
+        contacts_per_vertex = np.maximum(np.bincount(indices, minlength=n_vertices), 1)[:, None]  # V, 1
+        position_change = np.concatenate((-(weight_first * share)[:, None] * normal, (weight_second * share)[:, None] * normal))
+        velocity_change = np.concatenate(((weight_first * impulse)[:, None] * normal, -(weight_second * impulse)[:, None] * normal))
+        for k in range(3):
+            # Jacobi: average the corrections of all contacts of a vertex
+            model.vertices[:, k] += np.bincount(indices, weights=position_change[:, k], minlength=n_vertices) / contacts_per_vertex[:, 0]
+            model.velocity[:, k] += np.bincount(indices, weights=velocity_change[:, k], minlength=n_vertices) / contacts_per_vertex[:, 0]
@@ -0,0 +1,59 @@
+""" Uniform spatial hash grid over points, rebuilt from scratch with sort/unique (no per-point Python). """
+import itertools
+import numpy as np
+from typing import Tuple
+
+
+# cell coordinates are packed into one int64 key: 21 bits per axis around a bias
+_BITS: int = 21
+_BIAS: int = 1 << (_BITS - 1)
+_NEIGHBOUR_OFFSETS = np.array(list(itertools.product((-1, 0, 1), repeat=3)), dtype=np.int64)  # 27, 3
+
+
+def pack_cells(cells: np.ndarray) -> np.ndarray:
+    # cells: N, 3 int64 -> N int64; exact (no hash collisions) for |cell| < 2^20
+    biased = cells + _BIAS
+    return (biased[:, 0] << (2 * _BITS)) | (biased[:, 1] << _BITS) | biased[:, 2]
+
+
+class SpatialHashGrid:
+    """
+    grid = SpatialHashGrid(cell_size)
+    grid.build(points)
+    i, j = grid.candidate_pairs()  # all pairs (i < j) in the same or adjacent cells
+
+    Every pair of points closer than cell_size is among the candidates.
+    """
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+
+    def build(self, points: np.ndarray) -> None:
+        self.cells = np.floor(points / self.cell_size).astype(np.int64)  # N, 3
+        keys = pack_cells(self.cells)
+        # points sorted by cell; each occupied cell is a contiguous run
+        self.order = np.argsort(keys, kind="stable")
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(
+            keys[self.order], return_index=True, return_counts=True,
+        )
+
+    def candidate_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        firsts, seconds = [], []
+        n_points = self.cells.shape[0]
+        point_indices = np.arange(n_points, dtype=np.int64)
+        for offset in _NEIGHBOUR_OFFSETS:
+            neighbour_keys = pack_cells(self.cells + offset)
+            slot = np.minimum(np.searchsorted(self.cell_keys, neighbour_keys), self.cell_keys.shape[0] - 1)
+            occupied = self.cell_keys[slot] == neighbour_keys
+            queries = point_indices[occupied]
+            starts = self.cell_starts[slot[occupied]]
+            counts = self.cell_counts[slot[occupied]]
+            # expand (query, every point of its neighbour cell) without a Python loop
+            first = np.repeat(queries, counts)
+            within = np.arange(first.shape[0], dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+            second = self.order[np.repeat(starts, counts) + within]
+            # every unordered pair shows up from both sides; keep one
+            keep = first < second
+            firsts.append(first[keep])
+            seconds.append(second[keep])
+        return np.concatenate(firsts), np.concatenate(seconds)
@@ -0,0 +1,304 @@
+""" Cloth simulated on a coarse grid and drawn on finer grids interpolated from it, with camera-distance level of detail. """
+import numpy as np
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+from cloth.drawables.base_drawable import BaseDrawable
+from cloth.drawables.square import Square
+from cloth.drawables.spring_mass_grid_square import SpringMassGridSquare, mesh_vertex_normals
+from cloth.incidence import IncidenceOperator
+from cloth.profiler import get_profiler
+from cloth.texture_bounds import TextureBounds
+from cloth.workspace import Workspace
+
+
+logger = logging.getLogger(__name__)
+profiler = get_profiler()
+INTERPOLATIONS = ("cubic", "linear")
+
+
+def interpolation_matrix(n_fine: int, n_coarse: int, interpolation: str = "cubic") -> np.ndarray:
+    """
+    (n_fine, n_coarse) weights resampling n_coarse evenly spaced samples to n_fine over the same interval.
+    "cubic" is Catmull-Rom: it passes through the samples and is C1, so interpolated cloth has smooth normals.
+    Beyond the ends, samples are extrapolated linearly (p[-1] = 2 p[0] - p[1]), so straight lines stay straight.
+    """
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(f"Unknown interpolation {interpolation}, expected one of {INTERPOLATIONS}")
+    x = np.linspace(0.0, n_coarse - 1, n_fine)  # F
+    cell = np.minimum(np.floor(x).astype(np.int64), n_coarse - 2)  # F
+    f = x - cell  # F
+    if interpolation == "linear":
+        offsets = np.array([0, 1])
+        weights = np.stack((1.0 - f, f), axis=1)  # F, 2
+    else:
+        offsets = np.array([-1, 0, 1, 2])
+        weights = 0.5 * np.stack((
+            -f**3 + 2 * f**2 - f,
+            3 * f**3 - 5 * f**2 + 2,
+            -3 * f**3 + 4 * f**2 + f,
+            f**3 - f**2,
+        ), axis=1)  # F, 4
+    matrix = np.zeros((n_fine, n_coarse), dtype=np.float64)
+    rows = np.repeat(np.arange(n_fine), offsets.shape[0])
+    taps = (cell[:, None] + offsets).reshape(-1)
+    weights = weights.reshape(-1)
+    # ghost samples: p[-1] = 2 p[0] - p[1] and p[n] = 2 p[n - 1] - p[n - 2]
+    for ghost, edge, inner in ((-1, 0, 1), (n_coarse, n_coarse - 1, n_coarse - 2)):
+        is_ghost = taps == ghost
+        np.add.at(matrix, (rows[is_ghost], np.full(np.count_nonzero(is_ghost), edge)), 2.0 * weights[is_ghost])
+        np.add.at(matrix, (rows[is_ghost], np.full(np.count_nonzero(is_ghost), inner)), -weights[is_ghost])
+    inside = (taps >= 0) & (taps < n_coarse)
+    np.add.at(matrix, (rows[inside], taps[inside]), weights[inside])
+    return matrix
+
+
+def grid_prolongation(n_fine: int, n_coarse: int, interpolation: str = "cubic") -> Dict[str, np.ndarray]:
+    """ Sparse (n_fine^2, n_coarse^2) tensor product of interpolation_matrix, as IncidenceOperator arrays """
+    matrix = interpolation_matrix(n_fine, n_coarse, interpolation)
+    fine, coarse = np.nonzero(matrix)
+    weights = matrix[fine, coarse]
+    # vertex (i, j) is i * n + j: every pair of a row entry and a column entry is one entry of the product
+    rows = (fine[:, None] * n_fine + fine[None, :]).reshape(-1)
+    cols = (coarse[:, None] * n_coarse + coarse[None, :]).reshape(-1)
+    return IncidenceOperator(rows, cols, np.outer(weights, weights).reshape(-1), (n_fine**2, n_coarse**2)).to_arrays("prolongation")
+
+
+class RenderLevel(Square):
+    """
+    A render-only grid of n_points_per_side^2 vertices interpolated from a simulated grid of
+    simulation_points_per_side^2, optionally followed by a few Jacobi iterations pulling its structural edges back
+    to their rest lengths (interpolation stretches them where the coarse cloth folds). Pinned vertices don't move.
+    """
+
+    def __init__(
+        self,
+        side: float,
+        n_points_per_side: int,
+        simulation_points_per_side: int,
+        texture_bounds: Optional[TextureBounds] = None,
+        interpolation: str = "cubic",
+        relaxation_iterations: int = 0,
+        relaxation_factor: float = 0.5,
+        pinned_vertices: Sequence[int] = (),
+        topology_cache_dir: Optional[str] = None,
+    ):
+        super().__init__(
+            side=side,
+            n_points_per_side=n_points_per_side,
+            texture_bounds=texture_bounds,
+            static_normals=False,
+            t0=None,
+            topology_cache_dir=topology_cache_dir,
+        )
+        self.workspace = Workspace()
+        self.relaxation_iterations = relaxation_iterations
+        n_vertices = self.vertices.shape[0]
+        topology = self.cached_topology(
+            "render_level",
+            [n_points_per_side, simulation_points_per_side, interpolation],
+            lambda: {
+                **IncidenceOperator.vertex_to_element(self.elements, n_vertices).to_arrays("vertex_to_element"),
+                **grid_prolongation(n_points_per_side, simulation_points_per_side, interpolation),
+            },
+        )
+        self.vertex_to_element = IncidenceOperator.from_arrays(topology, "vertex_to_element", (n_vertices, self.elements.shape[0]))
+        self.prolongation = IncidenceOperator.from_arrays(topology, "prolongation", (n_vertices, simulation_points_per_side**2))
+
+        # structural edges, at their length in the flat grid
+        self.edges = SpringMassGridSquare.grid_springs(n_points_per_side, ((1, 0), (0, 1)))  # S, 2
+        self.edge_rest_lengths = np.linalg.norm(self.vertices[self.edges[:, 1]] - self.vertices[self.edges[:, 0]], axis=1, keepdims=True)  # S, 1
+        self.vertex_to_edge = IncidenceOperator.vertex_to_spring(self.edges, n_vertices)
+        degree = np.bincount(self.edges.reshape(-1), minlength=n_vertices).astype(np.float32)
+        self.relaxation_scale = (relaxation_factor / np.maximum(degree, 1.0))[:, None]  # V, 1
+        self.relaxation_scale[np.asarray(pinned_vertices, dtype=np.int64)] = 0.0
+
+    def prolong(self, simulation_vertices: np.ndarray) -> np.ndarray:
+        """ vertices (V, 3) interpolated from the simulated ones, then relaxed """
+        self.prolongation.matmul(simulation_vertices, out=self.vertices, workspace=self.workspace)
+        for _ in range(self.relaxation_iterations):
+            self.relax()
+        return self.vertices
+
+    def relax(self) -> None:
+        """ One Jacobi pass: both ends of every edge move half its length error towards each other """
+        workspace = self.workspace
+        n_edges = self.edges.shape[0]
+        ends = workspace.array("edge_end_positions", (n_edges, 2, 3))  # S, 2, 3
+        np.take(self.vertices, self.edges, axis=0, out=ends, mode="clip")
+        direction = np.subtract(ends[:, 1, :], ends[:, 0, :], out=workspace.array("edge_direction", (n_edges, 3)))  # S, 3
+        lengths = workspace.array("edge_lengths", (n_edges, 1))  # S, 1
+        np.sqrt(np.einsum("sk,sk->s", direction, direction, out=lengths[:, 0]), out=lengths[:, 0])
+        np.maximum(lengths, np.finfo(np.float32).tiny, out=lengths)
+        # correction of the first end point: 0.5 * (length - rest) / length * direction
+        correction = np.subtract(lengths, self.edge_rest_lengths, out=workspace.array("edge_correction", (n_edges, 1)))  # S, 1
+        np.divide(correction, lengths, out=correction)
+        np.multiply(direction, np.multiply(correction, 0.5, out=correction), out=direction)
+        # vertex_to_edge is +1 on the first end point, -1 on the second
+        displacement = self.vertex_to_edge.matmul(direction, out=workspace.array("vertex_displacement", self.vertices.shape), workspace=workspace)
+        np.add(self.vertices, np.multiply(displacement, self.relaxation_scale, out=displacement), out=self.vertices)
+
+    @property
+    def vertex_normals(self) -> np.ndarray:
+        return self.write_vertex_normals(np.empty_like(self.vertices))
+
+    def write_vertex_normals(self, out: np.ndarray) -> np.ndarray:
+        return mesh_vertex_normals(self.vertices, self.element_vertices, self.vertex_to_element, out, self.workspace)
+
+
+class MultiResolutionCloth(BaseDrawable):
+    """
+    cloth = MultiResolutionCloth(n_points_per_side=25, render_points_per_side=(200, 100, 50), lod_distances=(1.5, 3.0))
+    cloth.camera = api.camera  # levels follow the camera: 200^2 vertices closer than 1.5, 50^2 beyond 3.0
+    cloth.update(t)            # simulates 25^2 vertices, interpolates the active level only
+
+    Physics runs on a SpringMassGridSquare of n_points_per_side (every other kwarg goes to it too), so simulation
+    cost does not depend on the rendered resolution. Simulation state (vertices, velocity, acceleration, t,
+    wind_field) is the simulated grid's, so checkpoints and recordings store the coarse cloth.
+    A level is only left once the distance is past its threshold by `lod_hysteresis` (relative), so a camera
+    hovering at a threshold doesn't make the mesh flicker between resolutions.
+    """
+
+    def __init__(
+        self,
+        side: float = 0.1,
+        n_points_per_side: int = 25,
+        texture_bounds: Optional[TextureBounds] = None,
+        t0: Optional[float] = 0.0,
+        render_points_per_side: Sequence[int] = (100, 50),
+        lod_distances: Sequence[float] = (2.5,),
+        lod_hysteresis: float = 0.1,
+        interpolation: str = "cubic",
+        relaxation_iterations: int = 0,
+        topology_cache_dir: Optional[str] = None,
+        **simulation_kwargs: Any,
+    ):
+        if len(lod_distances) != len(render_points_per_side) - 1:
+            raise ValueError(f"{len(render_points_per_side)} render levels need {len(render_points_per_side) - 1} lod_distances, got {len(lod_distances)}")
+        self.simulation = SpringMassGridSquare(
+            side=side,
+            n_points_per_side=n_points_per_side,
+            texture_bounds=None,
+            t0=t0,
+            topology_cache_dir=topology_cache_dir,
+            **simulation_kwargs,
+        )
+        # fine vertices at the simulated grid's fixed vertices stay where the interpolation puts them
+        simulation_rows, simulation_columns = np.divmod(np.asarray(self.simulation.fixed_vertices, dtype=np.int64), n_points_per_side)
+        self.levels: List[RenderLevel] = []
+        for n in render_points_per_side:
+            scale = (n - 1) / (n_points_per_side - 1)
+            pinned = np.rint(simulation_rows * scale).astype(np.int64) * n + np.rint(simulation_columns * scale).astype(np.int64)
+            self.levels.append(RenderLevel(
+                side, n, n_points_per_side, texture_bounds, interpolation, relaxation_iterations,
+                pinned_vertices=pinned, topology_cache_dir=topology_cache_dir,
+            ))
+        self.lod_distances = np.asarray(lod_distances, dtype=np.float32)  # L - 1
+        self.lod_hysteresis = lod_hysteresis
+        # finest level until a camera is attached
+        self.level_index = 0
+        self.camera = None
+        self.bound_level = None
+        self.prolong()
+
+    # simulation state, so that checkpoints, recordings and replays see the simulated grid
+    @property
+    def vertices(self) -> np.ndarray:
+        return self.simulation.vertices
+
+    @vertices.setter
+    def vertices(self, vertices: np.ndarray) -> None:
+        self.simulation.vertices = vertices
+
+    @property
+    def velocity(self) -> np.ndarray:
+        return self.simulation.velocity
+
+    @velocity.setter
+    def velocity(self, velocity: np.ndarray) -> None:
+        self.simulation.velocity = velocity
+
+    @property
+    def acceleration(self) -> np.ndarray:
+        return self.simulation.acceleration
+
+    @acceleration.setter
+    def acceleration(self, acceleration: np.ndarray) -> None:
+        self.simulation.acceleration = acceleration
+
+    @property
+    def t(self) -> Optional[float]:
+        return self.simulation.t
+
+    @t.setter
+    def t(self, t: float) -> None:
+        self.simulation.t = t
+
+    @property
+    def wind_field(self):
+        return self.simulation.wind_field
+
+    @wind_field.setter
+    def wind_field(self, wind_field) -> None:
+        self.simulation.wind_field = wind_field
+
+    # the active level's mesh
+    @property
+    def level(self) -> RenderLevel:
+        return self.levels[self.level_index]
+
+    @property
+    def vertices_vbo(self):
+        return self.level.vertices_vbo
+
+    @property
+    def vertices_buffer(self) -> Optional[np.ndarray]:
+        return self.level.vertices_buffer
+
+    @property
+    def vertex_normals(self) -> np.ndarray:
+        """ The active level's normals, of its last interpolation """
+        return self.level.vertex_normals
+
+    def select_level(self) -> int:
+        """ Index of the level for the camera's distance to the cloth's centroid; the current one without a camera """
+        if self.camera is None:
+            return self.level_index
+        distance = float(np.linalg.norm(self.camera.pos - self.simulation.vertices.mean(axis=0)))
+        level_index = int(np.searchsorted(self.lod_distances, distance))
+        if level_index > self.level_index:
+            level_index = max(self.level_index, int(np.searchsorted(self.lod_distances * (1.0 + self.lod_hysteresis), distance)))
+        elif level_index < self.level_index:
+            level_index = min(self.level_index, int(np.searchsorted(self.lod_distances * (1.0 - self.lod_hysteresis), distance)))
+        return level_index
+
+    def prolong(self) -> np.ndarray:
+        """ The active level's vertices, interpolated from the current simulation state """
+        with profiler.scope("prolong"):
+            return self.level.prolong(self.simulation.vertices)
+
+    def update(self, t: float) -> None:
+        self.simulation.update(t)
+        Square.update(self, t)
+
+    def update_vertices_buffer(self) -> None:
+        # also reached from checkpoint loading and replays, so they follow the camera too
+        level_index = self.select_level()
+        if level_index != self.level_index:
+            logger.info(f"Level of detail {self.level_index} -> {level_index}: {self.levels[level_index].n_points_per_side}^2 render vertices")
+            self.level_index = level_index
+        self.prolong()
+        self.level.update_vertices_buffer()
+
+    def create_buffers(self) -> None:
+        # every level gets its buffers up front; switching levels only re-points the VAO
+        for level in self.levels:
+            level.prolong(self.simulation.vertices)
+            level.create_buffers()
+        self.bound_level = self.levels[-1]
+
+    def draw(self) -> None:
+        level = self.level
+        if self.bound_level is not level:
+            level.bind_attributes()
+            self.bound_level = level
+        level.draw()
@@ -1,18 +1,132 @@
 from cloth.drawables.square import Square
-from typing import Optional, List
-from cloth.gl_texture import TextureBounds
+from typing import Optional, List, Dict, Any, Sequence, Tuple, Union
+from cloth.texture_bounds import TextureBounds
 import numpy as np
 import logging
-import itertools
 from cloth.force_field.base_field import BaseField
+from cloth.force_field.composite_field import CompositeField
+from cloth.incidence import IncidenceOperator
+from cloth.integrators.registry import IntegratorRegistry
+from cloth.backends.registry import make_backend
+from cloth.collision.self_collision import SelfCollision
+from cloth.collision.mesh_obstacle import MeshObstacle
+from cloth.profiler import get_profiler
+from cloth.workspace import Workspace
 
 
 logger = logging.getLogger(__name__)
+profiler = get_profiler()
 _EPSILON: float = 1e-3
 
 
+def spring_force_vectors(
+    vertices: np.ndarray,
+    spring_end_points: np.ndarray,
+    spring_resting_lengths: np.ndarray,
+    spring_stiffness: np.ndarray,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[Workspace] = None,
+) -> np.ndarray:
+    """
+    Hooke's law on every spring (S, 3), the force on its first end point. Changes below _EPSILON are ignored,
+    and springs whose end points coincide exert no force.
+    Every operation is per spring, so any range of springs gives the same values as all of them.
+    """
+    if workspace is None:
+        workspace = Workspace()
+    n_springs = spring_end_points.shape[0]
+    spring_end_pos_3d = workspace.array("spring_end_positions", (n_springs, 2, 3))  # S, 2, 3
+    np.take(vertices, spring_end_points, axis=0, out=spring_end_pos_3d, mode="clip")
+
+    spring_displacement = workspace.array("spring_displacement", (n_springs, 3))  # S, 3
+    np.subtract(spring_end_pos_3d[:, 1, :], spring_end_pos_3d[:, 0, :], out=spring_displacement)
+    squared = workspace.array("spring_squared_displacement", (n_springs, 3))  # S, 3
+    np.multiply(spring_displacement, spring_displacement, out=squared)
+    spring_lengths = workspace.array("spring_lengths", (n_springs, 1))  # S, 1
+    # column by column: the same sums as np.linalg.norm, without a slow reduction over an axis of length 3
+    np.add(squared[:, 0:1], squared[:, 1:2], out=spring_lengths)
+    np.add(spring_lengths, squared[:, 2:3], out=spring_lengths)
+    np.sqrt(spring_lengths, out=spring_lengths)
+    # a zero-length spring has no direction: 0 / tiny makes its direction, and so its force, 0
+    np.maximum(spring_lengths, np.finfo(np.float32).tiny, out=spring_lengths)
+    spring_direction_vector = np.divide(spring_displacement, spring_lengths, out=spring_displacement)  # S, 3
+
+    # the norm of a (S, 1) change is its absolute value
+    spring_size_change = np.subtract(spring_lengths, spring_resting_lengths, out=spring_lengths)  # S, 1
+    invalid_spring_size_change = workspace.array("spring_invalid_size_change", (n_springs, 1), bool)  # S, 1
+    np.less_equal(np.abs(spring_size_change, out=squared[:, 0:1]), _EPSILON, out=invalid_spring_size_change)
+    np.copyto(spring_size_change, 0.0, where=invalid_spring_size_change)
+
+    spring_force_magnitude = np.multiply(spring_stiffness, spring_size_change, out=spring_size_change)  # S, 1
+    return np.multiply(spring_force_magnitude, spring_direction_vector, out=spring_direction_vector if out is None else out)  # S, 3
+
+
+def spring_forces(
+    vertices: np.ndarray,
+    spring_end_points: np.ndarray,
+    spring_resting_lengths: np.ndarray,
+    spring_stiffness: np.ndarray,
+    vertex_to_spring: IncidenceOperator,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[Workspace] = None,
+) -> np.ndarray:
+    """
+    Hooke's law on every spring, accumulated onto vertices (V, 3). Changes below _EPSILON are ignored.
+    With a workspace every temporary is written in place, so no array is allocated.
+    """
+    if workspace is None:
+        workspace = Workspace()
+    spring_force = spring_force_vectors(vertices, spring_end_points, spring_resting_lengths, spring_stiffness, workspace=workspace)  # S, 3
+    return vertex_to_spring.matmul(spring_force, out=out, workspace=workspace)  # V, 3
+
+
+def normalize_rows(vectors: np.ndarray, workspace: Workspace) -> np.ndarray:
+    """ vectors (N, 3) /= np.linalg.norm(vectors, axis=1, keepdims=True), in place and with the same sums """
+    lengths = workspace.array("row_lengths", (vectors.shape[0], 1))  # N, 1
+    squared = workspace.array("row_squared_component", (vectors.shape[0], 1))  # N, 1
+    np.multiply(vectors[:, 0:1], vectors[:, 0:1], out=lengths)
+    for k in (1, 2):
+        np.add(lengths, np.multiply(vectors[:, k:k + 1], vectors[:, k:k + 1], out=squared), out=lengths)
+    return np.divide(vectors, np.sqrt(lengths, out=lengths), out=vectors)
+
+
+def mesh_vertex_normals(
+    vertices: np.ndarray,
+    element_vertices: np.ndarray,
+    vertex_to_element: IncidenceOperator,
+    out: np.ndarray,
+    workspace: Workspace,
+) -> np.ndarray:
+    """ Normalized average of the incident triangles' normals per vertex (V, 3) into out, temporaries in the workspace """
+    n_elements = element_vertices.shape[0]
+    # For each triangle, compute normal
+    triangles = workspace.array("element_triangles", (n_elements, 3, 3))  # nE, 3, 3
+    np.take(vertices, element_vertices, axis=0, out=triangles, mode="clip")
+    dir_01 = workspace.array("element_dir_01", (n_elements, 3))  # nE, 3
+    dir_12 = workspace.array("element_dir_12", (n_elements, 3))  # nE, 3
+    np.subtract(triangles[:, 1, :], triangles[:, 0, :], out=dir_01)
+    np.subtract(triangles[:, 2, :], triangles[:, 1, :], out=dir_12)
+    # np.cross(dir_01, dir_12), component by component
+    element_normals = workspace.array("element_normals", (n_elements, 3))  # nE, 3
+    product = workspace.array("element_cross_product", (n_elements, 1))  # nE, 1
+    for k, (i, j) in enumerate(((1, 2), (2, 0), (0, 1))):
+        np.multiply(dir_01[:, i:i + 1], dir_12[:, j:j + 1], out=element_normals[:, k:k + 1])
+        np.multiply(dir_01[:, j:j + 1], dir_12[:, i:i + 1], out=product)
+        np.subtract(element_normals[:, k:k + 1], product, out=element_normals[:, k:k + 1])
+    normalize_rows(element_normals, workspace)  # E, 3
+    # Associate each vertex to all normals on incident triangles
+    vertex_normals = vertex_to_element.matmul(element_normals, out=out, workspace=workspace)  # V, 3
+    # Average normals per vertex
+    normalize_rows(vertex_normals, workspace)  # V, 3
+    return vertex_normals
+
+
 class SpringMassGridSquare(Square):
     gravity_coefficient: float = 0.1
+    # For each vertex (i, j): we have a few springs...
+    # uniquely, (i, j) attaches to (i+1, j), (i, j+1), (i+1, j+1), (i-1, j+1) and, for bending, (i+2, j), (i, j+2)
+    spring_end_point_offsets: Tuple[Tuple[int, int], ...] = ((1, 0), (0, 1), (1, 1), (-1, 1), (2, 0), (0, 2))
+
     def __init__(
         self,
         side: float = 0.1,
@@ -23,7 +137,14 @@ class SpringMassGridSquare(Square):
         init_spring_length_factor: float = 1.0,
         uniform_spring_stiffness: float = 50.0,
         damping_force_coefficient: float = 0.05,
-        wind_field: Optional[BaseField] = None,
+        wind_field: Union[None, BaseField, Sequence[BaseField]] = None,
+        integrator: str = "explicit_euler",
+        integrator_kwargs: Optional[Dict[str, Any]] = None,
+        topology_cache_dir: Optional[str] = None,
+        self_collision_kwargs: Optional[Dict[str, Any]] = None,
+        obstacles: Optional[Sequence[Dict[str, Any]]] = None,
+        backend: str = "numpy",
+        backend_kwargs: Optional[Dict[str, Any]] = None,
     ):
         super().__init__(
             side=side,
@@ -31,79 +152,87 @@ class SpringMassGridSquare(Square):
             texture_bounds=texture_bounds,
             static_normals=False,
             t0=None,
+            topology_cache_dir=topology_cache_dir,
         )
+        # scratch arrays of force() and the integrators: allocated on the first step, reused by every later one
+        self.workspace = Workspace()
         self.init_spring_length_factor = init_spring_length_factor
         self.uniform_spring_stiffness = uniform_spring_stiffness
         self.damping_force_coefficient = damping_force_coefficient
         self.fixed_vertices = [0, n_points_per_side - 1]
-        self.wind_field = wind_field
+        # several fields are summed, each evaluated only inside its bounding box
+        self.wind_field = CompositeField(wind_field) if isinstance(wind_field, (list, tuple)) else wind_field
+        self.integrator = IntegratorRegistry[integrator](**(integrator_kwargs or {}))
+        # computes force() and, fused, explicit Euler steps; "numba" falls back to "numpy" without numba
+        self.backend = make_backend(backend, backend_kwargs)
 
-        # Make vertex-to-element array where v2e[i, j] > 0 if vertex i is in element j
+        # Topology only depends on the grid, so it can come from the on-disk cache
+        topology = self.cached_topology(
+            "spring_mass_grid",
+            [n_points_per_side, [list(offset) for offset in self.spring_end_point_offsets]],
+            self.compute_topology,
+        )
+
+        # Make vertex-to-element operator where v2e[i, j] > 0 if vertex i is in element j
         # value of v2e[i, j] is 1 / ( \sum_j v2e[i, j] )
-        self.vertex_to_element = np.zeros((self.vertices.shape[0], self.elements.shape[0]), dtype=np.float32)
-        for j in range(self.elements.shape[0]):
-            for i in self.elements[j, :]:
-                self.vertex_to_element[i, j] = 1.0
-        self.vertex_to_element /= self.vertex_to_element.sum(axis=1, keepdims=True)
+        # stored sparsely - a dense (V, E) matrix is gigabytes for large grids
+        self.vertex_to_element = IncidenceOperator.from_arrays(
+            topology, "vertex_to_element", (self.vertices.shape[0], self.elements.shape[0]),
+        )
 
-        self.init_springs()
+        self.init_springs(topology)
 
         # TODO: make mass a property based on gsm
         self.mass_per_vertex = mass
+        self._mass = np.full((self.vertices.shape[0], 1), mass, dtype=np.float32)  # V, 1
         self.velocity = np.zeros_like(self.vertices)
         self.acceleration = np.zeros_like(self.vertices)
 
+        # None: no self collision handling
+        self.self_collision = None
+        if self_collision_kwargs is not None:
+            self.self_collision = SelfCollision(**self_collision_kwargs)
+            self.self_collision.attach(self)
+
+        # static meshes the cloth can't enter, each given as MeshObstacle.from_obj kwargs, e.g.
+        # {"obj_path": "icosphere.obj", "scale": 0.1, "translation": [0.25, -0.4, 0.0]}
+        self.obstacles = [MeshObstacle.from_obj(**obstacle_kwargs) for obstacle_kwargs in (obstacles or [])]
+
         self.t = None
         logger.info(f"Updating {self.__class__} to {t0=}")
         self.update(t0)
 
-    def init_springs(self) -> None:
+    def compute_topology(self) -> Dict[str, np.ndarray]:
+        n_vertices = self.vertices.shape[0]
+        spring_end_points = SpringMassGridSquare.grid_springs(self.n_points_per_side, self.spring_end_point_offsets)
+        return {
+            "spring_end_points": spring_end_points,
+            **IncidenceOperator.vertex_to_element(self.elements, n_vertices).to_arrays("vertex_to_element"),
+            **IncidenceOperator.vertex_to_spring(spring_end_points, n_vertices).to_arrays("vertex_to_spring"),
+        }
+
+    @staticmethod
+    def grid_springs(n_points_per_side: int, offsets: Sequence[Tuple[int, int]]) -> np.ndarray:
+        """ (S, 2) vertex indices: vertex (i, j) is attached to (i + di, j + dj) for each (di, dj) in offsets """
+        n = n_points_per_side
+        k = np.arange(n * n, dtype=np.int64)
+        i, j = np.divmod(k, n)
+        spring_ends = []
+        for di, dj in offsets:
+            valid = (i + di >= 0) & (i + di < n) & (j + dj >= 0) & (j + dj < n)
+            spring_ends.append(np.stack((k[valid], k[valid] + di * n + dj), axis=1))
+        return np.concatenate(spring_ends, axis=0)
+
+    def init_springs(self, topology: Optional[Dict[str, np.ndarray]] = None) -> None:
         """ Constructs variables needed for the spring part of this cloth simulation:
         spring_end_points (S, 2) int matrix like elements
         spring_resting_lengths (S, 1) float vector of initial length
         spring_stiffness (S, 1) float vector
-        vertex_to_spring (V, S): 2d array, ij = 1 if vertex i is first end point is spring j
+        vertex_to_spring (V, S): sparse operator, ij = 1 if vertex i is first end point of spring j, -1 if second
         """
-        # For each vertex (i, j): we have a few springs...
-        # uniquely, (i, j) attaches to (i+1, j), (i, j+1), (i+1, j+1), (i-1, j+1)
-        js = list(range(0, self.n_points_per_side))
-        ijs = np.array(list(itertools.product(js, js)), dtype=np.int)  # V, 2
-
-        def valid_vertex_indices(indices: np.ndarray, axis: int = -1) -> np.ndarray:
-            # indices: k dimensional array of indices, last axis is conjunctioned over
-            # output: k-1 dimensional boolean - True if valid else False
-            below_zero = indices < 0
-            above_n = indices >= self.n_points_per_side
-            invalid = np.any(below_zero | above_n, axis=axis)
-            return ~invalid
-
-        spring_ends = []
-        for spring_end_point_offset in [
-            [1, 0],
-            [0, 1],
-            [1, 1],
-            [-1, 1],
-            [2, 0],
-            [0, 2],
-        ]:
-            candidate_spring_end = ijs.copy()
-            for k, v in enumerate(spring_end_point_offset):
-                candidate_spring_end[:, k] += v
-            candidate_spring_end = np.concatenate((ijs, candidate_spring_end), axis=1)  # V, 4
-            spring_ends.append(candidate_spring_end[valid_vertex_indices(candidate_spring_end)])
-
-        valid_springs_ij = np.concatenate(
-            tuple(spring_ends),
-            axis=0,
-        )
-
-        self.spring_end_points = np.stack(
-            (
-                (valid_springs_ij[:, 0] * self.n_points_per_side) + valid_springs_ij[:, 1],
-                (valid_springs_ij[:, 2] * self.n_points_per_side) + valid_springs_ij[:, 3],
-            ),
-            axis=1
-        )
+        if topology is None:
+            topology = self.compute_topology()
+        self.spring_end_points = topology["spring_end_points"]
 
         spring_resting_lengths = self.vertices[self.spring_end_points]  # S, 2, 3
         self.spring_resting_lengths = self.init_spring_length_factor * np.linalg.norm(
@@ -113,71 +242,75 @@ class SpringMassGridSquare(Square):
         )  # S, 1
         self.spring_stiffness = self.uniform_spring_stiffness + np.zeros((spring_resting_lengths.shape[0], 1), dtype=np.float32)
 
-        self.vertex_to_spring = np.zeros((self.vertices.shape[0], self.spring_end_points.shape[0]), dtype=np.float32)
-        for j in range(self.spring_end_points.shape[0]):
-            self.vertex_to_spring[self.spring_end_points[j, 0], j] = 1
-            self.vertex_to_spring[self.spring_end_points[j, 1], j] = -1
+        self.vertex_to_spring = IncidenceOperator.from_arrays(
+            topology, "vertex_to_spring", (self.vertices.shape[0], self.spring_end_points.shape[0]),
+        )
 
     @property
     def mass(self) -> np.ndarray:
         # TODO: use g/m^2 and area per vertex?
-        return np.zeros((self.vertices.shape[0], 1), dtype=np.float32) + self.mass_per_vertex
+        # built once from mass_per_vertex, like the other cloth parameters
+        return self._mass
 
     @property  # Only a getter :)
     def vertex_normals(self) -> np.ndarray:
-        # For each triangle, compute normal
-        triangles = self.vertices[self.elements]  # nE, 3, 3
-        dir_01 = triangles[:, 1, :] - triangles[:, 0, :]  # nE, 3
-        dir_12 = triangles[:, 2, :] - triangles[:, 1, :]  # nE, 3
-        element_normals = np.cross(dir_01, dir_12)  # nE, 3 ... default axis=-1
-        element_normals /= np.linalg.norm(element_normals, axis=1, keepdims=True)  # E, 3
-        # Associate each vertex to all normals on incident triangles
-        vertex_normals = np.matmul(self.vertex_to_element, element_normals)  # V, 3
-        # Average normals per vertex
-        vertex_normals /= np.linalg.norm(vertex_normals, axis=1, keepdims=True)  # V, 3
-        return vertex_normals
+        return self.write_vertex_normals(np.empty_like(self.vertices))
 
-    def force(self) -> np.ndarray:
-        force = np.zeros_like(self.vertices, dtype=np.float32)  # V, 3
+    def write_vertex_normals(self, out: np.ndarray) -> np.ndarray:
+        """ Vertex normals (V, 3) into out, which may be a strided view (e.g. of the vertex buffer) """
+        return mesh_vertex_normals(self.vertices, self.element_vertices, self.vertex_to_element, out, self.workspace)
+
+    def external_force(self, rows: slice = slice(None), out: Optional[np.ndarray] = None, workspace: Optional[Workspace] = None) -> np.ndarray:
+        """
+        Everything but the springs: gravity, damping and wind. Fixed vertices are not clamped here.
+        Only for the vertices in `rows` (e.g. one thread's chunk), into out and with temporaries in workspace if given.
+        """
+        workspace = self.workspace if workspace is None else workspace
+        vertices = self.vertices[rows]  # R, 3
+        force = workspace.array("force", vertices.shape) if out is None else out  # R, 3
+        force.fill(0)
+        scratch = workspace.array("vertex_scratch", vertices.shape)  # R, 3
 
         # gravity
-        force[:, 1] -= self.gravity_coefficient * self.mass[:, 0]
+        gravity = np.multiply(self.mass[rows, 0], self.gravity_coefficient, out=scratch[:, 0])
+        np.subtract(force[:, 1], gravity, out=force[:, 1])
 
         # damping
-        force[:, :] -= self.damping_force_coefficient * self.velocity
-
-        # springs
-        spring_end_pos_3d = self.vertices[self.spring_end_points]  # S, 2, 3
-
-        spring_displacement = spring_end_pos_3d[:, 1, :] - spring_end_pos_3d[:, 0, :]  # S, 3
-        spring_lengths = np.linalg.norm(spring_displacement, axis=1, keepdims=True)  # S, 1
-        spring_direction_vector = spring_displacement / spring_lengths  # S, 3
-
-        spring_size_change = spring_lengths - self.spring_resting_lengths
-        spring_size_change_norm = np.linalg.norm(spring_size_change, axis=1, keepdims=True)  # S, 1
-        valid_spring_size_change = (spring_size_change_norm > _EPSILON).astype(np.float32)
-        spring_size_change = spring_size_change * valid_spring_size_change
-
-        spring_force_magnitude = self.spring_stiffness * spring_size_change  # S, 1
-        spring_force = spring_force_magnitude * spring_direction_vector  # S, 3
-        force += np.matmul(self.vertex_to_spring, spring_force)  # V, 3
+        np.subtract(force, np.multiply(self.velocity[rows], self.damping_force_coefficient, out=scratch), out=force)
 
         if self.wind_field is not None:
-            force += self.wind_field.get_force_field(self.vertices)
-
-        # clamp top two corners
-        for vertex in self.fixed_vertices:
-            force[vertex, :] = 0
+            self.wind_field.accumulate(vertices, self.t, force, workspace)
 
         return force
 
+    def spring_force(self) -> np.ndarray:
+        """ Hooke's law on every spring, summed onto vertices (V, 3) - a workspace array """
+        return spring_forces(
+            self.vertices,
+            self.spring_end_points,
+            self.spring_resting_lengths,
+            self.spring_stiffness,
+            self.vertex_to_spring,
+            out=self.workspace.array("spring_force", self.vertices.shape),
+            workspace=self.workspace,
+        )  # V, 3
+
+    def force(self) -> np.ndarray:
+        """ Total force (V, 3), fixed vertices clamped - a workspace array, overwritten by the next call """
+        with profiler.scope("force"):
+            return self.backend.force(self)
+
     def update(self, t: float) -> None:
         if self.t is not None:
             dt = t - self.t
-            force = self.force()
-            self.acceleration = force / self.mass
-            self.velocity = self.velocity + (dt * self.acceleration)
-            self.vertices = self.vertices + (dt * self.velocity)
-            logger.debug(f"Iteration stats: {dt=} {np.linalg.norm(self.velocity)=} {np.linalg.norm(self.acceleration)=} {np.linalg.norm(force)=}")
+            with profiler.scope("integrate"):
+                self.integrator.step(self, dt)
+            if self.self_collision is not None:
+                with profiler.scope("self_collision"):
+                    self.self_collision.apply(self)
+            if self.obstacles:
+                with profiler.scope("obstacles"):
+                    for obstacle in self.obstacles:
+                        obstacle.apply(self)
         self.t = t
         return super().update(t)
\ No newline at end of file
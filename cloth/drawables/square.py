@@ -1,15 +1,16 @@
-from OpenGL.GL import *
-from OpenGL.arrays.vbo import VBO
-
+# OpenGL is imported lazily in create_buffers/draw so that simulation-only code never needs a GL install
+import ctypes
 import numpy as np
-import itertools
 from cloth.timeseries import AbsoluteSine
-from cloth.gl_texture import TextureBounds
-from typing import Optional
+from cloth.texture_bounds import TextureBounds
+from cloth.topology_cache import TopologyCache
+from typing import Optional, Any, Callable, Dict
 from cloth.drawables.base_drawable import BaseDrawable
+from cloth.profiler import get_profiler
 import logging
 
 logger = logging.getLogger(__name__)
+profiler = get_profiler()
 
 
 class Square(BaseDrawable):
@@ -20,8 +21,11 @@ class Square(BaseDrawable):
         texture_bounds: Optional[TextureBounds] = None,
         static_normals: bool = True,
         t0: Optional[float] = 0.0,
+        topology_cache_dir: Optional[str] = None,
     ):
         self.n_points_per_side = n_points_per_side
+        # None: recompute topology every time
+        self.topology_cache = None if topology_cache_dir is None else TopologyCache(topology_cache_dir)
         self.side = side
         s = side / 2.0
 
@@ -48,96 +52,148 @@ class Square(BaseDrawable):
             logger.info(f"created texture_coords with {self.texture_coords.shape=}")
         self.use_texture = use_texture
         self.init_elements()
+        # set by create_buffers; until then no renderer is attached and vertices_buffer is not maintained
+        self.vertices_vbo = None
+        self.vertices_buffer: Optional[np.ndarray] = None
+        self.vertices_buffer_dirty = False
         if t0 is not None:
             logger.info(f"Updated {self.__class__} to {t0=}")
             self.update(t0)
 
     def init_elements(self) -> None:
+        arrays = self.cached_topology(
+            "square_elements",
+            [self.n_points_per_side],
+            lambda: {"elements": Square.grid_elements(self.n_points_per_side)},
+        )
+        self.elements = arrays["elements"]
+        # np.take wants intp indices: converting the uint32 GL indices would cost a copy on every gather
+        self.element_vertices = self.elements.astype(np.intp)
+        logger.info(f"created elements with {self.elements.shape=}")
+
+    def cached_topology(self, name: str, key: Any, compute: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        if self.topology_cache is None:
+            return compute()
+        return self.topology_cache.get_or_compute(name, key, compute)
+
+    @staticmethod
+    def grid_elements(n_points_per_side: int) -> np.ndarray:
         # We produce elements in a fun 2-step process:
         # first, construct all possible triangles incident on the grid
         # vertex (i, j) induces two triangles: ((i, j), (i+1, j), (i, j+1)) and ((i, j), (i-1, j), (i, j-1))
         # vertex (i, j) = k = n*i + j, induces two triangles: (k, k+n, k+1) and (k, k-n, k-1)
-        # we use element k as (k, k+n, k+1) and element k+1 as (k, k-n, k-1)
-        n_vertices = self.vertices.shape[0]
-        n_points_per_side = self.n_points_per_side
-        k_array_repeated = np.repeat(np.array(list(range(0, n_vertices)), dtype=np.int), 2)  # use int to support sub
-        alternating_plus_minus_one = np.array([1 if (k % 2 == 0) else -1 for k in range(0, 2 * n_vertices)], dtype=np.int)
-        alternating_plus_minus_n = alternating_plus_minus_one * n_points_per_side
-        with_invalid_elements = np.stack((k_array_repeated, k_array_repeated + alternating_plus_minus_n , k_array_repeated + alternating_plus_minus_one), axis=-1)
+        # we use element 2k as (k, k+n, k+1) and element 2k+1 as (k, k-n, k-1)
+        n = n_points_per_side
+        k = np.arange(n * n, dtype=np.int64)  # use int to support sub
+        i, j = np.divmod(k, n)
+        with_invalid_elements = np.stack(
+            (
+                np.stack((k, k + n, k + 1), axis=-1),
+                np.stack((k, k - n, k - 1), axis=-1),
+            ),
+            axis=1,
+        )  # V, 2, 3
         # second, filter out triangles outside the grid
         # unfortunately, we can't filter by `k` because the constrains are in (i, j) space
-        # we construct 2 invalidity filters:
-        # CONDITION 0-edge: forall (i,j) if ij = 0, then second triangle ((i, j), (i-1, j), (i, j-1)) doesnt exist
-        lower_edge_condition = np.array(
-            [
-                (two_k % 2 == 0)  # first triangle is always fine
-                or (  # second triangle is fine if both i and j > 0
-                    (((two_k // 2) % n_points_per_side) != 0)  # j = 0
-                    and (((two_k // 2) // n_points_per_side) != 0)  # i = 0
-                )
-                for two_k in range(2 * n_vertices)
-            ],
-            dtype=bool
-        )
         # forall (i,j) if j = n-1 or i = n-1, then first triangle ((i, j), (i+1, j), (i, j+1)) doesnt exist
-        upper_edge_condition = np.array(
-            [
-                (two_k % 2 == 1)  # second triangle is always fine
-                or (  # first triangle is fine if both i and j < (n - 1)
-                    (((two_k // 2) % n_points_per_side) < (n_points_per_side - 1))  # j = 0
-                    and (((two_k // 2) // n_points_per_side) < (n_points_per_side - 1))  # i = 0
-                )
-                for two_k in range(2 * n_vertices)
-            ],
-            dtype=bool
-        )
+        # forall (i,j) if i = 0 or j = 0, then second triangle ((i, j), (i-1, j), (i, j-1)) doesnt exist
+        valid = np.stack(
+            (
+                (i < n - 1) & (j < n - 1),
+                (i > 0) & (j > 0),
+            ),
+            axis=1,
+        )  # V, 2
         # apply them filters
-        self.elements = with_invalid_elements[(lower_edge_condition & upper_edge_condition), :].astype(np.uint32)
-        logger.info(f"created elements with {self.elements.shape=}")
+        return with_invalid_elements[valid].astype(np.uint32)
 
     def update(self, t_seconds: float) -> None:
-        # Just update vertices
-        self.vertices_buffer = self.vertices
-        # add in normals
-        self.vertices_buffer = np.concatenate((self.vertices_buffer, self.vertex_normals), axis=1)
-        if self.use_texture:
-            self.vertices_buffer = np.concatenate(
-                (self.vertices_buffer, self.texture_coords),
-                axis=1,
-            )
-        self.vertices_buffer = self.vertices_buffer.flatten()
+        if self.vertices_vbo is None:
+            # headless: nothing will read vertices_buffer
+            return
+        self.update_vertices_buffer()
+
+    def update_vertices_buffer(self) -> None:
+        # Interleaved (V, 6) [position, normal] - the only per-frame data. Texture coords never change
+        # and live in their own static VBO. Allocated once, then written in place.
+        if self.vertices_buffer is None:
+            self.vertices_buffer = np.empty((self.vertices.shape[0], 6), dtype=np.float32)
+        with profiler.scope("normals"):
+            self.write_vertex_normals(self.vertices_buffer[:, 3:6])
+        with profiler.scope("buffer_build"):
+            self.vertices_buffer[:, 0:3] = self.vertices
+        self.vertices_buffer_dirty = True
+
+    def write_vertex_normals(self, out: np.ndarray) -> np.ndarray:
+        """ Vertex normals (V, 3) into out; simulated cloths compute them in place instead of copying """
+        np.copyto(out, self.vertex_normals)
+        return out
 
     def create_buffers(self) -> None:
-        self.vertices_vbo = VBO(self.vertices_buffer, usage='GL_DYNAMIC_DRAW')
-        self.vertices_vbo.create_buffers()
-        self.vertices_ebo = VBO(self.elements, usage='GL_STATIC_DRAW', target='GL_ELEMENT_ARRAY_BUFFER')
-        self.vertices_ebo.create_buffers()
-        # bind VBO then buffer into GL
-        self.vertices_vbo.bind()
-        self.vertices_vbo.copy_data()
-        self.vertices_ebo.bind()
-        self.vertices_ebo.copy_data()
+        from OpenGL.GL import glGenBuffers, glBindBuffer, glBufferData, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_STREAM_DRAW, GL_STATIC_DRAW
 
+        self.update_vertices_buffer()
+
+        # dynamic: positions and normals, re-specified every frame
+        self.vertices_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertices_vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices_buffer.nbytes, self.vertices_buffer, GL_STREAM_DRAW)
+        self.vertices_buffer_dirty = False
+
+        # static: texture coordinates, uploaded once
+        if self.use_texture:
+            self.texture_coords_vbo = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.texture_coords_vbo)
+            glBufferData(GL_ARRAY_BUFFER, self.texture_coords.nbytes, self.texture_coords, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.vertices_ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.vertices_ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.elements.nbytes, self.elements, GL_STATIC_DRAW)
+        self.bind_attributes()
+
+    def bind_attributes(self) -> None:
+        """ Points the bound VAO's attributes and element buffer at this drawable's buffers """
+        from OpenGL.GL import (
+            glBindBuffer, glVertexAttribPointer, glEnableVertexAttribArray,
+            GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_FLOAT, GL_FALSE,
+        )
+
+        float_size = ctypes.sizeof(ctypes.c_float)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertices_vbo)
         # arguments: index, size, type, normalized, stride, pointer
-        stride = (
-            self.vertices.shape[1] + self.vertex_normals.shape[1] + self.texture_coords.shape[1]
-        ) * ctypes.sizeof(ctypes.c_float)
+        stride = self.vertices_buffer.shape[1] * float_size
         glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
         glEnableVertexAttribArray(0)
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(3 * ctypes.sizeof(ctypes.c_float)))
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(3 * float_size))
         glEnableVertexAttribArray(1)
-        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(6 * ctypes.sizeof(ctypes.c_float)))
-        glEnableVertexAttribArray(2)
+        if self.use_texture:
+            glBindBuffer(GL_ARRAY_BUFFER, self.texture_coords_vbo)
+            glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, self.texture_coords.shape[1] * float_size, ctypes.c_void_p(0))
+            glEnableVertexAttribArray(2)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        # element buffer binding is recorded in the bound VAO
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.vertices_ebo)
 
     def draw(self) -> None:
-        self.vertices_vbo.set_array(self.vertices_buffer)
-        self.vertices_vbo.bind()
-        self.vertices_vbo.copy_data()
-        self.vertices_vbo.unbind()
+        from OpenGL.GL import (
+            glBindBuffer, glBufferData, glBufferSubData, glDrawElements,
+            GL_ARRAY_BUFFER, GL_STREAM_DRAW, GL_TRIANGLES, GL_UNSIGNED_INT,
+        )
+
+        if self.vertices_buffer_dirty:
+            with profiler.scope("upload"):
+                glBindBuffer(GL_ARRAY_BUFFER, self.vertices_vbo)
+                # orphan the old storage so the driver doesn't stall on a buffer still in use by the previous frame
+                glBufferData(GL_ARRAY_BUFFER, self.vertices_buffer.nbytes, None, GL_STREAM_DRAW)
+                glBufferSubData(GL_ARRAY_BUFFER, 0, self.vertices_buffer.nbytes, self.vertices_buffer)
+                glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.vertices_buffer_dirty = False
         # draw vertices
-        glDrawElements(
-            GL_TRIANGLES,
-            self.elements.size,
-            GL_UNSIGNED_INT,
-            ctypes.c_void_p(0),
-        )
\ No newline at end of file
+        with profiler.scope("draw"):
+            glDrawElements(
+                GL_TRIANGLES,
+                self.elements.size,
+                GL_UNSIGNED_INT,
+                ctypes.c_void_p(0),
+            )
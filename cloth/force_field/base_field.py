@@ -1,6 +1,67 @@
 import numpy as np
+from typing import Optional, Tuple
+from cloth.workspace import Workspace
+
+
+# Axis aligned box (lower corner (3,), upper corner (3,)); components may be +-inf
+BoundingBox = Tuple[np.ndarray, np.ndarray]
 
 
 class BaseField:
-    def get_force_field(self, *args, **kwargs) -> np.ndarray:
-        ...
\ No newline at end of file
+    """
+    Subclasses implement get_force_field(query, t) -> (V, 3) force at each query point and, if the force is
+    zero outside some region, bounding_box(t) so that evaluate() can skip the points outside of it.
+    Fields on the per-step path can also override accumulate() to add themselves without allocating.
+    """
+    # below this fraction of points inside the box, gathering the inside points is cheaper than evaluating all
+    cull_fraction: float = 0.5
+
+    def get_force_field(self, query: np.ndarray, t: Optional[float] = None) -> np.ndarray:
+        ...
+
+    def bounding_box(self, t: Optional[float] = None) -> Optional[BoundingBox]:
+        # None: the field may be non-zero anywhere
+        return None
+
+    def evaluate(self, query: np.ndarray, t: Optional[float] = None) -> np.ndarray:
+        """ get_force_field, evaluated only for the query points inside bounding_box (zero elsewhere) """
+        box = self.bounding_box(t)
+        if box is None:
+            return self.get_force_field(query, t)
+        lower, upper = box
+        inside = np.flatnonzero(np.all((query >= lower) & (query <= upper), axis=1))
+        if inside.shape[0] > self.cull_fraction * query.shape[0]:
+            return self.get_force_field(query, t)
+        force = np.zeros(query.shape, dtype=np.float32)
+        if inside.shape[0] > 0:
+            force[inside] = self.get_force_field(query[inside], t)
+        return force
+
+    def accumulate(self, query: np.ndarray, t: Optional[float], out: np.ndarray, workspace: Optional[Workspace] = None) -> None:
+        """ out += evaluate(query, t); fields that override this write their temporaries into the workspace """
+        np.add(out, self.evaluate(query, t), out=out)
+
+    def inside_bounding_box(self, query: np.ndarray, t: Optional[float], workspace: Workspace) -> Optional[np.ndarray]:
+        """ evaluate()'s culling mask (V,) as a workspace array, None if the field is unbounded """
+        box = self.bounding_box(t)
+        if box is None:
+            return None
+        lower, upper = box
+        n_points = query.shape[0]
+        inside = workspace.array("field_inside", (n_points,), bool)  # V
+        within = workspace.array("field_within", (n_points,), bool)  # V
+        inside.fill(True)
+        for k in range(query.shape[1]):
+            np.logical_and(inside, np.greater_equal(query[:, k], lower[k], out=within), out=inside)
+            np.logical_and(inside, np.less_equal(query[:, k], upper[k], out=within), out=inside)
+        return inside
+
+
+def union_bounding_box(boxes) -> Optional[BoundingBox]:
+    """ Smallest box containing all boxes; None if any of them is None (unbounded) """
+    boxes = list(boxes)
+    if len(boxes) == 0 or any(box is None for box in boxes):
+        return None
+    lower = np.min(np.stack([box[0] for box in boxes]), axis=0)
+    upper = np.max(np.stack([box[1] for box in boxes]), axis=0)
+    return lower, upper
@@ -0,0 +1,37 @@
+import numpy as np
+from typing import Optional, Sequence
+from cloth.workspace import Workspace
+from .base_field import BaseField, BoundingBox, union_bounding_box
+
+
+class CompositeField(BaseField):
+    """
+    Sum of several fields: f(x, t) = sum_i f_i(x, t)
+    Each field is culled against its own bounding box, so many small gusts/emitters stay cheap.
+    """
+
+    def __init__(self, fields: Sequence[BaseField]):
+        self.fields = list(fields)
+
+    def get_force_field(self, query: np.ndarray, t: Optional[float] = None) -> np.ndarray:
+        force = np.zeros(query.shape, dtype=np.float32)
+        for field in self.fields:
+            force += field.evaluate(query, t)
+        return force
+
+    def bounding_box(self, t: Optional[float] = None) -> Optional[BoundingBox]:
+        return union_bounding_box(field.bounding_box(t) for field in self.fields)
+
+    def accumulate(self, query: np.ndarray, t: Optional[float], out: np.ndarray, workspace: Optional[Workspace] = None) -> None:
+        if workspace is None:
+            return super().accumulate(query, t, out)
+        # summed on their own first, like get_force_field; named per instance so nested composites don't share it
+        force = workspace.array(f"composite_force_{id(self)}", query.shape)  # V, 3
+        force.fill(0)
+        for field in self.fields:
+            field.accumulate(query, t, force, workspace)
+        np.add(out, force, out=out)
+
+    def evaluate(self, query: np.ndarray, t: Optional[float] = None) -> np.ndarray:
+        # culling happens per field, a box around all of them would only cull less
+        return self.get_force_field(query, t)
@@ -0,0 +1,25 @@
+import numpy as np
+from typing import Optional
+from .base_field import BaseField, BoundingBox
+
+
+class ModulatedField(BaseField):
+    """
+    A field scaled by a schedule over time: f(x, t) = schedule.sample(t) * field(x, t)
+    where schedule is anything with .sample(time_seconds) -> float, e.g. cloth.timeseries.AbsoluteSine.
+    """
+
+    def __init__(self, field: BaseField, schedule):
+        self.field = field
+        self.schedule = schedule
+
+    def get_force_field(self, query: np.ndarray, t: Optional[float] = None) -> np.ndarray:
+        if t is None:
+            raise ValueError(f"{self.__class__.__name__} needs the time t")
+        scale = self.schedule.sample(t)
+        if scale == 0.0:
+            return np.zeros(query.shape, dtype=np.float32)
+        return np.float32(scale) * self.field.get_force_field(query, t)
+
+    def bounding_box(self, t: Optional[float] = None) -> Optional[BoundingBox]:
+        return self.field.bounding_box(t)
@@ -2,7 +2,9 @@
 # point p at position x... surface has normal n
 
 import numpy as np
-from .base_field import BaseField
+from typing import Optional
+from cloth.workspace import Workspace
+from .base_field import BaseField, BoundingBox
 
 class WindCylinderField(BaseField):
     """
@@ -11,6 +13,9 @@ class WindCylinderField(BaseField):
 
     where |F| is the magnitude of force.
         it is 0 if x > r; otherwise it decays nicely from 1 to 0
+
+    With a `length`, the cylinder only extends from origin to origin + length * direction
+    and the force is 0 outside of it. That makes its bounding box finite along the axis too.
     """
 
     def __init__(
@@ -18,26 +23,80 @@ class WindCylinderField(BaseField):
         origin: np.ndarray,
         direction: np.ndarray,
         radius: float,
-        coefficient: float = 1.0
+        coefficient: float = 1.0,
+        length: Optional[float] = None,
     ):
         self.origin = origin
         self.direction = direction
         self.radius = radius
         self.coefficient = coefficient
+        self.length = length
+
+    def bounding_box(self, t: Optional[float] = None) -> Optional[BoundingBox]:
+        # a disk of radius r with unit normal d extends r * sqrt(1 - d_k^2) along axis k
+        disk_extent = self.radius * np.sqrt(np.clip(1.0 - self.direction**2, 0.0, 1.0))
+        if self.length is None:
+            # infinite along every axis the cylinder is not perpendicular to
+            along_axis = np.abs(self.direction) > 1e-6
+            lower = np.where(along_axis, -np.inf, self.origin - disk_extent)
+            upper = np.where(along_axis, np.inf, self.origin + disk_extent)
+            return lower, upper
+        end = self.origin + self.length * self.direction
+        return np.minimum(self.origin, end) - disk_extent, np.maximum(self.origin, end) + disk_extent
 
-    def get_force_field(self, query: np.ndarray) -> np.ndarray:
+    def get_force_field(self, query: np.ndarray, t: Optional[float] = None) -> np.ndarray:
         # query: V, 3 array of points
+        return self.write_force_field(query, np.empty(query.shape, dtype=np.float32), Workspace())
+
+    def write_force_field(self, query: np.ndarray, out: np.ndarray, workspace: Workspace, capacity: Optional[int] = None) -> np.ndarray:
+        """ get_force_field into out, temporaries in the workspace (sized for `capacity` points) """
         nVertices = query.shape[0]
-        displacement = query - self.origin
-        intersections = self.origin + self.direction * np.reshape(
-            np.einsum("vk,k->v", displacement, self.direction),
-            (nVertices, 1)
-        )
-        distance_from_axis = query - intersections  # V, 3
-        u = np.linalg.norm(distance_from_axis, axis=1, keepdims=True) / self.radius  # V
-        u = np.clip(u, 0.0, 1.0)
-        u = 3 * (1 - u)**2 - 2 * (1 - u)**3
-        return self.coefficient * u * self.direction  # V, 3?
+        capacity = nVertices if capacity is None else capacity
+        displacement = np.subtract(query, self.origin, out=workspace.rows("wind_displacement", nVertices, capacity, (3,)))
+        projection = workspace.rows("wind_projection", nVertices, capacity, (1,))  # V, 1
+        np.einsum("vk,k->v", displacement, self.direction, out=projection[:, 0])
+        intersections = workspace.rows("wind_intersections", nVertices, capacity, (3,))  # V, 3
+        np.add(self.origin, np.multiply(self.direction, projection, out=intersections), out=intersections)
+        distance_from_axis = np.subtract(query, intersections, out=intersections)  # V, 3
+        # |distance_from_axis| / r, summed column by column like np.linalg.norm
+        squared = np.multiply(distance_from_axis, distance_from_axis, out=distance_from_axis)
+        u = np.add(squared[:, 0:1], squared[:, 1:2], out=workspace.rows("wind_u", nVertices, capacity, (1,)))  # V, 1
+        np.add(u, squared[:, 2:3], out=u)
+        np.divide(np.sqrt(u, out=u), self.radius, out=u)
+        np.clip(u, 0.0, 1.0, out=u)
+        # 3 * (1 - u)**2 - 2 * (1 - u)**3
+        falloff = np.subtract(1, u, out=u)
+        cube = np.power(falloff, 3, out=projection)
+        np.multiply(2, cube, out=cube)
+        u = np.subtract(np.multiply(3, np.square(falloff, out=u), out=u), cube, out=u)
+        if self.length is not None:
+            along = np.matmul(displacement, self.direction, out=projection[:, 0])  # V
+            outside = workspace.rows("wind_outside", nVertices, capacity, (1,), bool)  # V, 1
+            beyond = workspace.rows("wind_beyond", nVertices, capacity, (1,), bool)  # V, 1
+            np.less(along, 0.0, out=outside[:, 0])
+            np.logical_or(outside[:, 0], np.greater(along, self.length, out=beyond[:, 0]), out=outside[:, 0])
+            # u >= 0, so zeroing is the same as multiplying by the inside mask
+            np.copyto(u, 0.0, where=outside)
+        return np.multiply(np.multiply(self.coefficient, u, out=u), self.direction, out=out)  # V, 3
+
+    def accumulate(self, query: np.ndarray, t: Optional[float], out: np.ndarray, workspace: Optional[Workspace] = None) -> None:
+        """ out += evaluate(query, t) without allocating: culled points are packed into the workspace and back """
+        if workspace is None:
+            return super().accumulate(query, t, out)
+        n_points = query.shape[0]
+        inside = self.inside_bounding_box(query, t, workspace)
+        n_inside = np.count_nonzero(inside)
+        force = workspace.array("wind_force", query.shape)  # V, 3
+        if n_inside > self.cull_fraction * n_points:
+            np.add(out, self.write_force_field(query, force, workspace), out=out)
+        elif n_inside > 0:
+            inside_query = np.compress(inside, query, axis=0, out=workspace.rows("wind_inside_query", n_inside, n_points, (3,)))
+            inside_force = self.write_force_field(inside_query, force[:n_inside], workspace, capacity=n_points)
+            inside_out = np.compress(inside, out, axis=0, out=workspace.rows("wind_inside_out", n_inside, n_points, (3,)))
+            np.add(inside_out, inside_force, out=inside_out)
+            inside_components = workspace.array("wind_inside_components", query.shape, bool)  # V, 3
+            np.copyto(inside_components, inside[:, None])
+            np.place(out, inside_components, inside_out)
 
 
 if __name__ == "__main__":
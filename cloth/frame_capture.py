@@ -0,0 +1,116 @@
+""" Asynchronous frame capture: PBO readback on the render thread, encoding on a thread pool. """
+import ctypes
+import queue
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Optional, Tuple
+from OpenGL.GL import *
+import numpy as np
+from cloth.frame_sinks import BaseFrameSink
+from cloth.profiler import get_profiler
+
+
+logger = logging.getLogger()
+profiler = get_profiler()
+
+
+class AsyncFrameCapture:
+    """
+    with graphics_api.create_window():
+        capture = AsyncFrameCapture(width, height)
+        ... per frame:
+        capture.capture(frame_sink, frame_index)
+        ...
+        capture.close()  # graphics_api does this when create_window() exits
+
+    glReadPixels into a pixel-pack buffer object returns immediately; the PBO is only mapped `n_pbos - 1` frames
+    later, by which time the GPU has finished the transfer. Mapped pixels are copied into one of `max_pending`
+    preallocated numpy buffers and handed to a pool of `n_workers` threads that flip them and write them to the sink
+    (PIL releases the GIL while encoding). Ordered sinks (video streams) get a single dedicated writer thread instead.
+    When all buffers are in flight, capture() blocks - that is the backpressure.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        n_pbos: int = 3,
+        n_workers: int = 4,
+        max_pending: int = 8,
+    ):
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height * 3  # RGB
+        self.pbos = glGenBuffers(n_pbos) if n_pbos > 1 else [glGenBuffers(1)]
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.frame_bytes, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        # rows are tightly packed - width * 3 need not be a multiple of 4
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+
+        # (sink, frame_index) of the frame currently in flight in each PBO
+        self.in_flight: List[Optional[Tuple[BaseFrameSink, int]]] = [None] * len(self.pbos)
+        self.next_pbo = 0
+
+        self.free_buffers: "queue.Queue[np.ndarray]" = queue.Queue()
+        for _ in range(max_pending):
+            self.free_buffers.put(np.empty((height, width, 3), dtype=np.uint8))
+        self.executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="frame_encoder")
+        self.ordered_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame_writer")
+        self.pending: List[Future] = []
+
+    def capture(self, frame_sink: BaseFrameSink, frame_index: int) -> None:
+        # Kick off readback of the current frame
+        pbo_index = self.next_pbo
+        with profiler.scope("readback"):
+            if self.in_flight[pbo_index] is not None:
+                # this PBO still holds the oldest frame: retire it first
+                self.retire(pbo_index)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[pbo_index])
+            glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.in_flight[pbo_index] = (frame_sink, frame_index)
+        self.next_pbo = (pbo_index + 1) % len(self.pbos)
+
+    def retire(self, pbo_index: int) -> None:
+        """ Map a PBO, copy pixels into a free buffer and hand it to the encoders """
+        frame_sink, frame_index = self.in_flight[pbo_index]
+        pixels = self.free_buffers.get()  # blocks if encoders are behind
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[pbo_index])
+        pointer = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.frame_bytes, GL_MAP_READ_BIT)
+        ctypes.memmove(pixels.ctypes.data, pointer, self.frame_bytes)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.in_flight[pbo_index] = None
+
+        self.pending = [future for future in self.pending if not future.done() or future.exception() is not None]
+        executor = self.ordered_executor if frame_sink.ordered else self.executor
+        self.pending.append(executor.submit(self.encode, pixels, frame_sink, frame_index))
+
+    def encode(self, pixels: np.ndarray, frame_sink: BaseFrameSink, frame_index: int) -> None:
+        try:
+            # on an encoder thread: a top-level "encode" scope, accounted to the frame during which it finishes
+            with profiler.scope("encode"):
+                # Flip vertically (OpenGL origin is bottom left, numpy origin is top left)
+                frame_sink.write(np.flip(pixels, 0), frame_index)
+        finally:
+            self.free_buffers.put(pixels)
+
+    def flush(self) -> None:
+        """ Retire every PBO in submission order and wait for all encoders. Needs the GL context. """
+        for offset in range(len(self.pbos)):
+            pbo_index = (self.next_pbo + offset) % len(self.pbos)
+            if self.in_flight[pbo_index] is not None:
+                self.retire(pbo_index)
+        for future in self.pending:
+            future.result()  # re-raises encoder errors
+        self.pending = []
+
+    def close(self) -> None:
+        self.flush()
+        self.executor.shutdown(wait=True)
+        self.ordered_executor.shutdown(wait=True)
+        glDeleteBuffers(len(self.pbos), self.pbos)
+        self.pbos = []
+        self.in_flight = []
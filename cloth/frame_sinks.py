@@ -0,0 +1,126 @@
+""" Frame sinks: where rendered frames go. All sinks take (H, W, 3) uint8 RGB frames, top row first. """
+import os
+import logging
+import subprocess
+from typing import Optional, List
+import numpy as np
+from PIL import Image
+
+
+logger = logging.getLogger()
+
+
+class BaseFrameSink:
+    """
+    with SomeSink(...) as sink:
+        sink.write(pixels, frame_index)
+
+    `ordered` sinks must receive frames in order from a single thread (video streams);
+    unordered sinks may be written to concurrently (one file per frame).
+    """
+    ordered: bool = True
+
+    def write(self, pixels: np.ndarray, frame_index: int) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "BaseFrameSink":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class ImageDirectorySink(BaseFrameSink):
+    """ One image file per frame: {output_dir}/frame_{i}.{extension} - the original output mode """
+    ordered = False
+
+    def __init__(self, output_dir: str, extension: str = "jpg"):
+        self.output_dir = output_dir
+        self.extension = extension
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, pixels: np.ndarray, frame_index: int) -> None:
+        Image.fromarray(pixels).save(os.path.join(self.output_dir, f"frame_{frame_index}.{self.extension}"))
+
+
+class Y4mSink(BaseFrameSink):
+    """ Uncompressed YUV4MPEG2 (4:4:4, BT.601 full range) written incrementally - no encoder needed.
+    Playable by ffplay/mpv and losslessly transcodable later.
+    """
+
+    def __init__(self, path: str, fps: int = 30):
+        self.path = path
+        self.fps = fps
+        self.file = None
+        self.planes: Optional[np.ndarray] = None
+
+    def write(self, pixels: np.ndarray, frame_index: int) -> None:
+        height, width, _ = pixels.shape
+        if self.file is None:
+            self.file = open(self.path, "wb")
+            self.file.write(f"YUV4MPEG2 W{width} H{height} F{self.fps}:1 Ip A1:1 C444 XCOLORRANGE=FULL\n".encode("ascii"))
+            self.planes = np.empty((3, height, width), dtype=np.uint8)
+        rgb = pixels.astype(np.float32)
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        y = 0.299 * r + 0.587 * g + 0.114 * b
+        np.clip(y + 0.5, 0, 255, out=self.planes[0], casting="unsafe")
+        np.clip(0.564 * (b - y) + 128.5, 0, 255, out=self.planes[1], casting="unsafe")
+        np.clip(0.713 * (r - y) + 128.5, 0, 255, out=self.planes[2], casting="unsafe")
+        self.file.write(b"FRAME\n")
+        self.file.write(self.planes.tobytes())
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class FfmpegVideoSink(BaseFrameSink):
+    """ Pipes raw rgb24 frames into an ffmpeg subprocess: a single (lossy only once) encode, no intermediate files """
+
+    def __init__(
+        self,
+        path: str,
+        fps: int = 30,
+        ffmpeg_path: str = "ffmpeg",
+        codec_args: Optional[List[str]] = None,
+    ):
+        self.path = path
+        self.fps = fps
+        self.ffmpeg_path = ffmpeg_path
+        self.codec_args = codec_args if codec_args is not None else ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+        self.process: Optional[subprocess.Popen] = None
+
+    def write(self, pixels: np.ndarray, frame_index: int) -> None:
+        height, width, _ = pixels.shape
+        if self.process is None:
+            command = [
+                self.ffmpeg_path, "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(self.fps),
+                "-i", "-",
+                *self.codec_args,
+                self.path,
+            ]
+            logger.info(f"Starting encoder {command=}")
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self.process.stdin.write(np.ascontiguousarray(pixels).data)
+
+    def close(self) -> None:
+        if self.process is not None:
+            self.process.stdin.close()
+            if (returncode := self.process.wait()) != 0:
+                raise RuntimeError(f"ffmpeg exited with {returncode=} while writing {self.path}")
+            self.process = None
+
+
+def make_frame_sink(output: str, fps: int = 30, ffmpeg_path: str = "ffmpeg") -> BaseFrameSink:
+    """ .y4m -> Y4mSink, any other extension -> FfmpegVideoSink, no extension -> ImageDirectorySink """
+    extension = os.path.splitext(output)[1].lower()
+    if extension == "":
+        return ImageDirectorySink(output)
+    if extension == ".y4m":
+        return Y4mSink(output, fps=fps)
+    return FfmpegVideoSink(output, fps=fps, ffmpeg_path=ffmpeg_path)
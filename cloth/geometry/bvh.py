@@ -0,0 +1,269 @@
+""" Flattened, array-backed bounding volume hierarchy over primitives (e.g. triangles). """
+import logging
+import numpy as np
+from typing import Callable, Dict, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+def part1by2(x: np.ndarray) -> np.ndarray:
+    # spread the low 10 bits of x so that there are two zero bits between each
+    x = x.astype(np.uint32) & 0x000003FF
+    x = (x ^ (x << 16)) & 0xFF0000FF
+    x = (x ^ (x << 8)) & 0x0300F00F
+    x = (x ^ (x << 4)) & 0x030C30C3
+    x = (x ^ (x << 2)) & 0x09249249
+    return x
+
+
+def morton_codes(points: np.ndarray) -> np.ndarray:
+    """ 30 bit morton codes of points (N, 3), quantized within their bounding box """
+    lower = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - lower, np.finfo(np.float32).tiny)
+    quantized = np.clip(((points - lower) / extent) * 1023.0, 0, 1023).astype(np.uint32)  # N, 3
+    return (part1by2(quantized[:, 0]) << 2) | (part1by2(quantized[:, 1]) << 1) | part1by2(quantized[:, 2])
+
+
+def half_area(lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """ Half the surface area of boxes (..., 3) """
+    extent = upper - lower
+    return extent[..., 0] * extent[..., 1] + extent[..., 1] * extent[..., 2] + extent[..., 2] * extent[..., 0]
+
+
+class BVH:
+    """
+    Node i has bounds (lower[i], upper[i]). Internal nodes have children left[i], right[i];
+    leaves have left[i] == -1 and own primitive_order[start[i]: start[i] + count[i]]. Node 0 is the root.
+    primitive_lower/upper are the primitive boxes in that same (sorted) order.
+    """
+    array_names = (
+        "lower", "upper", "left", "right", "start", "count", "primitive_order", "primitive_lower", "primitive_upper",
+    )
+
+    def __init__(
+        self,
+        lower: np.ndarray,
+        upper: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        start: np.ndarray,
+        count: np.ndarray,
+        primitive_order: np.ndarray,
+        primitive_lower: np.ndarray,
+        primitive_upper: np.ndarray,
+        n_levels: int,
+    ):
+        self.lower = lower  # N, 3
+        self.upper = upper  # N, 3
+        self.left = left  # N
+        self.right = right  # N
+        self.start = start  # N
+        self.count = count  # N
+        self.primitive_order = primitive_order  # P
+        self.primitive_lower = primitive_lower  # P, 3
+        self.primitive_upper = primitive_upper  # P, 3
+        self.n_levels = n_levels  # longest root to leaf path, in nodes
+
+    @property
+    def n_nodes(self) -> int:
+        return self.lower.shape[0]
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        """ Flat dict of arrays, e.g. for np.save and mmap-ing in other processes """
+        arrays = {f"{prefix}_{name}": getattr(self, name) for name in BVH.array_names}
+        arrays[f"{prefix}_n_levels"] = np.asarray(self.n_levels)
+        return arrays
+
+    @staticmethod
+    def from_arrays(arrays: Dict[str, np.ndarray], prefix: str) -> "BVH":
+        return BVH(
+            *(arrays[f"{prefix}_{name}"] for name in BVH.array_names),
+            n_levels=int(arrays[f"{prefix}_n_levels"]),
+        )
+
+    @staticmethod
+    def build_lbvh(primitive_lower: np.ndarray, primitive_upper: np.ndarray, leaf_size: int = 4) -> "BVH":
+        """ Linear BVH: primitives sorted along a morton curve, ranges halved level by level (all vectorized) """
+        primitive_order = np.argsort(morton_codes(0.5 * (primitive_lower + primitive_upper)), kind="stable")
+        bvh = BVH.build_top_down(
+            primitive_lower,
+            primitive_upper,
+            primitive_order,
+            leaf_size,
+            lambda order, starts, counts: (order, counts // 2),
+        )
+        logger.info(f"Built LBVH with {bvh.n_nodes=} over {primitive_lower.shape[0]=}")
+        return bvh
+
+    @staticmethod
+    def build_binned_sah(
+        primitive_lower: np.ndarray,
+        primitive_upper: np.ndarray,
+        leaf_size: int = 4,
+        n_bins: int = 16,
+    ) -> "BVH":
+        """
+        Surface area heuristic BVH: every node is split along the longest axis of its centroid bounds at
+        the boundary of n_bins equal bins that minimizes area(left) * count(left) + area(right) * count(right).
+        Nodes whose centroids all fall into one bin are split at the median instead.
+        All nodes of a level are binned, scanned and partitioned together.
+        """
+        centroids = 0.5 * (primitive_lower + primitive_upper)  # P, 3
+
+        def partition(order: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            n_split = starts.shape[0]
+            # gathered primitives of the nodes to split are contiguous per node, in node order
+            node = np.repeat(np.arange(n_split), counts)  # M
+            offsets = np.cumsum(counts) - counts  # K
+            slots = np.repeat(starts, counts) + np.arange(node.shape[0]) - np.repeat(offsets, counts)  # M
+            primitives = order[slots]
+            centroid = centroids[primitives]  # M, 3
+            centroid_lower = np.minimum.reduceat(centroid, offsets, axis=0)  # K, 3
+            extent = np.maximum.reduceat(centroid, offsets, axis=0) - centroid_lower  # K, 3
+            axis = np.argmax(extent, axis=1)  # K
+            axis_lower, axis_extent = centroid_lower[np.arange(n_split), axis], extent[np.arange(n_split), axis]
+            value = centroid[np.arange(node.shape[0]), axis[node]]  # M
+            scale = n_bins / np.where(axis_extent > 0, axis_extent, 1.0)
+            bins = np.clip(((value - axis_lower[node]) * scale[node]).astype(np.int64), 0, n_bins - 1)  # M
+
+            # per (node, bin): primitive count and box
+            keys = node * n_bins + bins
+            key_order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[key_order]
+            present = np.nonzero(np.diff(sorted_keys, prepend=-1))[0]
+            bin_count = np.bincount(keys, minlength=n_split * n_bins).reshape(n_split, n_bins)
+            bin_lower = np.full((n_split * n_bins, 3), np.inf, dtype=np.float32)
+            bin_upper = np.full((n_split * n_bins, 3), -np.inf, dtype=np.float32)
+            bin_lower[sorted_keys[present]] = np.minimum.reduceat(primitive_lower[primitives[key_order]], present, axis=0)
+            bin_upper[sorted_keys[present]] = np.maximum.reduceat(primitive_upper[primitives[key_order]], present, axis=0)
+            bin_lower = bin_lower.reshape(n_split, n_bins, 3)
+            bin_upper = bin_upper.reshape(n_split, n_bins, 3)
+
+            # split after bin i: left = bins [0, i], right = bins [i + 1, n_bins)
+            left_lower = np.minimum.accumulate(bin_lower, axis=1)[:, :-1]
+            left_upper = np.maximum.accumulate(bin_upper, axis=1)[:, :-1]
+            right_lower = np.minimum.accumulate(bin_lower[:, ::-1], axis=1)[:, ::-1][:, 1:]
+            right_upper = np.maximum.accumulate(bin_upper[:, ::-1], axis=1)[:, ::-1][:, 1:]
+            left_count = np.cumsum(bin_count, axis=1)[:, :-1]  # K, n_bins - 1
+            right_count = counts[:, None] - left_count
+            valid = (left_count > 0) & (right_count > 0)
+            with np.errstate(invalid="ignore"):
+                cost = (
+                    half_area(left_lower, left_upper) * left_count + half_area(right_lower, right_upper) * right_count
+                )
+            cost = np.where(valid, cost, np.inf)
+            best = np.argmin(cost, axis=1)  # K
+            binned = valid.any(axis=1)
+
+            # sort each node's range: binned nodes by side of the split (stable), the others by centroid
+            sort_key = np.where(binned[node], (bins > best[node]).astype(value.dtype), value)
+            perm = np.lexsort((sort_key, node))
+            order = order.copy()
+            order[slots] = primitives[perm]
+            return order, np.where(binned, left_count[np.arange(n_split), best], counts // 2)
+
+        bvh = BVH.build_top_down(
+            primitive_lower,
+            primitive_upper,
+            np.arange(primitive_lower.shape[0], dtype=np.int64),
+            leaf_size,
+            partition,
+        )
+        logger.info(f"Built binned SAH BVH with {bvh.n_nodes=} over {primitive_lower.shape[0]=}")
+        return bvh
+
+    @staticmethod
+    def build_top_down(
+        primitive_lower: np.ndarray,
+        primitive_upper: np.ndarray,
+        primitive_order: np.ndarray,
+        leaf_size: int,
+        partition: Callable[[np.ndarray, np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]],
+    ) -> "BVH":
+        """
+        Splits node ranges of primitive_order level by level until they hold at most leaf_size primitives.
+        partition(order, starts, counts) permutes order within the ranges of the nodes being split and
+        returns it with the number of primitives going to each left child (0 < left < count).
+        """
+        n_primitives = primitive_lower.shape[0]
+
+        # top-down: node ranges of each level, children numbered after all nodes of the previous levels
+        starts = np.zeros(1, dtype=np.int64)
+        counts = np.full(1, n_primitives, dtype=np.int64)
+        levels = []  # (first node id, start, count, left, right) per level
+        next_node = 1
+        while True:
+            split = counts > leaf_size
+            n_split = int(split.sum())
+            left = np.full(starts.shape[0], -1, dtype=np.int64)
+            right = np.full(starts.shape[0], -1, dtype=np.int64)
+            left[split] = next_node + 2 * np.arange(n_split)
+            right[split] = left[split] + 1
+            levels.append((next_node - starts.shape[0], starts, counts, left, right))
+            if n_split == 0:
+                break
+            primitive_order, left_counts = partition(primitive_order, starts[split], counts[split])
+            starts, counts = (
+                np.stack((starts[split], starts[split] + left_counts), axis=1).reshape(-1),
+                np.stack((left_counts, counts[split] - left_counts), axis=1).reshape(-1),
+            )
+            next_node += 2 * n_split
+
+        sorted_lower = primitive_lower[primitive_order]
+        sorted_upper = primitive_upper[primitive_order]
+        n_nodes = next_node
+        lower = np.empty((n_nodes, 3), dtype=np.float32)
+        upper = np.empty((n_nodes, 3), dtype=np.float32)
+        all_left = np.empty(n_nodes, dtype=np.int64)
+        all_right = np.empty(n_nodes, dtype=np.int64)
+        all_start = np.empty(n_nodes, dtype=np.int64)
+        all_count = np.empty(n_nodes, dtype=np.int64)
+        for first, starts, counts, left, right in levels:
+            ids = first + np.arange(starts.shape[0])
+            all_left[ids], all_right[ids], all_start[ids], all_count[ids] = left, right, starts, counts
+
+        # leaves partition the sorted primitives, so sorted by start one reduceat covers exactly each leaf
+        leaves = np.nonzero(all_left < 0)[0]
+        leaves = leaves[np.argsort(all_start[leaves], kind="stable")]
+        if n_primitives:
+            lower[leaves] = np.minimum.reduceat(sorted_lower, all_start[leaves], axis=0)
+            upper[leaves] = np.maximum.reduceat(sorted_upper, all_start[leaves], axis=0)
+        else:
+            lower[leaves] = upper[leaves] = 0.0
+        # bottom-up bounds of internal nodes from their children
+        for first, starts, counts, left, right in reversed(levels):
+            internal = first + np.nonzero(left >= 0)[0]
+            lower[internal] = np.minimum(lower[all_left[internal]], lower[all_right[internal]])
+            upper[internal] = np.maximum(upper[all_left[internal]], upper[all_right[internal]])
+        return BVH(
+            lower, upper, all_left, all_right, all_start, all_count, primitive_order, sorted_lower, sorted_upper, len(levels),
+        )
+
+    def overlap_pairs(self, query_lower: np.ndarray, query_upper: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ All (query, primitive) pairs whose boxes overlap, for query boxes (Q, 3).
+        Traversal is a wavefront: all active (query, node) pairs advance one level per iteration.
+        """
+        queries = np.arange(query_lower.shape[0], dtype=np.int64)
+        nodes = np.zeros_like(queries)
+        pair_queries, pair_primitives = [], []
+        while queries.shape[0] > 0:
+            hit = np.all((query_lower[queries] <= self.upper[nodes]) & (query_upper[queries] >= self.lower[nodes]), axis=1)
+            queries, nodes = queries[hit], nodes[hit]
+            leaf = self.left[nodes] < 0
+            leaf_queries, leaf_nodes = queries[leaf], nodes[leaf]
+            counts = self.count[leaf_nodes]
+            expanded_queries = np.repeat(leaf_queries, counts)
+            within = np.arange(expanded_queries.shape[0], dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+            slots = np.repeat(self.start[leaf_nodes], counts) + within
+            hit = np.all(
+                (query_lower[expanded_queries] <= self.primitive_upper[slots])
+                & (query_upper[expanded_queries] >= self.primitive_lower[slots]),
+                axis=1,
+            )
+            pair_queries.append(expanded_queries[hit])
+            pair_primitives.append(self.primitive_order[slots[hit]])
+            internal_queries, internal_nodes = queries[~leaf], nodes[~leaf]
+            queries = np.concatenate((internal_queries, internal_queries))
+            nodes = np.concatenate((self.left[internal_nodes], self.right[internal_nodes]))
+        return np.concatenate(pair_queries), np.concatenate(pair_primitives)
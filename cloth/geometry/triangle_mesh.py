@@ -0,0 +1,134 @@
+""" Triangle meshes and a small Wavefront OBJ loader (positions and faces only). """
+import logging
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TriangleMesh:
+    vertices: np.ndarray  # V, 3 float32
+    faces: np.ndarray  # F, 3 int64 indices into vertices
+
+    @property
+    def triangles(self) -> np.ndarray:
+        return self.vertices[self.faces]  # F, 3, 3
+
+    def face_normals(self) -> np.ndarray:
+        triangles = self.triangles
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])  # F, 3
+        return normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), np.finfo(np.float32).tiny)
+
+    def vertex_normals(self) -> np.ndarray:
+        # average of incident face normals
+        normals = np.zeros_like(self.vertices)
+        face_normals = self.face_normals()
+        for k in range(3):
+            for axis in range(3):
+                normals[:, axis] += np.bincount(self.faces[:, k], weights=face_normals[:, axis], minlength=self.vertices.shape[0])
+        return normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), np.finfo(np.float32).tiny)
+
+    def transformed(self, scale: float = 1.0, translation: Optional[Sequence[float]] = None) -> "TriangleMesh":
+        vertices = scale * self.vertices
+        if translation is not None:
+            vertices = vertices + np.asarray(translation, dtype=np.float32)
+        return TriangleMesh(vertices.astype(np.float32), self.faces)
+
+    @staticmethod
+    def concatenate(meshes: Sequence["TriangleMesh"]) -> "TriangleMesh":
+        """ One mesh holding all of them, faces re-indexed """
+        offsets = np.cumsum([0] + [mesh.vertices.shape[0] for mesh in meshes[:-1]])
+        return TriangleMesh(
+            np.concatenate([mesh.vertices for mesh in meshes]).astype(np.float32),
+            np.concatenate([mesh.faces + offset for mesh, offset in zip(meshes, offsets)]).astype(np.int64),
+        )
+
+
+def subdivide(mesh: TriangleMesh, onto_sphere: bool = False) -> TriangleMesh:
+    """ Splits every triangle into 4 at its edge midpoints (shared edges share midpoints): F -> 4 F.
+    onto_sphere pushes the new vertices out to the distance of the edge's end points from the origin.
+    """
+    faces = mesh.faces
+    edges = np.sort(np.concatenate((faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]])), axis=1)  # 3 F, 2
+    unique_edges, edge_index = np.unique(edges, axis=0, return_inverse=True)
+    midpoints = 0.5 * (mesh.vertices[unique_edges[:, 0]] + mesh.vertices[unique_edges[:, 1]])  # E, 3
+    if onto_sphere:
+        radius = 0.5 * (
+            np.linalg.norm(mesh.vertices[unique_edges[:, 0]], axis=1) + np.linalg.norm(mesh.vertices[unique_edges[:, 1]], axis=1)
+        )
+        midpoints *= (radius / np.linalg.norm(midpoints, axis=1))[:, None]
+    n_faces, n_vertices = faces.shape[0], mesh.vertices.shape[0]
+    m01, m12, m20 = (n_vertices + edge_index.reshape(3, n_faces))  # F each
+    new_faces = np.concatenate((
+        np.stack((faces[:, 0], m01, m20), axis=1),
+        np.stack((m01, faces[:, 1], m12), axis=1),
+        np.stack((m20, m12, faces[:, 2]), axis=1),
+        np.stack((m01, m12, m20), axis=1),
+    ))
+    return TriangleMesh(np.concatenate((mesh.vertices, midpoints)).astype(np.float32), new_faces.astype(np.int64))
+
+
+def load_obj(filename: str, scale: float = 1.0, translation: Optional[Sequence[float]] = None) -> TriangleMesh:
+    """ All objects of the file merged into one mesh; polygons are fan-triangulated. """
+    vertices = []
+    faces = []
+    with open(filename, "r") as f:
+        for line in f:
+            if line.startswith("v "):
+                vertices.append([float(x) for x in line.split()[1:4]])
+            elif line.startswith("f "):
+                # "f 1 2 3", "f 1/1/1 2/2/2 3/3/3", "f 1//1 ..."; negative indices count from the end
+                polygon = [int(token.split("/")[0]) for token in line.split()[1:]]
+                polygon = [index - 1 if index > 0 else len(vertices) + index for index in polygon]
+                for k in range(1, len(polygon) - 1):
+                    faces.append((polygon[0], polygon[k], polygon[k + 1]))
+    mesh = TriangleMesh(
+        vertices=np.asarray(vertices, dtype=np.float32).reshape(-1, 3),
+        faces=np.asarray(faces, dtype=np.int64).reshape(-1, 3),
+    )
+    logger.info(f"Loaded {filename=} with {mesh.vertices.shape=} {mesh.faces.shape=}")
+    return mesh.transformed(scale, translation)
+
+
+def closest_points_on_triangles(points: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """ Closest point to points[k] on triangle (a[k], b[k], c[k]), all (P, 3).
+    Ericson, Real-Time Collision Detection 5.1.5, with the voronoi region branches turned into masks.
+    """
+    def dot(u, v):
+        return np.sum(u * v, axis=1)
+
+    def safe_divide(numerator, denominator):
+        return numerator / np.where(denominator == 0, 1.0, denominator)
+
+    ab, ac = b - a, c - a
+    ap, bp, cp = points - a, points - b, points - c
+    d1, d2 = dot(ab, ap), dot(ac, ap)
+    d3, d4 = dot(ab, bp), dot(ac, bp)
+    d5, d6 = dot(ab, cp), dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    # interior (face region) by default
+    denominator = safe_divide(1.0, va + vb + vc)
+    result = a + ab * (vb * denominator)[:, None] + ac * (vc * denominator)[:, None]
+    # regions are assigned in reverse order of precedence so that earlier checks win
+    in_bc = (va <= 0) & ((d4 - d3) >= 0) & ((d5 - d6) >= 0)
+    w = safe_divide(d4 - d3, (d4 - d3) + (d5 - d6))
+    result = np.where(in_bc[:, None], b + (c - b) * w[:, None], result)
+    in_ac = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+    w = safe_divide(d2, d2 - d6)
+    result = np.where(in_ac[:, None], a + ac * w[:, None], result)
+    in_c = (d6 >= 0) & (d5 <= d6)
+    result = np.where(in_c[:, None], c, result)
+    in_ab = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+    v = safe_divide(d1, d1 - d3)
+    result = np.where(in_ab[:, None], a + ab * v[:, None], result)
+    in_b = (d3 >= 0) & (d4 <= d3)
+    result = np.where(in_b[:, None], b, result)
+    in_a = (d1 <= 0) & (d2 <= 0)
+    result = np.where(in_a[:, None], a, result)
+    return result
@@ -5,20 +5,12 @@ import numpy as np
 from typing import Optional
 import contextlib
 import logging
-from dataclasses import dataclass
+from cloth.texture_bounds import TextureBounds  # re-exported; lives in a GL-free module
 
 
 logger = logging.getLogger()
 
 
-@dataclass
-class TextureBounds:
-    bottom: float = 1.0
-    top: float = 0.0
-    left: float = 0.0
-    right: float = 1.0
-
-
 class GlTexture:
     """
     with graphics_api.
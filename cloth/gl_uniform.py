@@ -1,9 +1,13 @@
-from typing import Dict, Callable, Any, List
+from typing import Dict, Callable, Any, List, Optional
 from OpenGL.GL import *
 from OpenGL.arrays.vbo import VBO
 import glfw
 import numpy as np
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import logging
+
+
+logger = logging.getLogger()
 
 
 GlUniformUpdateRegistry: Dict[str, Callable] = {
@@ -23,10 +27,25 @@ class GlUniform:
     name: str
     dtype: str
     gl_program: Any  # gl Program type...
+    location: Optional[int] = None  # resolved once, program must be linked
+    last_value: Optional[np.ndarray] = field(default=None, repr=False)  # what the program currently holds
+
+    def resolve_location(self) -> int:
+        self.location = glGetUniformLocation(self.gl_program, self.name)
+        if self.location == -1:
+            logger.warning(f"Uniform {self.name=} is not active in {self.gl_program=}; updates will be skipped")
+        return self.location
 
     def update(self, value: Any) -> None:
-        location = glGetUniformLocation(self.gl_program, self.name)
-        GlUniformUpdateRegistry.get(self.dtype)(location, value)
+        if self.location is None:
+            self.resolve_location()
+        if self.location == -1:
+            return
+        # uniforms are per-program state, so an unchanged value needs no GL call
+        if self.last_value is not None and np.array_equal(self.last_value, value):
+            return
+        GlUniformUpdateRegistry.get(self.dtype)(self.location, value)
+        self.last_value = np.array(value, copy=True)
         return
 
 
@@ -36,6 +55,9 @@ class GlUniformCollection:
             uniform.name: uniform
             for uniform in gl_uniforms
         }
+        # resolve all locations up front, rather than once per uniform per frame
+        for uniform in self.gl_uniforms.values():
+            uniform.resolve_location()
 
     def update(self, name_to_values: Dict[str, Any]) -> None:
         for name, value in name_to_values.items():
@@ -10,10 +10,14 @@ import platform as pyPlatform
 import time
 from dataclasses import dataclass
 from cloth.camera import Camera
-from PIL import Image
+from cloth.frame_capture import AsyncFrameCapture
+from cloth.frame_sinks import BaseFrameSink, ImageDirectorySink
+from cloth.offscreen import Framebuffer, make_offscreen_context
+from cloth.profiler import get_profiler
 
 
 logger = logging.getLogger()
+profiler = get_profiler()
 
 
 def debug_message_callback(source, msg_type, msg_id, severity, length, raw, user):
@@ -49,6 +53,9 @@ class GraphicsAPI:
         name: Optional[str] = None,
         background_colour: Tuple[float, float, float, float] = (0.3, 0.3, 0.3, 1.0),
         auto_update_camera: bool = True,
+        async_capture: bool = False,
+        capture_workers: int = 4,
+        offscreen: Optional[str] = None,
     ):
         self.window_height = window_height
         self.window_width = window_width
@@ -58,10 +65,17 @@ class GraphicsAPI:
         self.pressed_key_array = np.array([False] * 600, np.bool) # alt is 342 apparently xD
         self.cursor_pos_px = None
         self.auto_update_camera = auto_update_camera
+        self.async_capture = async_capture
+        self.capture_workers = capture_workers
+        self.frame_capture: Optional[AsyncFrameCapture] = None
+        # "egl" or "osmesa": no window, frames are drawn into a window_width x window_height framebuffer object
+        # (PyOpenGL must have been set up for it, see cloth.offscreen.select_platform)
+        self.offscreen = offscreen
+        self.window = None
 
     def should_run_then_clear(self) -> bool:
         # WARNING: two purposes
-        if glfw.window_should_close(self.window):
+        if self.window is not None and glfw.window_should_close(self.window):
             return False
         # set background color
         glClearColor(*(self.background_colour))
@@ -73,6 +87,15 @@ class GraphicsAPI:
 
         return True
 
+    def present(self) -> None:
+        """ Ends a frame: processes window events and swaps buffers. Offscreen frames are only read back. """
+        if self.window is None:
+            return
+        # tell glfw to poll and process window events
+        glfw.poll_events()
+        # swap frame buffer
+        glfw.swap_buffers(self.window)
+
     @staticmethod
     def read_file_to_str(filename: str) -> str:
         with open(filename, "r") as f:
@@ -110,7 +133,8 @@ class GraphicsAPI:
             elif key == glfw.KEY_A:
                 self.camera.pos -= self.camera.keyboard_velocity * self.camera.right()
             else:
-                pass
+                continue
+            self.camera.view_dirty = True
 
     def window_keypress_callback(self, window, key, scanCode, action, mods):
         # TODO: make customizable - allow user to specify it?
@@ -133,34 +157,61 @@ class GraphicsAPI:
         y_offset = y_pos - self.cursor_pos_px[1]
         self.camera.pitch = self.camera.pitch - self.camera.mouse_velocity * y_offset
         self.camera.yaw = self.camera.yaw + self.camera.mouse_velocity * x_offset
+        self.camera.view_dirty = True
         self.cursor_pos_px = (x_pos, y_pos)
 
     def window_scroll_callback(self, window, x_offset, y_offset):
         # TODO: make customizable - allow user to specify it?
         self.camera.fov = self.camera.fov + self.camera.scroll_velocity * y_offset
+        self.camera.projection_dirty = True
 
     def window_resize_callback(self, window, width, height):
         # TODO: make customizable - allow user to specify it?
         # TODO: keep track of width, height?
         raise NotImplementedError("currently broken?")
         self.camera.aspect = width / height
+        self.camera.projection_dirty = True
         glViewport(0, 0, width, height)
 
     def save_frame(self, save_dir: str) -> bool:
-        # Get the width and height of the frame buffer
-        width, height = glGetIntegerv(GL_VIEWPORT)[2:]
-        # Allocate a numpy array to hold the pixel data
-        pixels = np.empty((height, width, 3), dtype=np.uint8)  # RGB
-        # Read the pixel data from the frame buffer
-        glReadPixels(0, 0, width, height, GL_RGB, GL_UNSIGNED_BYTE, pixels)
-        # Flip the pixel data vertically (OpenGL origin is bottom left, numpy origin is top left)
-        pixels = np.flip(pixels, 0)
-        pil_image = Image.fromarray(pixels)  # Convert the frame to a PIL image
-        pil_image.save(os.path.join(save_dir, f"frame_{self.frame_index}.jpg"))  # Save the image to a file
+        return self.write_frame(ImageDirectorySink(save_dir))
+
+    def write_frame(self, frame_sink: BaseFrameSink, frame_index: Optional[int] = None) -> None:
+        """ Reads back the frame into frame_sink as frame_index, by default the number of frames drawn in this window """
+        if frame_index is None:
+            frame_index = self.frame_index
+        if self.frame_capture is not None:
+            # PBO readback, written to the sink by a background pool
+            self.frame_capture.capture(frame_sink, frame_index)
+            return
+        with profiler.scope("readback"):
+            # Get the width and height of the frame buffer
+            width, height = glGetIntegerv(GL_VIEWPORT)[2:]
+            # Allocate a numpy array to hold the pixel data
+            pixels = np.empty((height, width, 3), dtype=np.uint8)  # RGB
+            # Read the pixel data from the frame buffer
+            glReadPixels(0, 0, width, height, GL_RGB, GL_UNSIGNED_BYTE, pixels)
+        with profiler.scope("encode"):
+            # Flip the pixel data vertically (OpenGL origin is bottom left, numpy origin is top left)
+            pixels = np.flip(pixels, 0)
+            frame_sink.write(pixels, frame_index)
 
     @contextlib.contextmanager
     def create_window(self):
+        """ Yields the glfw window, or None for offscreen rendering """
         self.frame_index: int = 0
+        if self.offscreen is not None:
+            context = make_offscreen_context(self.offscreen, self.window_width, self.window_height)
+            framebuffer = Framebuffer(self.window_width, self.window_height)
+            logger.info(f"Rendering offscreen ({self.offscreen}) into {self.window_width}x{self.window_height}: {glGetString(GL_RENDERER)}")
+            self.init_gl_state()
+            try:
+                yield None
+            finally:
+                self.close_frame_capture()
+                framebuffer.close()
+                context.close()
+            return
 
         # initialize glfw
         glfw.init()
@@ -175,21 +226,11 @@ class GraphicsAPI:
             glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE)
 
         # create window
-        self.window = glfw.create_window(self.window_height, self.window_width, self.name, None, None)
+        self.window = glfw.create_window(self.window_width, self.window_height, self.name, None, None)
         # make window the current context
         glfw.make_context_current(self.window)
+        self.init_gl_state()
 
-        # enable z-buffer
-        glEnable(GL_DEPTH_TEST)
-        # Enable basic blending. TODO: learn and improve
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
-        if pyPlatform.system().lower() != 'darwin':
-            # enable debug output
-            # doesn't seem to work on macOS
-            glEnable(GL_DEBUG_OUTPUT)
-            glDebugMessageCallback(GLDEBUGPROC(debug_message_callback), None)
         # set resizing callback function
         # glfw.set_framebuffer_size_callback(self.window, self.window_resize_callback)
 
@@ -205,15 +246,42 @@ class GraphicsAPI:
         glfw.set_scroll_callback(self.window, self.window_scroll_callback)
         _ = glfw.get_time()
 
-        yield self.window
+        try:
+            yield self.window
+        finally:
+            # TODO: delete buffers and programs
+            self.close_frame_capture()
 
-        # TODO: delete buffers and programs
-
-        # terminate glfw
-        glfw.terminate()
+            # terminate glfw
+            glfw.terminate()
+            self.window = None
 
         # TODO: compose video
 
+    def init_gl_state(self) -> None:
+        """ Depth test, blending, debug output and frame capture, once a context is current """
+        # enable z-buffer
+        glEnable(GL_DEPTH_TEST)
+        # Enable basic blending. TODO: learn and improve
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+        if pyPlatform.system().lower() != 'darwin':
+            # enable debug output
+            # doesn't seem to work on macOS
+            glEnable(GL_DEBUG_OUTPUT)
+            glDebugMessageCallback(GLDEBUGPROC(debug_message_callback), None)
+
+        if self.async_capture:
+            width, height = glGetIntegerv(GL_VIEWPORT)[2:]
+            self.frame_capture = AsyncFrameCapture(width, height, n_workers=self.capture_workers)
+
+    def close_frame_capture(self) -> None:
+        if self.frame_capture is not None:
+            # write out every frame still in flight while the context is alive
+            self.frame_capture.close()
+            self.frame_capture = None
+
     def make_program(self, vertex_shader: str, fragment_shader: str) -> Optional[int]:
         """ Create a gl program with two shaders linked.
         Args: vertex_shader and fragment_shader - strings containin GLSL
@@ -252,8 +320,5 @@ if __name__ == "__main__":
         while True:
             if not api.should_run_then_clear():
                 break
-            # tell glfw to poll and process window events
-            glfw.poll_events()
-            # swap frame buffer
-            glfw.swap_buffers(window)
+            api.present()
     print("Successfully reached end of main")
\ No newline at end of file
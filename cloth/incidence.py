@@ -0,0 +1,151 @@
+""" Sparse incidence operators: scatter-add from per-edge/per-element values onto vertices. """
+import numpy as np
+from typing import Optional, Tuple, List, Dict
+from cloth.workspace import Workspace
+
+
+class IncidenceOperator:
+    """ A (n_rows, n_cols) sparse matrix stored as coordinate triplets.
+    Meant to replace dense vertex-to-X matrices that are only ever used as `np.matmul(M, values)`:
+        M @ values  -> (n_rows, k) array, equivalent to np.matmul(dense(M), values)
+    Memory and cost of applying are linear in the number of non-zeros.
+    Triplets are kept sorted by row (stable), so applying is a gather and one segmented np.add.reduceat.
+    """
+    def __init__(
+        self,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        weights: Optional[np.ndarray],
+        shape: Tuple[int, int],
+    ):
+        rows = np.ascontiguousarray(rows, dtype=np.int64)  # nnz
+        if np.any(rows[1:] < rows[:-1]):
+            # sorted by row, so that each row's entries are one contiguous run for np.add.reduceat; stable,
+            # so every row still sums its entries in the original order
+            order = np.argsort(rows, kind="stable")
+            rows, cols = rows[order], np.asarray(cols)[order]
+            weights = None if weights is None else np.asarray(weights)[order]
+        self.rows = rows
+        self.cols = np.ascontiguousarray(cols, dtype=np.int64)  # nnz
+        self.weights = None if weights is None else np.ascontiguousarray(weights, dtype=np.float32)  # nnz
+        self.shape = shape
+        # first entry of each row that has any, and those rows
+        self.row_starts = np.flatnonzero(np.diff(rows, prepend=-1))  # R
+        self.nonempty_rows = rows[self.row_starts]  # R
+
+    @property
+    def nnz(self) -> int:
+        return self.rows.shape[0]
+
+    def __matmul__(self, values: np.ndarray) -> np.ndarray:
+        return self.matmul(values)
+
+    def matmul(self, values: np.ndarray, out: Optional[np.ndarray] = None, workspace: Optional[Workspace] = None) -> np.ndarray:
+        """ self @ values (n_cols, k) into out (n_rows, k); with a workspace, no array is allocated """
+        if workspace is None:
+            workspace = Workspace()
+        n_values = values.shape[1]
+        if out is None:
+            out = np.empty((self.shape[0], n_values), dtype=values.dtype)
+        if self.nnz == 0:
+            out.fill(0)
+            return out
+        gathered = workspace.array("incidence_gathered", (self.nnz, n_values), values.dtype)  # nnz, k
+        # mode="clip" (indices are valid anyway): with the default "raise", np.take buffers out
+        np.take(values, self.cols, axis=0, out=gathered, mode="clip")
+        if self.weights is not None:
+            np.multiply(gathered, self.weights[:, None], out=gathered)
+        # summed in float64 like np.bincount used to, then rounded once
+        gathered_float64 = workspace.array("incidence_gathered_float64", (self.nnz, n_values), np.float64)  # nnz, k
+        np.copyto(gathered_float64, gathered)
+        sums = workspace.array("incidence_sums_float64", (self.row_starts.shape[0], n_values), np.float64)  # R, k
+        np.add.reduceat(gathered_float64, self.row_starts, axis=0, out=sums)
+        if self.row_starts.shape[0] == self.shape[0]:
+            np.copyto(out, sums)
+        else:
+            out.fill(0)
+            out[self.nonempty_rows] = sums
+        return out
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        """ Flat dict of arrays, e.g. for np.save/TopologyCache """
+        arrays = {f"{prefix}_rows": self.rows, f"{prefix}_cols": self.cols}
+        if self.weights is not None:
+            arrays[f"{prefix}_weights"] = self.weights
+        return arrays
+
+    @staticmethod
+    def from_arrays(arrays: Dict[str, np.ndarray], prefix: str, shape: Tuple[int, int]) -> "IncidenceOperator":
+        return IncidenceOperator(
+            arrays[f"{prefix}_rows"],
+            arrays[f"{prefix}_cols"],
+            arrays.get(f"{prefix}_weights"),
+            shape=shape,
+        )
+
+    def absolute(self) -> "IncidenceOperator":
+        """ Same sparsity pattern, |weights| - e.g. to sum per-spring quantities onto both end points """
+        weights = None if self.weights is None else np.abs(self.weights)
+        return IncidenceOperator(self.rows, self.cols, weights, shape=self.shape)
+
+    def row_block(self, start: int, stop: int) -> "IncidenceOperator":
+        """ Rows start:stop as their own (stop - start, n_cols) operator, summing each row in the same order """
+        lo, hi = np.searchsorted(self.rows, [start, stop])
+        weights = None if self.weights is None else self.weights[lo:hi]
+        return IncidenceOperator(self.rows[lo:hi] - start, self.cols[lo:hi], weights, shape=(stop - start, self.shape[1]))
+
+    def todense(self) -> np.ndarray:
+        # Only for debugging - defeats the purpose on large meshes
+        dense = np.zeros(self.shape, dtype=np.float32)
+        np.add.at(dense, (self.rows, self.cols), 1.0 if self.weights is None else self.weights)
+        return dense
+
+    @staticmethod
+    def vertex_to_element(elements: np.ndarray, n_vertices: int) -> "IncidenceOperator":
+        """ ij = 1 / (number of elements incident on vertex i) if vertex i is in element j """
+        rows = elements.reshape(-1).astype(np.int64)  # E * 3
+        cols = np.repeat(np.arange(elements.shape[0], dtype=np.int64), elements.shape[1])  # E * 3
+        degree = np.bincount(rows, minlength=n_vertices).astype(np.float32)  # V
+        weights = 1.0 / degree[rows]
+        return IncidenceOperator(rows, cols, weights, shape=(n_vertices, elements.shape[0]))
+
+    @staticmethod
+    def vertex_to_spring(spring_end_points: np.ndarray, n_vertices: int) -> "IncidenceOperator":
+        """ ij = 1 if vertex i is first end point of spring j, -1 if it is the second end point """
+        n_springs = spring_end_points.shape[0]
+        spring_indices = np.arange(n_springs, dtype=np.int64)
+        rows = np.concatenate((spring_end_points[:, 0], spring_end_points[:, 1])).astype(np.int64)  # 2S
+        cols = np.concatenate((spring_indices, spring_indices))  # 2S
+        weights = np.concatenate((np.ones(n_springs, np.float32), -np.ones(n_springs, np.float32)))
+        return IncidenceOperator(rows, cols, weights, shape=(n_vertices, n_springs))
+
+
+def color_edges(edges: np.ndarray, n_vertices: int) -> List[np.ndarray]:
+    """ Partition edges (E, 2) into colors such that no two edges of a color share a vertex.
+    Each color is a maximal matching built in vectorized rounds: every still-unmatched edge that has the
+    smallest index at both of its (still free) end points joins the color.
+    Returns a list of edge index arrays, one per color.
+    """
+    edges = edges.astype(np.int64)
+    sentinel = edges.shape[0]
+    colors = []
+    uncolored = np.arange(edges.shape[0], dtype=np.int64)
+    while uncolored.size > 0:
+        color = []
+        candidates = uncolored
+        while candidates.size > 0:
+            ends = edges[candidates]  # C, 2
+            # smallest candidate edge index touching each vertex
+            smallest = np.full(n_vertices, sentinel, dtype=np.int64)
+            np.minimum.at(smallest, ends[:, 0], candidates)
+            np.minimum.at(smallest, ends[:, 1], candidates)
+            chosen = (smallest[ends[:, 0]] == candidates) & (smallest[ends[:, 1]] == candidates)
+            color.append(candidates[chosen])
+            # drop every candidate touching a vertex used by this color
+            used = np.zeros(n_vertices, dtype=bool)
+            used[ends[chosen].reshape(-1)] = True
+            candidates = candidates[~(used[ends[:, 0]] | used[ends[:, 1]])]
+        color = np.concatenate(color)
+        colors.append(color)
+        uncolored = np.setdiff1d(uncolored, color, assume_unique=True)
+    return colors
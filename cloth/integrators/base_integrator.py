@@ -0,0 +1,7 @@
+# Integrators advance a simulated drawable (e.g. SpringMassGridSquare) by one timestep.
+# They read and write model.vertices, model.velocity and model.acceleration in place of the model.
+
+
+class BaseIntegrator:
+    def step(self, model, dt: float) -> None:
+        ...
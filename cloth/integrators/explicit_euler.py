@@ -0,0 +1,22 @@
+import numpy as np
+import logging
+from .base_integrator import BaseIntegrator
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExplicitEuler(BaseIntegrator):
+    """
+    Semi-implicit (symplectic) Euler: velocity is updated first, then positions use the new velocity.
+        v' = v + dt * f(x, v) / m
+        x' = x + dt * v'
+    Cheap per step, but only stable for dt below roughly sqrt(m / k).
+    Updates acceleration, velocity and vertices in place. The step is the model's compute backend's
+    (cloth.backends), which may fuse it with the force evaluation.
+    """
+
+    def step(self, model, dt: float) -> None:
+        force = model.backend.explicit_euler_step(model, dt)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Iteration stats: {dt=} {np.linalg.norm(model.velocity)=} {np.linalg.norm(model.acceleration)=} {np.linalg.norm(force)=}")
@@ -0,0 +1,163 @@
+import numpy as np
+import logging
+from typing import Callable, Optional
+from .base_integrator import BaseIntegrator
+from cloth.workspace import Workspace
+
+
+logger = logging.getLogger(__name__)
+
+
+class ImplicitEuler(BaseIntegrator):
+    """
+    Linearized backward Euler (Baraff & Witkin '98) for spring-mass models.
+    Solves for the velocity change dv:
+        (M - dt * df/dv - dt^2 * df/dx) dv = dt * (f(x, v) + dt * df/dx v)
+    then
+        v' = v + dv
+        x' = x + dt * v'
+
+    df/dx is the spring jacobian built from spring_end_points, spring_resting_lengths and spring_stiffness,
+    df/dv is the (isotropic) damping. Neither is materialized: the system is solved with
+    jacobi-preconditioned conjugate gradients using only (V, 3) and (S, 3) arrays.
+    Wind and gravity are treated explicitly. Fixed vertices are constrained by filtering them out of the solve.
+    Temporaries live in the model's workspace and the state is updated in place.
+    Stable for stiffnesses/timesteps where ExplicitEuler blows up.
+    """
+
+    def __init__(self, tolerance: float = 1e-4, max_iterations: int = 100):
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.last_iterations = 0
+        self.last_residual = 0.0
+        self.vertex_to_spring_absolute = None
+
+    def prepare(self, model) -> None:
+        # Topology is fixed for the lifetime of the model, so this is done once
+        self.vertex_to_spring_absolute = model.vertex_to_spring.absolute()
+        self.free = np.ones_like(model.mass)  # V, 1
+        self.free[model.fixed_vertices] = 0.0
+
+    def spring_jacobian_product(self, model) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        Returns (p -> df/dx p, diagonal of -df/dx as a (V, 3) array) for the current positions.
+        Both are workspace arrays: a product is overwritten by the next one.
+        """
+        workspace = model.workspace
+        ends = model.spring_end_points
+        n_springs, n_vertices = ends.shape[0], model.vertices.shape[0]
+        end_positions = workspace.array("jacobian_end_positions", (n_springs, 2, 3))  # S, 2, 3
+        np.take(model.vertices, ends, axis=0, out=end_positions, mode="clip")
+        direction = workspace.array("jacobian_direction", (n_springs, 3))  # S, 3
+        np.subtract(end_positions[:, 1, :], end_positions[:, 0, :], out=direction)
+        squared = workspace.array("jacobian_squared", (n_springs, 3))  # S, 3
+        lengths = workspace.array("jacobian_lengths", (n_springs, 1))  # S, 1
+        np.multiply(direction, direction, out=squared)
+        # column by column: the same sums as np.linalg.norm, without the buffered reduction over an axis of length 3
+        np.add(np.add(squared[:, 0:1], squared[:, 1:2], out=lengths), squared[:, 2:3], out=lengths)
+        np.sqrt(lengths, out=lengths)
+        np.divide(direction, lengths, out=direction)
+        # K_s = k * (d d^T + (1 - L / l) (I - d d^T)); the transverse term is clamped at 0
+        # so that compressed springs don't make the system indefinite
+        transverse = workspace.array("jacobian_transverse", (n_springs, 1))  # S, 1
+        np.divide(model.spring_resting_lengths, lengths, out=transverse)
+        np.clip(np.subtract(1.0, transverse, out=transverse), 0.0, None, out=transverse)
+        along_weight = workspace.array("jacobian_along_weight", (n_springs, 1))  # S, 1
+        np.subtract(1.0, transverse, out=along_weight)
+        stiffness = model.spring_stiffness  # S, 1
+
+        def product(p: np.ndarray) -> np.ndarray:
+            p_ends = workspace.array("jacobian_product_ends", (n_springs, 2, 3))  # S, 2, 3
+            np.take(p, ends, axis=0, out=p_ends, mode="clip")
+            dp = workspace.array("jacobian_product_dp", (n_springs, 3))  # S, 3
+            np.subtract(p_ends[:, 1, :], p_ends[:, 0, :], out=dp)
+            spring_term = workspace.array("jacobian_product_spring_term", (n_springs, 3))  # S, 3
+            along = workspace.array("jacobian_product_along", (n_springs, 1))  # S, 1
+            np.multiply(dp, direction, out=spring_term)
+            np.add(np.add(spring_term[:, 0:1], spring_term[:, 1:2], out=along), spring_term[:, 2:3], out=along)
+            np.multiply(np.multiply(along_weight, along, out=along), direction, out=spring_term)
+            np.add(np.multiply(transverse, dp, out=dp), spring_term, out=spring_term)
+            np.multiply(stiffness, spring_term, out=spring_term)
+            out = workspace.array("jacobian_product", (n_vertices, 3))  # V, 3
+            return model.vertex_to_spring.matmul(spring_term, out=out, workspace=workspace)  # V, 3
+
+        spring_diagonal = np.multiply(direction, direction, out=squared)  # S, 3
+        np.add(transverse, np.multiply(along_weight, spring_diagonal, out=spring_diagonal), out=spring_diagonal)
+        np.multiply(stiffness, spring_diagonal, out=spring_diagonal)
+        diagonal = workspace.array("jacobian_diagonal", (n_vertices, 3))  # V, 3
+        self.vertex_to_spring_absolute.matmul(spring_diagonal, out=diagonal, workspace=workspace)
+        return product, diagonal
+
+    def step(self, model, dt: float) -> None:
+        if self.vertex_to_spring_absolute is None:
+            self.prepare(model)
+        workspace = model.workspace
+        force = model.force()
+        free = self.free  # V, 1
+
+        jacobian_product, stiffness_diagonal = self.spring_jacobian_product(model)
+        mass_term = workspace.array("implicit_euler_mass_term", model.mass.shape)  # V, 1
+        damping = model.damping_force_coefficient  # a scalar, or (V, 1) per vertex on batched models
+        if np.ndim(damping) == 0:
+            np.add(model.mass, dt * damping, out=mass_term)
+        else:
+            np.add(model.mass, np.multiply(damping, dt, out=mass_term), out=mass_term)
+
+        def system_product(p: np.ndarray) -> np.ndarray:
+            out = workspace.array("implicit_euler_system_product", p.shape)  # V, 3
+            np.multiply(mass_term, p, out=out)
+            stiffness_term = jacobian_product(p)  # V, 3
+            np.subtract(out, np.multiply(stiffness_term, dt * dt, out=stiffness_term), out=out)
+            return np.multiply(free, out, out=out)
+
+        preconditioner = workspace.array("implicit_euler_preconditioner", stiffness_diagonal.shape)  # V, 3
+        np.add(mass_term, np.multiply(stiffness_diagonal, dt * dt, out=preconditioner), out=preconditioner)
+        rhs = workspace.array("implicit_euler_rhs", force.shape)  # V, 3
+        np.add(force, np.multiply(jacobian_product(model.velocity), dt, out=rhs), out=rhs)
+        np.multiply(free, np.multiply(rhs, dt, out=rhs), out=rhs)
+
+        velocity_change = self.conjugate_gradient(system_product, rhs, preconditioner, workspace)
+
+        np.divide(velocity_change, dt, out=model.acceleration)
+        np.add(model.velocity, velocity_change, out=model.velocity)
+        increment = workspace.array("integrator_increment", model.velocity.shape)  # V, 3
+        np.add(model.vertices, np.multiply(dt, model.velocity, out=increment), out=model.vertices)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Iteration stats: {dt=} {self.last_iterations=} {self.last_residual=} {np.linalg.norm(model.velocity)=}")
+
+    def conjugate_gradient(
+        self,
+        system_product: Callable[[np.ndarray], np.ndarray],
+        rhs: np.ndarray,
+        preconditioner: np.ndarray,
+        workspace: Optional[Workspace] = None,
+    ) -> np.ndarray:
+        """ Solves system_product(x) = rhs; with a workspace nothing is allocated and x is a workspace array """
+        if workspace is None:
+            workspace = Workspace()
+        solution = workspace.array("cg_solution", rhs.shape)
+        solution.fill(0)
+        residual = workspace.array("cg_residual", rhs.shape)
+        np.copyto(residual, rhs)
+        scratch = workspace.array("cg_scratch", rhs.shape)
+        threshold = (self.tolerance ** 2) * max(float(np.sum(np.multiply(rhs, rhs, out=scratch))), np.finfo(np.float32).tiny)
+        z = np.divide(residual, preconditioner, out=workspace.array("cg_z", rhs.shape))
+        direction = workspace.array("cg_direction", rhs.shape)
+        np.copyto(direction, z)
+        residual_dot_z = float(np.sum(np.multiply(residual, z, out=scratch)))
+        iteration = 0
+        residual_norm_squared = float(np.sum(np.multiply(residual, residual, out=scratch)))
+        while iteration < self.max_iterations and residual_norm_squared > threshold:
+            product = system_product(direction)
+            alpha = residual_dot_z / float(np.sum(np.multiply(direction, product, out=scratch)))
+            solution += np.multiply(alpha, direction, out=scratch)
+            residual -= np.multiply(alpha, product, out=scratch)
+            residual_norm_squared = float(np.sum(np.multiply(residual, residual, out=scratch)))
+            np.divide(residual, preconditioner, out=z)
+            new_residual_dot_z = float(np.sum(np.multiply(residual, z, out=scratch)))
+            np.add(z, np.multiply(new_residual_dot_z / residual_dot_z, direction, out=direction), out=direction)
+            residual_dot_z = new_residual_dot_z
+            iteration += 1
+        self.last_iterations = iteration
+        self.last_residual = np.sqrt(residual_norm_squared)
+        return solution
@@ -0,0 +1,144 @@
+import numpy as np
+import logging
+from typing import Optional, List
+from .base_integrator import BaseIntegrator
+from cloth.incidence import color_edges
+
+
+logger = logging.getLogger(__name__)
+
+
+class PositionBasedDynamics(BaseIntegrator):
+    """
+    XPBD (Macklin et al. '16) with substepping: springs are treated as distance constraints
+        C(x) = |x_j - x_i| - resting_length
+    with compliance 1 / spring_stiffness (or a uniform `compliance` override; 0 means inextensible).
+
+    Per substep of length h = dt / n_substeps:
+        v += h * f_external / m
+        x_pred = x + h * v
+        project constraints on x_pred (n_iterations sweeps)
+        v = (x_pred - x) / h
+
+    Constraints are projected in batches:
+        "gauss_seidel": springs are graph-colored so no two springs in a color share a vertex,
+                        each color is projected in one vectorized operation.
+        "jacobi": all springs at once, corrections averaged per vertex (scaled by jacobi_relaxation).
+    Fixed vertices get zero inverse mass, so they are hard constraints.
+    Springs are stored in color order so every batch is a slice; temporaries live in the model's workspace
+    and the state is updated in place.
+    """
+
+    def __init__(
+        self,
+        n_substeps: int = 4,
+        n_iterations: int = 1,
+        batching: str = "gauss_seidel",
+        compliance: Optional[float] = None,
+        jacobi_relaxation: float = 1.5,
+    ):
+        if batching not in ("gauss_seidel", "jacobi"):
+            raise ValueError(f"Unknown {batching=}")
+        self.n_substeps = n_substeps
+        self.n_iterations = n_iterations
+        self.batching = batching
+        self.compliance = compliance
+        self.jacobi_relaxation = jacobi_relaxation
+        self.colors: Optional[List[np.ndarray]] = None
+
+    def prepare(self, model) -> None:
+        # Topology is fixed for the lifetime of the model, so this is done once
+        n_vertices = model.vertices.shape[0]
+        self.inverse_mass = 1.0 / model.mass  # V, 1
+        self.inverse_mass[model.fixed_vertices] = 0.0
+        if self.batching == "gauss_seidel":
+            self.colors = color_edges(model.spring_end_points, n_vertices)
+            logger.info(f"Colored {model.spring_end_points.shape[0]} springs with {len(self.colors)} colors")
+        else:
+            self.colors = [np.arange(model.spring_end_points.shape[0])]
+            degree = np.bincount(model.spring_end_points.reshape(-1), minlength=n_vertices).astype(np.float32)
+            self.jacobi_scale = (self.jacobi_relaxation / np.maximum(degree, 1.0))[:, None]  # V, 1
+            self.jacobi_weight = self.jacobi_scale * self.inverse_mass  # V, 1
+        # per-spring data in color order, so that each color is a contiguous slice
+        order = np.concatenate(self.colors)  # S
+        bounds = np.cumsum([0] + [springs.shape[0] for springs in self.colors])
+        self.color_slices = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        self.first = model.spring_end_points[order, 0]  # S
+        self.second = model.spring_end_points[order, 1]  # S
+        self.resting_lengths = model.spring_resting_lengths[order]  # S, 1
+        self.weight_first = self.inverse_mass[self.first]  # S, 1
+        self.weight_second = self.inverse_mass[self.second]  # S, 1
+        if self.compliance is None:
+            self.spring_compliance = 1.0 / model.spring_stiffness[order]  # S, 1
+        else:
+            self.spring_compliance = np.full_like(model.spring_resting_lengths, self.compliance)
+
+    def project(self, model, positions: np.ndarray, multipliers: np.ndarray, alpha_tilde: np.ndarray, springs: slice) -> None:
+        """ One XPBD projection of the color-ordered `springs`, in place on positions (V, 3) and multipliers (S, 1) """
+        workspace = model.workspace
+        n_springs = self.first.shape[0]
+        n_constraints = springs.stop - springs.start
+        tiny = np.finfo(np.float32).tiny
+        i, j = self.first[springs], self.second[springs]  # C
+        positions_i = workspace.rows("xpbd_positions_first", n_constraints, n_springs, (3,))  # C, 3
+        positions_j = workspace.rows("xpbd_positions_second", n_constraints, n_springs, (3,))  # C, 3
+        np.take(positions, i, axis=0, out=positions_i, mode="clip")
+        np.take(positions, j, axis=0, out=positions_j, mode="clip")
+        direction = workspace.rows("xpbd_direction", n_constraints, n_springs, (3,))  # C, 3
+        np.subtract(positions_j, positions_i, out=direction)
+        scratch = workspace.rows("xpbd_scratch", n_constraints, n_springs, (3,))  # C, 3
+        lengths = workspace.rows("xpbd_lengths", n_constraints, n_springs, (1,))  # C, 1
+        np.multiply(direction, direction, out=scratch)
+        # column by column: the same sums as np.linalg.norm, without the buffered reduction over an axis of length 3
+        np.add(np.add(scratch[:, 0:1], scratch[:, 1:2], out=lengths), scratch[:, 2:3], out=lengths)
+        np.sqrt(lengths, out=lengths)
+        denominator = workspace.rows("xpbd_denominator", n_constraints, n_springs, (1,))  # C, 1
+        np.divide(direction, np.maximum(lengths, tiny, out=denominator), out=direction)
+        constraint = np.subtract(lengths, self.resting_lengths[springs], out=lengths)  # C, 1
+        weight_i = self.weight_first[springs]  # C, 1
+        weight_j = self.weight_second[springs]  # C, 1
+        spring_alpha = alpha_tilde[springs]  # C, 1
+        spring_multipliers = multipliers[springs]  # C, 1
+        np.add(np.add(weight_i, weight_j, out=denominator), spring_alpha, out=denominator)
+        np.maximum(denominator, tiny, out=denominator)
+        delta_multiplier = np.negative(constraint, out=constraint)  # C, 1
+        np.subtract(delta_multiplier, np.multiply(spring_alpha, spring_multipliers, out=scratch[:, :1]), out=delta_multiplier)
+        np.divide(delta_multiplier, denominator, out=delta_multiplier)
+        spring_multipliers += delta_multiplier
+        correction = np.multiply(delta_multiplier, direction, out=direction)  # C, 3
+        if self.batching == "gauss_seidel":
+            # no vertex appears twice within a color, so the gathered positions are still current
+            # and plain fancy-index updates are safe
+            positions[i] = np.subtract(positions_i, np.multiply(weight_i, correction, out=scratch), out=positions_i)
+            positions[j] = np.add(positions_j, np.multiply(weight_j, correction, out=scratch), out=positions_j)
+        else:
+            # vertex_to_spring is +1 on the first end point, -1 on the second (the one color keeps spring order)
+            vertex_correction = workspace.array("xpbd_vertex_correction", positions.shape)  # V, 3
+            model.vertex_to_spring.matmul(correction, out=vertex_correction, workspace=workspace)
+            positions -= np.multiply(self.jacobi_weight, vertex_correction, out=vertex_correction)
+
+    def step(self, model, dt: float) -> None:
+        if self.colors is None:
+            self.prepare(model)
+        workspace = model.workspace
+        h = dt / self.n_substeps
+        alpha_tilde = np.divide(self.spring_compliance, h * h, out=workspace.array("xpbd_alpha_tilde", self.spring_compliance.shape))  # S, 1
+        initial_velocity = workspace.array("xpbd_initial_velocity", model.velocity.shape)  # V, 3
+        np.copyto(initial_velocity, model.velocity)
+        step_inverse_mass = np.multiply(h, self.inverse_mass, out=workspace.array("xpbd_step_inverse_mass", self.inverse_mass.shape))  # V, 1
+        positions = workspace.array("xpbd_positions", model.vertices.shape)  # V, 3
+        multipliers = workspace.array("xpbd_multipliers", self.resting_lengths.shape)  # S, 1
+        for _ in range(self.n_substeps):
+            # the predicted velocity, then positions
+            force = model.external_force()  # V, 3
+            np.add(model.velocity, np.multiply(step_inverse_mass, force, out=force), out=model.velocity)
+            np.add(model.vertices, np.multiply(h, model.velocity, out=positions), out=positions)
+            multipliers.fill(0)
+            for _ in range(self.n_iterations):
+                for springs in self.color_slices:
+                    self.project(model, positions, multipliers, alpha_tilde, springs)
+            np.divide(np.subtract(positions, model.vertices, out=model.velocity), h, out=model.velocity)
+            np.copyto(model.vertices, positions)
+        np.divide(np.subtract(model.velocity, initial_velocity, out=model.acceleration), dt, out=model.acceleration)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Iteration stats: {dt=} {self.n_substeps=} {np.linalg.norm(model.velocity)=}")
@@ -0,0 +1,12 @@
+from typing import Dict, Type
+from .base_integrator import BaseIntegrator
+from .explicit_euler import ExplicitEuler
+from .implicit_euler import ImplicitEuler
+from .position_based import PositionBasedDynamics
+
+
+IntegratorRegistry: Dict[str, Type[BaseIntegrator]] = {
+    "explicit_euler": ExplicitEuler,
+    "implicit_euler": ImplicitEuler,
+    "position_based": PositionBasedDynamics,
+}
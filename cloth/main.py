@@ -1,5 +1,9 @@
 """ Meant to be a living rendering pipeline. """
 import os
+import sys
+from cloth.offscreen import OFFSCREEN_PLATFORMS, select_platform_from_argv
+# PyOpenGL binds its platform on first import: --offscreen has to choose EGL/OSMesa before the imports below
+select_platform_from_argv(sys.argv)
 from OpenGL.GL import *
 from OpenGL.arrays.vbo import VBO
 import argparse
@@ -9,40 +13,81 @@ from cloth.gl_texture import GlTexture, TextureBounds
 from cloth.light_source import LightSource
 from cloth.drawables.square import Square
 from cloth.drawables.spring_mass_grid_square import SpringMassGridSquare
+from cloth.drawables.multi_resolution_cloth import MultiResolutionCloth
 from cloth.force_field.wind_cylinder_field import WindCylinderField
-import glfw
 import platform
 import ctypes
 import time
 from cloth.timeseries import AbsoluteSine
+from cloth.frame_sinks import ImageDirectorySink, make_frame_sink
+from cloth.checkpoint import Checkpointer, StateRecorder, StateReplay, latest_checkpoint, load_checkpoint
+from cloth.profiler import get_profiler
+from cloth.backends.registry import with_threads
 import numpy as np
 import logging
 import json
 
 
-def setup_logger():
-    logging.basicConfig(level=logging.NOTSET)
+logger = logging.getLogger(__name__)
 
-setup_logger()
+
+def setup_logger(level: str = "INFO"):
+    # not NOTSET: debug f-strings on the per-frame path are only formatted when asked for
+    logging.basicConfig(level=level)
 
 
 def get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     parser.add_argument("--output_dir", default="cloth/output/", type=str, help="Relative path to folder to renderer will save frames")
+    parser.add_argument("--output", default=None, type=str, help="Stream frames to a video instead of --output_dir: .y4m is written raw, other extensions are encoded by ffmpeg")
+    parser.add_argument("--fps", default=30, type=int, help="Frame rate of --output videos")
+    parser.add_argument("--ffmpeg_path", default="ffmpeg", type=str, help="ffmpeg binary used for --output videos")
     parser.add_argument("--vertex_shader_path", default="cloth/shaders/vertex_shader_with_mat.glsl", type=str, help="Relative path to file with vertex shader")
     parser.add_argument("--fragment_shader_path", default="cloth/shaders/fragment_shader.glsl", type=str, help="Relative path to file with fragment shader")
     parser.add_argument("--texture_path", default="cloth/rsc/leaves.jpg", type=str, help="Relative path to a textured file")
     parser.add_argument("-l", "--light_coords", type=float, nargs=3, help="Where is the light boio", default=[0.0, 0.0, 3.0])
     parser.add_argument("--drawable", type=str, help="Classname of drawable", default="SpringMassGridSquare")
     parser.add_argument("--kwargs_json", type=str, help="Kwargs in json format", default=r"{}")
+    parser.add_argument("--offscreen", default=None, type=str, choices=OFFSCREEN_PLATFORMS, help="Render without a window (no display needed) through EGL or Mesa's OSMesa")
+    parser.add_argument("--width", default=800, type=int, help="Frame width in pixels")
+    parser.add_argument("--height", default=800, type=int, help="Frame height in pixels")
+    parser.add_argument("--n_frames", default=None, type=int, help="Stop after this many frames (required with --offscreen, unless replaying)")
+    parser.add_argument("--async_capture", action="store_true", help="Read back frames through PBOs and encode them on a thread pool")
+    parser.add_argument("--capture_workers", type=int, help="Encoder threads for --async_capture", default=4)
+    parser.add_argument("--n_threads", type=int, help="Evaluate forces on this many threads (the threaded backend)", default=1)
+    parser.add_argument("--delta_t_seconds", type=float, help="Simulation timestep per frame", default=0.01)
+    parser.add_argument("--checkpoint_dir", type=str, help="Save simulation checkpoints here", default=None)
+    parser.add_argument("--checkpoint_every", type=int, help="Frames between checkpoints", default=500)
+    parser.add_argument("--resume", type=str, help="Checkpoint file, or a --checkpoint_dir to resume from its latest checkpoint", default=None)
+    parser.add_argument("--record_dir", type=str, help="Record every frame's state here for --replay_dir", default=None)
+    parser.add_argument("--replay_dir", type=str, help="Re-render the frames of a --record_dir recording, no physics", default=None)
+    parser.add_argument("--profile", action="store_true", help="Time every frame's stages, log their percentiles at exit")
+    parser.add_argument("--profile_window", type=int, help="Frames kept for --profile percentiles", default=300)
+    parser.add_argument("--profile_trace", type=str, help="Also write the last --profile_window frames as a Chrome trace json here", default=None)
+    parser.add_argument("--log_level", type=str, help="Python logging level", default="INFO")
     # TODO: need a way to map parts of texture to different classes?
     return parser
 
 if __name__ == "__main__":
     parser = get_parser()
     args = parser.parse_args()
+    if args.offscreen is not None and args.n_frames is None and args.replay_dir is None:
+        parser.error("--offscreen runs have no window to close: give --n_frames")
+    setup_logger(args.log_level)
+    profiler = get_profiler()
+    profiler.configure(args.profile or args.profile_trace is not None, args.profile_window, 0 if args.profile_trace is None else args.profile_window)
     light_source = LightSource(pos=np.array(args.light_coords, dtype=np.float32))
-    api = GraphicsAPI(800, 800, "cloth rendering", auto_update_camera=True)
+    api = GraphicsAPI(
+        args.height,
+        args.width,
+        "cloth rendering",
+        auto_update_camera=True,
+        async_capture=args.async_capture,
+        capture_workers=args.capture_workers,
+        offscreen=args.offscreen,
+    )
+    api.camera.aspect = args.width / args.height
+    api.camera.projection_dirty = True
     model = eval(args.drawable)(  # TODO: make it a registry or an importlib
         side=0.5,
         texture_bounds=TextureBounds(),
@@ -52,11 +97,28 @@ if __name__ == "__main__":
             radius=0.1,
             coefficient=0.05,
         ),
-        **(json.loads(args.kwargs_json)),
+        **with_threads(json.loads(args.kwargs_json), args.n_threads),
     )
-    os.makedirs(args.output_dir, exist_ok=True)
+    if isinstance(model, MultiResolutionCloth):
+        # level of detail follows the camera's distance
+        model.camera = api.camera
+    frame_index = 0
+    if args.resume is not None:
+        resume_path = latest_checkpoint(args.resume) if os.path.isdir(args.resume) else args.resume
+        frame_index = load_checkpoint(resume_path, model)
+    replay = None if args.replay_dir is None else StateReplay(args.replay_dir)
+    if replay is not None:
+        # a recording of a resumed run keeps numbering its frames from where that run started
+        frame_index = replay.first_frame_index
+    checkpointer = None if args.checkpoint_dir is None else Checkpointer(args.checkpoint_dir, args.checkpoint_every)
+    recorder = None if args.record_dir is None else StateRecorder(args.record_dir, model.vertices.shape[0], frame_index)
+    if args.output is None:
+        frame_sink = ImageDirectorySink(args.output_dir)
+    else:
+        frame_sink = make_frame_sink(args.output, fps=args.fps, ffmpeg_path=args.ffmpeg_path)
     # ASSERT: gl is initialized
-    with api.create_window() as window:
+    # the sink is closed only after create_window() has flushed every captured frame
+    with frame_sink, api.create_window() as window:
         # TODO: build drawable based on some configuration file.
         texture = GlTexture.init_from_file(args.texture_path)
 
@@ -77,29 +139,51 @@ if __name__ == "__main__":
             GlUniform(name="light_source_position", dtype="vec3f", gl_program=program),
         ])
 
-        tic = 0.0 # time.time()
-        delta_t_seconds = 0.01
+        tic = model.t  # 0.0 unless resumed
+        frames_drawn = 0
+        delta_t_seconds = args.delta_t_seconds
         while True:
             if not api.should_run_then_clear():
                 break
-            tic = tic + delta_t_seconds
-            model.update(tic)
-            # use our own rendering program
-            glUseProgram(program)
-            # update some uniforms
-            uniforms.update({
-                "view_matrix": api.camera.view_matrix(),
-                "projection_matrix": api.camera.projection_matrix(),
-                "light_source_position": light_source.pos,
-            })
-            with api.use_vao(vertices_vao) as vao:
-                with texture.activate():
-                    model.draw()
+            if replay is not None and frame_index - replay.first_frame_index >= len(replay):
+                break
+            if args.n_frames is not None and frames_drawn >= args.n_frames:
+                break
+            with profiler.frame():
+                with profiler.scope("update"):
+                    if replay is not None:
+                        replay.apply(model, frame_index - replay.first_frame_index)
+                        frame_index += 1
+                    else:
+                        tic = tic + delta_t_seconds
+                        model.update(tic)
+                        frame_index += 1
+                        if recorder is not None:
+                            recorder.record(model)
+                        if checkpointer is not None:
+                            checkpointer.maybe_save(model, frame_index)
+                # use our own rendering program
+                glUseProgram(program)
+                # update some uniforms
+                uniforms.update({
+                    "view_matrix": api.camera.view_matrix(),
+                    "projection_matrix": api.camera.projection_matrix(),
+                    "light_source_position": light_source.pos,
+                })
+                with api.use_vao(vertices_vao) as vao:
+                    with texture.activate():
+                        model.draw()
 
-            # tell glfw to poll and process window events
-            glfw.poll_events()
-            # swap frame buffer
-            glfw.swap_buffers(window)
-            api.save_frame(save_dir=args.output_dir)
+                # glfw events and buffer swap; nothing offscreen
+                api.present()
+                # numbered like the simulation's frames, so resumed runs continue the previous output
+                api.write_frame(frame_sink, frame_index)
+                frames_drawn += 1
 
+    if recorder is not None:
+        recorder.close()
+    if profiler.enabled:
+        logger.info(f"Per-frame profile over the last {profiler.window} frames:\n{profiler.summary()}")
+    if args.profile_trace is not None:
+        profiler.export_chrome_trace(args.profile_trace)
     print("Successfully reached end of main")
\ No newline at end of file
@@ -0,0 +1,164 @@
+""" Windowless OpenGL contexts (EGL or Mesa's OSMesa) and the framebuffer object they render into.
+PyOpenGL binds its platform when it is first imported, so callers choose it before importing OpenGL:
+    select_platform("egl")  # or "osmesa"; the same as PYOPENGL_PLATFORM=egl
+    from OpenGL.GL import *
+"""
+import os
+import sys
+import ctypes
+import logging
+import numpy as np
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+OFFSCREEN_PLATFORMS = ("egl", "osmesa")
+# EGL_MESA_platform_surfaceless: a display with no window system at all, e.g. Mesa's llvmpipe on a render node
+_EGL_PLATFORM_SURFACELESS_MESA: int = 0x31DD
+
+
+def select_platform(offscreen: Optional[str]) -> None:
+    """ Makes PyOpenGL load `offscreen` ("egl" or "osmesa"); None keeps the default (GLX, WGL, ...) """
+    if offscreen is None:
+        return
+    if offscreen not in OFFSCREEN_PLATFORMS:
+        raise ValueError(f"Unknown offscreen platform {offscreen}, expected one of {OFFSCREEN_PLATFORMS}")
+    if "OpenGL.platform" in sys.modules and os.environ.get("PYOPENGL_PLATFORM") != offscreen:
+        raise RuntimeError(f"OpenGL was imported before select_platform({offscreen!r}): set PYOPENGL_PLATFORM={offscreen} instead")
+    os.environ["PYOPENGL_PLATFORM"] = offscreen
+
+
+def select_platform_from_argv(argv) -> None:
+    """ select_platform(--offscreen), for scripts whose imports pull in OpenGL before their arguments are parsed """
+    for i, argument in enumerate(argv):
+        if argument == "--offscreen" and i + 1 < len(argv):
+            return select_platform(argv[i + 1])
+        if argument.startswith("--offscreen="):
+            return select_platform(argument.split("=", 1)[1])
+
+
+class EglContext:
+    """ An OpenGL 3.3 core context with no surface; the default display, or Mesa's surfaceless one without a GPU """
+
+    def __init__(self):
+        from OpenGL import EGL
+        self.EGL = EGL
+        self.display = None
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        for display in self.candidate_displays():
+            try:
+                if EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+                    self.display = display
+                    break
+            except EGL.EGLError as error:
+                logger.debug(f"EGL display {display} failed: {error}")
+        if self.display is None:
+            raise RuntimeError("No EGL display could be initialized")
+
+        config_attributes = (EGL.EGLint * 11)(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RED_SIZE, 8,
+            EGL.EGL_GREEN_SIZE, 8,
+            EGL.EGL_BLUE_SIZE, 8,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE,
+        )
+        config = EGL.EGLConfig()
+        n_configs = EGL.EGLint()
+        if not EGL.eglChooseConfig(self.display, config_attributes, ctypes.pointer(config), 1, ctypes.pointer(n_configs)) or n_configs.value == 0:
+            raise RuntimeError("No EGL config supports desktop OpenGL")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attributes = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+            EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE,
+        )
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, context_attributes)
+        if not self.context:
+            raise RuntimeError("Could not create an OpenGL 3.3 core EGL context")
+        # no surface: everything is drawn into a Framebuffer
+        if not EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise RuntimeError("Could not make the EGL context current")
+        logger.info(f"EGL {major.value}.{minor.value} context")
+
+    def candidate_displays(self):
+        EGL = self.EGL
+        yield EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        yield EGL.eglGetPlatformDisplay(_EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+
+    def close(self) -> None:
+        EGL = self.EGL
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglTerminate(self.display)
+
+
+class OsmesaContext:
+    """ Mesa's software rasterizer: an OpenGL 3.3 core context drawing into host memory, no driver or GPU needed """
+
+    def __init__(self, width: int, height: int):
+        from OpenGL import GL, osmesa
+        self.osmesa = osmesa
+        attributes = (ctypes.c_int * 11)(
+            osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+            osmesa.OSMESA_DEPTH_BITS, 24,
+            osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+            osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+            osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3,
+            0,
+        )
+        self.context = osmesa.OSMesaCreateContextAttribs(attributes, None)
+        if not self.context:
+            raise RuntimeError("Could not create an OpenGL 3.3 core OSMesa context")
+        # the context's own buffer; frames are drawn into a Framebuffer like with EGL
+        self.buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        if not osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL.GL_UNSIGNED_BYTE, width, height):
+            raise RuntimeError("Could not make the OSMesa context current")
+        logger.info("OSMesa context")
+
+    def close(self) -> None:
+        self.osmesa.OSMesaDestroyContext(self.context)
+
+
+def make_offscreen_context(platform: str, width: int, height: int):
+    if platform == "egl":
+        return EglContext()
+    if platform == "osmesa":
+        return OsmesaContext(width, height)
+    raise ValueError(f"Unknown offscreen platform {platform}, expected one of {OFFSCREEN_PLATFORMS}")
+
+
+class Framebuffer:
+    """
+    A width x height framebuffer object with an RGBA8 color and a 24 bit depth renderbuffer, bound for drawing
+    and reading (glReadPixels and the PBOs of cloth.frame_capture read from it), with the viewport set to it.
+    """
+
+    def __init__(self, width: int, height: int):
+        from OpenGL.GL import (
+            glGenFramebuffers, glBindFramebuffer, glGenRenderbuffers, glBindRenderbuffer, glRenderbufferStorage,
+            glFramebufferRenderbuffer, glCheckFramebufferStatus, glViewport,
+            GL_FRAMEBUFFER, GL_RENDERBUFFER, GL_RGBA8, GL_DEPTH_COMPONENT24, GL_COLOR_ATTACHMENT0,
+            GL_DEPTH_ATTACHMENT, GL_FRAMEBUFFER_COMPLETE,
+        )
+        self.width = width
+        self.height = height
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        self.color, self.depth = glGenRenderbuffers(2)
+        for renderbuffer, storage, attachment in ((self.color, GL_RGBA8, GL_COLOR_ATTACHMENT0), (self.depth, GL_DEPTH_COMPONENT24, GL_DEPTH_ATTACHMENT)):
+            glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, storage, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, renderbuffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Framebuffer of {width}x{height} is incomplete: {status=}")
+        glViewport(0, 0, width, height)
+
+    def close(self) -> None:
+        from OpenGL.GL import glBindFramebuffer, glDeleteFramebuffers, glDeleteRenderbuffers, GL_FRAMEBUFFER
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glDeleteRenderbuffers(2, [self.color, self.depth])
+        glDeleteFramebuffers(1, [self.framebuffer])
@@ -0,0 +1,149 @@
+""" Low-overhead hierarchical profiling: nested timed scopes, per-frame totals, rolling percentiles, Chrome traces. """
+import json
+import logging
+import threading
+import contextlib
+import numpy as np
+from collections import deque
+from typing import Any, Deque, Dict, List, Sequence, Tuple
+from utils import LogicBlock
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileScope(LogicBlock):
+    """ A LogicBlock that reports to a Profiler under its parent's path, e.g. "update/integrate/force" """
+
+    def __init__(self, profiler: "Profiler", name: str):
+        super().__init__(name)
+        self.profiler = profiler
+
+    def __enter__(self) -> "ProfileScope":
+        stack = self.profiler.stack()
+        self.path = f"{stack[-1].path}/{self.description}" if stack else self.description
+        stack.append(self)
+        return super().__enter__()
+
+    def __exit__(self, *args) -> None:
+        super().__exit__(*args)
+        self.profiler.stack().pop()
+        self.profiler.record(self.path, self.start_ns, self.elapsed_ns)
+
+
+_DISABLED_SCOPE = contextlib.nullcontext()
+
+
+class Profiler:
+    """
+    profiler = get_profiler()
+    profiler.configure(enabled=True)
+    with profiler.frame():
+        with profiler.scope("update"):
+            with profiler.scope("force"): ...
+
+    Scopes nest per thread (encoders on a pool get their own stacks). Each closed scope is one
+    (path, start, duration, thread) event appended to the current frame; frame() then sums durations per
+    path and pushes the totals into rolling windows of the last `window` frames for percentiles().
+    With trace_frames > 0 the raw events of that many most recent frames are kept for export_chrome_trace().
+    While disabled, scope() returns a shared no-op context manager.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = 300, trace_frames: int = 0):
+        self.local = threading.local()
+        self.configure(enabled, window, trace_frames)
+
+    def configure(self, enabled: bool, window: int = 300, trace_frames: int = 0) -> None:
+        """ (Re)starts profiling with these settings, dropping everything recorded so far """
+        self.enabled = enabled
+        self.window = window
+        self.trace_frames = trace_frames
+        self.events: List[Tuple[str, int, int, int]] = []  # path, start_ns, duration_ns, thread id
+        self.frame_totals: Dict[str, Deque[int]] = {}  # path -> rolling per-frame total ns
+        self.trace: Deque[List[Tuple[str, int, int, int]]] = deque(maxlen=max(trace_frames, 1))
+        self.n_frames = 0
+
+    def stack(self) -> List[ProfileScope]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def scope(self, name: str):
+        if not self.enabled:
+            return _DISABLED_SCOPE
+        return ProfileScope(self, name)
+
+    def record(self, path: str, start_ns: int, duration_ns: int) -> None:
+        # list.append is atomic: no lock needed for events from encoder threads
+        self.events.append((path, start_ns, duration_ns, threading.get_ident()))
+
+    @contextlib.contextmanager
+    def frame(self):
+        if not self.enabled:
+            yield
+            return
+        with self.scope("frame"):
+            yield
+        self.end_frame()
+
+    def end_frame(self) -> None:
+        events, self.events = self.events, []
+        totals: Dict[str, int] = {}
+        for path, _, duration_ns, _ in events:
+            totals[path] = totals.get(path, 0) + duration_ns
+        for path in set(totals) | set(self.frame_totals):
+            # scopes that didn't run this frame count as 0, so percentiles stay per frame
+            self.frame_totals.setdefault(path, deque(maxlen=self.window)).append(totals.get(path, 0))
+        if self.trace_frames > 0:
+            self.trace.append(events)
+        self.n_frames += 1
+
+    def percentiles(self, quantiles: Sequence[float] = (50, 90, 99)) -> Dict[str, Dict[str, float]]:
+        """ Per scope path: milliseconds per frame at each percentile over the rolling window, and the mean """
+        report = {}
+        for path in sorted(self.frame_totals):
+            milliseconds = np.asarray(self.frame_totals[path], dtype=np.float64) * 1e-6
+            report[path] = {
+                **{f"p{quantile:g}_ms": float(value) for quantile, value in zip(quantiles, np.percentile(milliseconds, quantiles))},
+                "mean_ms": float(milliseconds.mean()),
+            }
+        return report
+
+    def summary(self) -> str:
+        lines = [f"{'scope':<40} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'mean ms':>10}"]
+        for path, stats in self.percentiles().items():
+            lines.append(
+                f"{path:<40} {stats['p50_ms']:>10.3f} {stats['p90_ms']:>10.3f} {stats['p99_ms']:>10.3f} {stats['mean_ms']:>10.3f}"
+            )
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """ Complete ("X") events in microseconds, loadable in chrome://tracing or Perfetto """
+        trace_events = []
+        first_frame = self.n_frames - len(self.trace)
+        for frame_offset, events in enumerate(self.trace):
+            for path, start_ns, duration_ns, thread_id in events:
+                trace_events.append({
+                    "name": path.rsplit("/", 1)[-1],
+                    "cat": path,
+                    "ph": "X",
+                    "ts": start_ns / 1e3,
+                    "dur": duration_ns / 1e3,
+                    "pid": 0,
+                    "tid": thread_id,
+                    "args": {"frame": first_frame + frame_offset},
+                })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        logger.info(f"Wrote chrome trace of {len(self.trace)} frames to {path}")
+
+
+# one process-wide profiler, like logging's loggers: instrumented code calls get_profiler().scope(...)
+_profiler = Profiler()
+
+
+def get_profiler() -> Profiler:
+    return _profiler
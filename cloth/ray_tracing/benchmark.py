@@ -0,0 +1,83 @@
+""" BVH build time and traversal throughput over subdivided icospheres (80 * 4^k triangles).
+python -m cloth.ray_tracing.benchmark --n_subdivisions 2 4 6 7
+"""
+import argparse
+import json
+import logging
+import time
+import numpy as np
+from typing import Any, Dict, List
+from cloth.geometry.triangle_mesh import TriangleMesh, load_obj, subdivide
+from cloth.ray_tracing.intersect import TriangleSet, build_triangle_bvh, intersect_brute_force, intersect_bvh
+from cloth.ray_tracing.render import camera_rays
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--obj_path", type=str, help="Base mesh, subdivided onto its sphere", default="icosphere.obj")
+    parser.add_argument("--scale", type=float, help="Scale applied to the scene", default=0.75)
+    parser.add_argument("--n_subdivisions", type=int, nargs="+", help="Subdivision levels to benchmark", default=[2, 4, 6, 7])
+    parser.add_argument("--width", type=int, help="Image width in pixels", default=256)
+    parser.add_argument("--height", type=int, help="Image height in pixels", default=256)
+    parser.add_argument("--methods", type=str, nargs="+", choices=["sah", "lbvh"], help="BVH builds to compare", default=["sah", "lbvh"])
+    parser.add_argument("--brute_force_max_triangles", type=int, help="Also time all-pairs intersection up to this size", default=5000)
+    parser.add_argument("--log_level", type=str, help="Python logging level", default="WARNING")
+    return parser
+
+
+def benchmark_mesh(
+    mesh: TriangleMesh,
+    origins: np.ndarray,
+    directions: np.ndarray,
+    methods: List[str],
+    brute_force_max_triangles: int,
+) -> Dict[str, Any]:
+    n_rays = directions.shape[0]
+    triangles = TriangleSet.from_mesh(mesh)
+    report = {"n_triangles": int(mesh.faces.shape[0]), "n_rays": n_rays}
+    for method in methods:
+        t0 = time.perf_counter()
+        bvh = build_triangle_bvh(mesh, method)
+        build_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        hits = intersect_bvh(triangles, bvh, origins, directions)
+        trace_seconds = time.perf_counter() - t0
+        report[method] = {
+            "n_nodes": bvh.n_nodes,
+            "build_seconds": build_seconds,
+            "trace_seconds": trace_seconds,
+            "rays_per_second": n_rays / trace_seconds,
+            "n_hits": int(hits.hit.sum()),
+        }
+    if mesh.faces.shape[0] <= brute_force_max_triangles:
+        t0 = time.perf_counter()
+        hits = intersect_brute_force(triangles, origins, directions)
+        trace_seconds = time.perf_counter() - t0
+        report["brute_force"] = {
+            "trace_seconds": trace_seconds,
+            "rays_per_second": n_rays / trace_seconds,
+            "n_hits": int(hits.hit.sum()),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+    logging.basicConfig(level=args.log_level)
+    origins, directions = camera_rays(args.width, args.height)
+    mesh = load_obj(args.obj_path, scale=args.scale)
+    level = 0
+    reports = []
+    for n_subdivisions in sorted(args.n_subdivisions):
+        while level < n_subdivisions:
+            mesh = subdivide(mesh, onto_sphere=True)
+            level += 1
+        reports.append({
+            "n_subdivisions": n_subdivisions,
+            **benchmark_mesh(mesh, origins, directions, args.methods, args.brute_force_max_triangles),
+        })
+        logger.info(json.dumps(reports[-1]))
+    print(json.dumps(reports, indent=2))
@@ -0,0 +1,308 @@
+""" Batched ray-triangle intersection (Möller–Trumbore), vectorized over rays x triangles. """
+import logging
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Tuple
+from cloth.geometry.bvh import BVH
+from cloth.geometry.triangle_mesh import TriangleMesh
+
+
+logger = logging.getLogger(__name__)
+_DET_EPSILON: float = 1e-12
+
+
+@dataclass
+class RayHits:
+    """ Closest hit per ray. Misses have depth inf, face -1 and zero barycentrics. """
+    depth: np.ndarray  # R float32, distance along the ray in units of |direction|
+    face: np.ndarray  # R int64
+    barycentrics: np.ndarray  # R, 3 float32 weights of the face's vertices 0, 1, 2
+
+    @staticmethod
+    def empty(n_rays: int) -> "RayHits":
+        return RayHits(
+            depth=np.full(n_rays, np.inf, dtype=np.float32),
+            face=np.full(n_rays, -1, dtype=np.int64),
+            barycentrics=np.zeros((n_rays, 3), dtype=np.float32),
+        )
+
+    @property
+    def hit(self) -> np.ndarray:
+        return self.face >= 0
+
+    def points(self, origins: np.ndarray, directions: np.ndarray) -> np.ndarray:
+        """ Hit positions (R, 3); nan for misses """
+        depth = np.where(self.hit, self.depth, np.nan)
+        return origins + depth[:, None] * directions
+
+    def merge(self, other: "RayHits") -> None:
+        """ Keep, per ray, the closer of self and other (in place) """
+        closer = other.depth < self.depth
+        self.depth[closer] = other.depth[closer]
+        self.face[closer] = other.face[closer]
+        self.barycentrics[closer] = other.barycentrics[closer]
+
+
+class TriangleSet:
+    """
+    Möller–Trumbore with q = d x (o - v0) and n = e1 x e2 gives (Cramer's rule on o + t d = v0 + u e1 + v e2)
+    det = -d.n, u det = -e2.q, v det = e1.q, t det = (o - v0).n, and expanding q = d x o - d x v0 makes all
+    four linear in the ray features [d, d x o, o] (9 values). Their per-triangle coefficients are precomputed
+    here, so intersecting R rays with F triangles is four (R, 9) @ (9, F) matmuls plus elementwise tests.
+    """
+
+    def __init__(
+        self,
+        coefficients: np.ndarray,
+        offset: np.ndarray,
+        v0: np.ndarray,
+        edge1: np.ndarray,
+        edge2: np.ndarray,
+    ):
+        self.coefficients = coefficients  # 4, F, 9
+        self.offset = offset  # F
+        # plain form for the per-pair tests of BVH traversal
+        self.v0, self.edge1, self.edge2 = v0, edge1, edge2  # F, 3 each
+
+    @property
+    def n_triangles(self) -> int:
+        return self.offset.shape[0]
+
+    @staticmethod
+    def from_mesh(mesh: TriangleMesh) -> "TriangleSet":
+        triangles = mesh.triangles.astype(np.float32)  # F, 3, 3
+        v0 = triangles[:, 0]  # F, 3
+        edge1 = triangles[:, 1] - v0  # F, 3
+        edge2 = triangles[:, 2] - v0  # F, 3
+        normal = np.cross(edge1, edge2)  # F, 3, unnormalized
+        zeros = np.zeros_like(v0)
+        # [det, u det, v det, t det + v0.n] x triangles x ray features [d, d x o, o]
+        coefficients = np.stack((
+            np.concatenate((-normal, zeros, zeros), axis=1),
+            np.concatenate((np.cross(v0, edge2), -edge2, zeros), axis=1),
+            np.concatenate((-np.cross(v0, edge1), edge1, zeros), axis=1),
+            np.concatenate((zeros, zeros, normal), axis=1),
+        ), axis=0).astype(np.float32)  # 4, F, 9
+        offset = np.sum(v0 * normal, axis=1).astype(np.float32)  # F
+        return TriangleSet(coefficients, offset, v0, edge1, edge2)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        """ Flat dict of arrays, e.g. for np.save and mmap-ing in render workers """
+        return {
+            f"{prefix}_{name}": getattr(self, name)
+            for name in ("coefficients", "offset", "v0", "edge1", "edge2")
+        }
+
+    @staticmethod
+    def from_arrays(arrays: Dict[str, np.ndarray], prefix: str) -> "TriangleSet":
+        return TriangleSet(*(arrays[f"{prefix}_{name}"] for name in ("coefficients", "offset", "v0", "edge1", "edge2")))
+
+
+def ray_features(origins: np.ndarray, directions: np.ndarray) -> np.ndarray:
+    """ [d, d x o, o] per ray (R, 9); origins (R, 3), or (3,) when shared by all rays """
+    origins = np.broadcast_to(origins, directions.shape)
+    return np.concatenate((directions, np.cross(directions, origins), origins), axis=1).astype(np.float32)
+
+
+def moller_trumbore(
+    features: np.ndarray,
+    triangles: TriangleSet,
+    faces: np.ndarray,
+    t_min: float = 1e-6,
+) -> RayHits:
+    """ Closest hit of each ray (features from ray_features) among `faces`, all pairs at once.
+    Memory is O(R * len(faces)): callers chunk.
+    """
+    n_rays = features.shape[0]
+    # (F, 9) gathers are contiguous, so their transposes go straight to BLAS
+    det, u, v, t = (features @ triangles.coefficients[k, faces].T for k in range(4))  # R, F each
+    t -= triangles.offset[faces]
+
+    # in place on the (R, F) blocks: this is memory bound, every temporary counts
+    missed = np.abs(det) < _DET_EPSILON
+    det[missed] = 1.0
+    inverse_det = np.reciprocal(det, out=det)
+    u *= inverse_det
+    v *= inverse_det
+    t *= inverse_det
+    missed |= u < 0
+    missed |= v < 0
+    missed |= t <= t_min
+    det = np.add(u, v, out=det)
+    missed |= det > 1
+    t[missed] = np.inf
+    closest = np.argmin(t, axis=1)  # R
+    rows = np.arange(n_rays)
+    depth = t[rows, closest]
+    hit = np.isfinite(depth)
+    u, v = u[rows, closest], v[rows, closest]
+    return RayHits(
+        depth=depth.astype(np.float32),
+        face=np.where(hit, faces[closest], -1).astype(np.int64),
+        barycentrics=np.where(hit[:, None], np.stack((1.0 - u - v, u, v), axis=1), 0.0).astype(np.float32),
+    )
+
+
+def intersect_brute_force(
+    triangles: TriangleSet,
+    origins: np.ndarray,
+    directions: np.ndarray,
+    max_pairs: int = 1 << 17,
+) -> RayHits:
+    """
+    Every ray against every triangle, origins (R, 3) or (3,) if shared, in (ray chunk x triangle chunk) blocks of at most max_pairs pairs,
+    so memory stays bounded for any image size or mesh size.
+    """
+    n_rays = directions.shape[0]
+    n_triangles = triangles.n_triangles
+    hits = RayHits.empty(n_rays)
+    if n_rays == 0 or n_triangles == 0:
+        return hits
+    triangle_chunk = min(n_triangles, max_pairs)
+    ray_chunk = max(1, max_pairs // triangle_chunk)
+    for ray_start in range(0, n_rays, ray_chunk):
+        rays = slice(ray_start, ray_start + ray_chunk)
+        features = ray_features(origins if origins.ndim == 1 else origins[rays], directions[rays])
+        chunk_hits = RayHits.empty(features.shape[0])
+        for triangle_start in range(0, n_triangles, triangle_chunk):
+            faces = np.arange(triangle_start, min(triangle_start + triangle_chunk, n_triangles))
+            chunk_hits.merge(moller_trumbore(features, triangles, faces))
+        hits.depth[rays], hits.face[rays], hits.barycentrics[rays] = chunk_hits.depth, chunk_hits.face, chunk_hits.barycentrics
+    return hits
+
+
+def moller_trumbore_pairs(
+    origins: np.ndarray,
+    directions: np.ndarray,
+    triangles: TriangleSet,
+    faces: np.ndarray,
+    t_min: float = 1e-6,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Ray i against triangle faces[i] for P pairs: (t, u, v), t is inf where there's no hit """
+    edge1, edge2 = triangles.edge1[faces], triangles.edge2[faces]  # P, 3
+    p = np.cross(directions, edge2)
+    det = np.einsum("pk,pk->p", edge1, p)  # P
+    parallel = np.abs(det) < _DET_EPSILON
+    inverse_det = 1.0 / np.where(parallel, 1.0, det)
+    tvec = origins - triangles.v0[faces]
+    u = np.einsum("pk,pk->p", tvec, p) * inverse_det
+    q = np.cross(tvec, edge1)
+    v = np.einsum("pk,pk->p", directions, q) * inverse_det
+    t = np.einsum("pk,pk->p", edge2, q) * inverse_det
+    valid = ~parallel & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > t_min)
+    return np.where(valid, t, np.inf), u, v
+
+
+def build_triangle_bvh(mesh: TriangleMesh, method: str = "sah", leaf_size: int = 4) -> BVH:
+    triangles = mesh.triangles  # F, 3, 3
+    build = {"sah": BVH.build_binned_sah, "lbvh": BVH.build_lbvh}[method]
+    return build(triangles.min(axis=1), triangles.max(axis=1), leaf_size=leaf_size)
+
+
+def intersect_bvh(
+    triangles: TriangleSet,
+    bvh: BVH,
+    origins: np.ndarray,
+    directions: np.ndarray,
+    max_rays: int = 1 << 16,
+) -> RayHits:
+    """ Closest hits through the BVH, in chunks of max_rays rays traversed together (see traverse_bvh) """
+    n_rays = directions.shape[0]
+    hits = RayHits.empty(n_rays)
+    if n_rays == 0 or triangles.n_triangles == 0:
+        return hits
+    origins = np.broadcast_to(origins, directions.shape)
+    with np.errstate(divide="ignore"):
+        inverse_directions = 1.0 / directions  # R, 3, inf on axis-parallel rays
+    for ray_start in range(0, n_rays, max_rays):
+        chunk = slice(ray_start, ray_start + max_rays)
+        chunk_hits = RayHits.empty(directions[chunk].shape[0])
+        traverse_bvh(triangles, bvh, origins[chunk], directions[chunk], inverse_directions[chunk], chunk_hits)
+        hits.depth[chunk], hits.face[chunk], hits.barycentrics[chunk] = chunk_hits.depth, chunk_hits.face, chunk_hits.barycentrics
+    return hits
+
+
+def slab_entry(
+    bvh: BVH,
+    nodes: np.ndarray,
+    origins: np.ndarray,
+    inverse_directions: np.ndarray,
+) -> np.ndarray:
+    """ Distance at which each ray enters its node's box, inf if it misses """
+    # 0 * inf is nan for a ray in a slab plane: fmin/fmax below drop it
+    with np.errstate(invalid="ignore"):
+        t_lower = (bvh.lower[nodes] - origins) * inverse_directions  # A, 3
+        t_upper = (bvh.upper[nodes] - origins) * inverse_directions  # A, 3
+    # column-wise: reductions over a length-3 axis are far slower than elementwise ops
+    entry, exit = np.fmin(t_lower, t_upper), np.fmax(t_lower, t_upper)
+    t_near = np.maximum(np.maximum(np.maximum(entry[:, 0], entry[:, 1]), entry[:, 2]), 0.0)
+    t_far = np.minimum(np.minimum(exit[:, 0], exit[:, 1]), exit[:, 2])
+    return np.where(t_far >= t_near, t_near, np.inf)
+
+
+def traverse_bvh(
+    triangles: TriangleSet,
+    bvh: BVH,
+    origins: np.ndarray,
+    directions: np.ndarray,
+    inverse_directions: np.ndarray,
+    hits: RayHits,
+) -> None:
+    """
+    Every ray has its own stack of (node, entry distance); each iteration all unfinished rays pop one node
+    together. Nodes entered behind the closest hit so far are dropped, leaves test their (at most
+    leaf-size, padded) triangles, and internal nodes push the children the ray enters, nearest on top.
+    Front-to-back order with early culling is what keeps visited nodes close to the depth of the tree.
+    """
+    n_rays = directions.shape[0]
+    stack_size = bvh.n_levels + 1
+    stack_nodes = np.zeros((n_rays, stack_size), dtype=np.int64)
+    stack_entry = np.zeros((n_rays, stack_size), dtype=np.float32)
+    stack_entry[:, 0] = slab_entry(bvh, np.zeros(n_rays, dtype=np.int64), origins, inverse_directions)
+    top = np.where(np.isfinite(stack_entry[:, 0]), 1, 0)  # R
+    max_leaf_count = int(bvh.count[bvh.left < 0].max())
+    slot = np.arange(max_leaf_count)
+
+    rays = np.nonzero(top)[0]
+    while rays.shape[0] > 0:
+        top[rays] -= 1
+        nodes = stack_nodes[rays, top[rays]]
+        visible = stack_entry[rays, top[rays]] < hits.depth[rays]
+        rays, nodes = rays[visible], nodes[visible]
+
+        leaf = bvh.left[nodes] < 0
+        if leaf.any():
+            leaf_rays, leaf_nodes = rays[leaf], nodes[leaf]
+            counts = bvh.count[leaf_nodes]
+            # (L, max_leaf_count) pairs, padding repeats the last triangle of the leaf
+            slots = bvh.start[leaf_nodes, None] + np.minimum(slot[None, :], counts[:, None] - 1)
+            faces = bvh.primitive_order[slots].reshape(-1)
+            pair_rays = np.repeat(leaf_rays, max_leaf_count)
+            t, u, v = (
+                x.reshape(-1, max_leaf_count)
+                for x in moller_trumbore_pairs(origins[pair_rays], directions[pair_rays], triangles, faces)
+            )
+            closest = np.argmin(t, axis=1)  # L
+            rows = np.arange(leaf_rays.shape[0])
+            t, u, v = t[rows, closest], u[rows, closest], v[rows, closest]
+            closer = t < hits.depth[leaf_rays]
+            closer_rays = leaf_rays[closer]
+            hits.depth[closer_rays] = t[closer]
+            hits.face[closer_rays] = faces.reshape(-1, max_leaf_count)[rows[closer], closest[closer]]
+            hits.barycentrics[closer_rays] = np.stack((1.0 - u[closer] - v[closer], u[closer], v[closer]), axis=1)
+
+        internal_rays, internal_nodes = rays[~leaf], nodes[~leaf]
+        left, right = bvh.left[internal_nodes], bvh.right[internal_nodes]
+        left_entry = slab_entry(bvh, left, origins[internal_rays], inverse_directions[internal_rays])
+        right_entry = slab_entry(bvh, right, origins[internal_rays], inverse_directions[internal_rays])
+        left_first = left_entry <= right_entry
+        near, near_entry = np.where(left_first, left, right), np.minimum(left_entry, right_entry)
+        far, far_entry = np.where(left_first, right, left), np.maximum(left_entry, right_entry)
+        for child, entry in ((far, far_entry), (near, near_entry)):
+            enters = np.isfinite(entry)
+            pushed = internal_rays[enters]
+            stack_nodes[pushed, top[pushed]] = child[enters]
+            stack_entry[pushed, top[pushed]] = entry[enters]
+            top[pushed] += 1
+
+        rays = np.nonzero(top)[0]
@@ -0,0 +1,197 @@
+""" Progressive, adaptively sampled ray tracing: samples go only where pixels are still noisy.
+python -m cloth.ray_tracing.progressive --obj_path icosphere.obj --time_budget 10 --output icosphere_aa.png
+"""
+import os
+import argparse
+import json
+import logging
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Optional, Sequence
+from cloth.geometry.triangle_mesh import TriangleMesh, load_obj
+from cloth.ray_tracing.render import build_scene, save_image, shade, trace
+from cloth.ray_tracing.rays import screen_rays
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--obj_path", type=str, help="Wavefront OBJ scene", default="icosphere.obj")
+    parser.add_argument("--scale", type=float, help="Scale applied to the scene", default=0.75)
+    parser.add_argument("--cloth_steps", type=int, help="Also render a cloth simulated this many steps (0: no cloth)", default=0)
+    parser.add_argument("--cloth_kwargs_json", type=str, help="Kwargs for the cloth, see cloth.simulate", default=r"{}")
+    parser.add_argument("--width", type=int, help="Image width in pixels", default=512)
+    parser.add_argument("--height", type=int, help="Image height in pixels", default=512)
+    parser.add_argument("--eye", type=float, nargs=3, help="Camera position, looking down -z", default=[0.0, 0.0, 3.0])
+    parser.add_argument("--field_of_view", type=float, help="Vertical field of view in degrees", default=30.0)
+    parser.add_argument("-l", "--light_coords", type=float, nargs=3, help="Point light position", default=[0.0, 0.0, 3.0])
+    parser.add_argument("--accelerator", type=str, choices=["auto", "sah", "lbvh", "none"], help="See cloth.ray_tracing.render", default="auto")
+    parser.add_argument("--samples_per_pass", type=int, help="Samples per active pixel and pass", default=4)
+    parser.add_argument("--min_samples", type=int, help="Samples before a pixel may converge", default=8)
+    parser.add_argument("--max_samples", type=int, help="Samples after which a pixel stops regardless", default=256)
+    parser.add_argument("--tolerance", type=float, help="Pixels converge once the standard error of their mean is below this", default=1.0 / 255)
+    parser.add_argument("--time_budget", type=float, help="Stop after this many seconds", default=None)
+    parser.add_argument("--preview_dir", type=str, help="Write a preview png after every pass here", default=None)
+    parser.add_argument("--output", type=str, help="Save the final image (needs Pillow)", default=None)
+    parser.add_argument("--seed", type=int, help="Sample jitter seed", default=0)
+    parser.add_argument("--log_level", type=str, help="Python logging level", default="WARNING")
+    return parser
+
+
+class ProgressiveRenderer:
+    """
+    renderer = ProgressiveRenderer(mesh, 512, 512)
+    image = renderer.render(time_budget=10.0, on_preview=lambda image, stats: ...)
+
+    Every pass shoots samples_per_pass jittered rays through each pixel that hasn't converged, shades them
+    and merges them into per-pixel running mean and sum of squared deviations (Chan et al. parallel Welford).
+    A pixel converges when it has min_samples and the standard error of its mean is below tolerance, or
+    once it has max_samples. Flat regions stop after min_samples; edges and silhouettes keep sampling.
+    Stops when every pixel converged, or on the time / pass budget; the image is usable after any pass.
+    """
+
+    def __init__(
+        self,
+        mesh: TriangleMesh,
+        width: int,
+        height: int,
+        eye: Sequence[float] = (0.0, 0.0, 3.0),
+        field_of_view: float = 30.0,
+        light_position: Sequence[float] = (0.0, 0.0, 3.0),
+        accelerator: str = "auto",
+        samples_per_pass: int = 4,
+        min_samples: int = 8,
+        max_samples: int = 256,
+        tolerance: float = 1.0 / 255,
+        seed: int = 0,
+    ):
+        self.mesh = mesh
+        self.width = width
+        self.height = height
+        self.eye = eye
+        self.pixel_size = 2.0 * np.tan(np.radians(field_of_view) / 2) / height
+        self.light_position = light_position
+        self.samples_per_pass = samples_per_pass
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.tolerance = tolerance
+        self.rng = np.random.default_rng(seed)
+        self.triangles, self.bvh = build_scene(mesh, accelerator)
+        self.vertex_normals = mesh.vertex_normals()
+
+        n_pixels = width * height
+        self.mean = np.zeros(n_pixels, dtype=np.float64)  # P
+        self.squared_deviations = np.zeros(n_pixels, dtype=np.float64)  # P, sum of (sample - mean)^2
+        self.n_samples = np.zeros(n_pixels, dtype=np.int64)  # P
+        self.active = np.ones(n_pixels, dtype=bool)  # P
+        self.n_passes = 0
+
+    @property
+    def image(self) -> np.ndarray:
+        return self.mean.reshape(self.height, self.width).astype(np.float32)
+
+    def standard_error(self) -> np.ndarray:
+        n = np.maximum(self.n_samples, 2)
+        return np.sqrt(self.squared_deviations / (n - 1) / n)  # P
+
+    def run_pass(self) -> None:
+        pixels = np.nonzero(self.active)[0]  # A
+        n_active, n_per_pixel = pixels.shape[0], self.samples_per_pass
+        rows, columns = np.divmod(np.repeat(pixels, n_per_pixel), self.width)
+        jitter = self.rng.random((2, n_active * n_per_pixel), dtype=np.float32)
+        origins, directions = screen_rays(
+            self.width, self.height, rows + jitter[0], columns + jitter[1], self.eye, pixel_size=self.pixel_size,
+        )
+        hits = trace(self.triangles, self.bvh, origins, directions)
+        samples = shade(self.mesh, hits, origins, directions, self.light_position, self.vertex_normals)
+        samples = samples.reshape(n_active, n_per_pixel).astype(np.float64)
+
+        # merge the batch statistics into the running ones
+        batch_mean = samples.mean(axis=1)
+        batch_squared_deviations = np.sum((samples - batch_mean[:, None]) ** 2, axis=1)
+        n_before = self.n_samples[pixels]
+        n_after = n_before + n_per_pixel
+        delta = batch_mean - self.mean[pixels]
+        self.mean[pixels] += delta * n_per_pixel / n_after
+        self.squared_deviations[pixels] += batch_squared_deviations + delta ** 2 * n_before * n_per_pixel / n_after
+        self.n_samples[pixels] = n_after
+
+        converged = (n_after >= self.min_samples) & (self.standard_error()[pixels] < self.tolerance)
+        self.active[pixels] = ~(converged | (n_after >= self.max_samples))
+        self.n_passes += 1
+
+    def statistics(self) -> Dict[str, Any]:
+        return {
+            "n_passes": self.n_passes,
+            "n_active_pixels": int(self.active.sum()),
+            "n_samples": int(self.n_samples.sum()),
+            "mean_samples_per_pixel": float(self.n_samples.mean()),
+            "max_samples_per_pixel": int(self.n_samples.max()),
+            "max_standard_error": float(self.standard_error().max()) if self.n_passes else None,
+        }
+
+    def render(
+        self,
+        time_budget: Optional[float] = None,
+        max_passes: Optional[int] = None,
+        on_preview: Optional[Callable[[np.ndarray, Dict[str, Any]], None]] = None,
+    ) -> np.ndarray:
+        t0 = time.perf_counter()
+        while self.active.any():
+            if max_passes is not None and self.n_passes >= max_passes:
+                break
+            if time_budget is not None and time.perf_counter() - t0 >= time_budget:
+                break
+            self.run_pass()
+            logger.info(f"Progressive pass: {self.statistics()}")
+            if on_preview is not None:
+                on_preview(self.image, self.statistics())
+        return self.image
+
+
+def cloth_mesh(n_steps: int, delta_t_seconds: float = 0.01, **kwargs) -> TriangleMesh:
+    """ Triangles of a cloth (same scene as cloth.simulate) after n_steps of simulation """
+    from cloth.simulate import make_model
+    model = make_model(**kwargs)
+    tic = model.t
+    for _ in range(n_steps):
+        tic = tic + delta_t_seconds
+        model.update(tic)
+    return TriangleMesh(model.vertices.astype(np.float32), model.elements.astype(np.int64))
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+    logging.basicConfig(level=args.log_level)
+    mesh = load_obj(args.obj_path, scale=args.scale)
+    if args.cloth_steps > 0:
+        mesh = TriangleMesh.concatenate([mesh, cloth_mesh(args.cloth_steps, **json.loads(args.cloth_kwargs_json))])
+
+    renderer = ProgressiveRenderer(
+        mesh,
+        args.width,
+        args.height,
+        eye=args.eye,
+        field_of_view=args.field_of_view,
+        light_position=args.light_coords,
+        accelerator=args.accelerator,
+        samples_per_pass=args.samples_per_pass,
+        min_samples=args.min_samples,
+        max_samples=args.max_samples,
+        tolerance=args.tolerance,
+        seed=args.seed,
+    )
+
+    def write_preview(image: np.ndarray, statistics: Dict[str, Any]) -> None:
+        save_image(image, args.width, args.height, os.path.join(args.preview_dir, f"pass_{statistics['n_passes']}.png"))
+
+    if args.preview_dir is not None:
+        os.makedirs(args.preview_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    image = renderer.render(args.time_budget, on_preview=write_preview if args.preview_dir is not None else None)
+    render_seconds = time.perf_counter() - t0
+    if args.output is not None:
+        save_image(image, args.width, args.height, args.output)
+    print(json.dumps({"render_seconds": render_seconds, **renderer.statistics()}, indent=2))
@@ -0,0 +1,44 @@
+""" Primary ray generation. """
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+
+def pinhole_rays(
+    width: int,
+    height: int,
+    eye: Sequence[float] = (0.0, 0.0, 3.0),
+    screen_distance: float = 1.0,
+    pixel_size: float = 0.75 / 64,
+    tile: Optional[Tuple[int, int, int, int]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Camera at `eye` looking down -z through a screen `screen_distance` in front of it, made of
+    pixel_size squares (the notebook's setup). Returns the shared origin (3,) and unit directions
+    (height * width, 3) in row-major image order, top row first.
+    tile=(row_start, row_end, column_start, column_end) only makes the rays of those pixels.
+    """
+    row_start, row_end, column_start, column_end = (0, height, 0, width) if tile is None else tile
+    rows, columns = np.meshgrid(
+        np.arange(row_start, row_end, dtype=np.float32) + 0.5,
+        np.arange(column_start, column_end, dtype=np.float32) + 0.5,
+        indexing="ij",
+    )
+    return screen_rays(width, height, rows.reshape(-1), columns.reshape(-1), eye, screen_distance, pixel_size)
+
+
+def screen_rays(
+    width: int,
+    height: int,
+    rows: np.ndarray,
+    columns: np.ndarray,
+    eye: Sequence[float] = (0.0, 0.0, 3.0),
+    screen_distance: float = 1.0,
+    pixel_size: float = 0.75 / 64,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """ Rays through continuous image positions (N each): pixel (i, j) covers [i, i + 1) x [j, j + 1) """
+    directions = np.empty((rows.shape[0], 3), dtype=np.float32)
+    directions[:, 0] = pixel_size * (columns - 0.5 * width)
+    directions[:, 1] = pixel_size * (0.5 * height - rows)
+    directions[:, 2] = -screen_distance
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    return np.asarray(eye, dtype=np.float32), directions
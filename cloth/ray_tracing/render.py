@@ -0,0 +1,133 @@
+""" CPU ray tracer for OBJ scenes, the vectorized successor of ray_tracing.ipynb.
+python -m cloth.ray_tracing.render --obj_path icosphere.obj --width 512 --height 512 --output icosphere.png
+"""
+import argparse
+import json
+import logging
+import time
+import numpy as np
+from typing import Optional, Sequence, Tuple
+from cloth.geometry.bvh import BVH
+from cloth.geometry.triangle_mesh import TriangleMesh, load_obj
+from cloth.ray_tracing.intersect import RayHits, TriangleSet, build_triangle_bvh, intersect_brute_force, intersect_bvh
+from cloth.ray_tracing.rays import pinhole_rays
+
+
+logger = logging.getLogger(__name__)
+BRUTE_FORCE_MAX_TRIANGLES: int = 256
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--obj_path", type=str, help="Wavefront OBJ scene", default="icosphere.obj")
+    parser.add_argument("--scale", type=float, help="Scale applied to the scene", default=0.75)
+    parser.add_argument("--width", type=int, help="Image width in pixels", default=512)
+    parser.add_argument("--height", type=int, help="Image height in pixels", default=512)
+    parser.add_argument("--eye", type=float, nargs=3, help="Camera position, looking down -z", default=[0.0, 0.0, 3.0])
+    parser.add_argument("--field_of_view", type=float, help="Vertical field of view in degrees", default=30.0)
+    parser.add_argument("-l", "--light_coords", type=float, nargs=3, help="Point light position", default=[0.0, 0.0, 3.0])
+    parser.add_argument("--accelerator", type=str, choices=["auto", "sah", "lbvh", "none"], help="BVH build, none to test all triangles, auto picks by mesh size", default="auto")
+    parser.add_argument("--n_workers", type=int, help="Render tiles on this many processes (1: in process)", default=1)
+    parser.add_argument("--tile_size", type=int, help="Tile side in pixels for --n_workers > 1", default=32)
+    parser.add_argument("--output", type=str, help="Save the shaded image (needs Pillow)", default=None)
+    parser.add_argument("--log_level", type=str, help="Python logging level", default="WARNING")
+    return parser
+
+
+def shade(
+    mesh: TriangleMesh,
+    hits: RayHits,
+    origins: np.ndarray,
+    directions: np.ndarray,
+    light_position: Sequence[float],
+    vertex_normals: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Lambertian intensity in [0, 1] per ray with barycentric-interpolated vertex normals; 0 for misses.
+    Surfaces are two-sided (cloth is seen from both sides): normals of back faces are flipped.
+    Pass mesh.vertex_normals() as vertex_normals when shading the same mesh repeatedly.
+    """
+    if vertex_normals is None:
+        vertex_normals = mesh.vertex_normals()
+    hit = hits.hit
+    faces = mesh.faces[hits.face[hit]]  # H, 3
+    normals = np.einsum("hk,hkc->hc", hits.barycentrics[hit], vertex_normals[faces])  # H, 3
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    triangles = mesh.vertices[faces]  # H, 3, 3
+    face_normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])  # H, 3
+    normals *= np.where(np.einsum("hc,hc->h", face_normals, directions[hit]) > 0, -1.0, 1.0)[:, None]
+    points = hits.points(origins, directions)[hit]  # H, 3
+    to_light = np.asarray(light_position, dtype=np.float32) - points
+    to_light /= np.linalg.norm(to_light, axis=1, keepdims=True)
+    intensity = np.zeros(directions.shape[0], dtype=np.float32)
+    intensity[hit] = np.clip(np.einsum("hc,hc->h", normals, to_light), 0.0, 1.0)
+    return intensity
+
+
+def camera_rays(
+    width: int,
+    height: int,
+    eye: Sequence[float] = (0.0, 0.0, 3.0),
+    field_of_view: float = 30.0,
+    tile: Optional[Tuple[int, int, int, int]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    pixel_size = 2.0 * np.tan(np.radians(field_of_view) / 2) / height
+    return pinhole_rays(width, height, eye, screen_distance=1.0, pixel_size=pixel_size, tile=tile)
+
+
+def build_scene(mesh: TriangleMesh, accelerator: str = "auto") -> Tuple[TriangleSet, Optional[BVH]]:
+    """ Intersection-ready triangles and, unless tracing all pairs, their BVH """
+    if accelerator == "auto":
+        # all pairs is one matmul per block: it beats BVH traversal on tiny meshes
+        accelerator = "none" if mesh.faces.shape[0] <= BRUTE_FORCE_MAX_TRIANGLES else "sah"
+    triangles = TriangleSet.from_mesh(mesh)
+    return triangles, None if accelerator == "none" else build_triangle_bvh(mesh, accelerator)
+
+
+def trace(triangles: TriangleSet, bvh: Optional[BVH], origins: np.ndarray, directions: np.ndarray) -> RayHits:
+    if bvh is None:
+        return intersect_brute_force(triangles, origins, directions)
+    return intersect_bvh(triangles, bvh, origins, directions)
+
+
+def render(mesh: TriangleMesh, origins: np.ndarray, directions: np.ndarray, accelerator: str = "auto") -> RayHits:
+    """ Closest hits of one ray per pixel, (height * width) in row-major order """
+    return trace(*build_scene(mesh, accelerator), origins, directions)
+
+
+def save_image(intensity: np.ndarray, width: int, height: int, output: str) -> None:
+    from PIL import Image
+    pixels = (255 * intensity.reshape(height, width)).astype(np.uint8)
+    Image.fromarray(pixels, mode="L").save(output)
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+    logging.basicConfig(level=args.log_level)
+    mesh = load_obj(args.obj_path, scale=args.scale)
+
+    origins, directions = camera_rays(args.width, args.height, args.eye, args.field_of_view)
+    if args.n_workers > 1:
+        from cloth.ray_tracing.tiled import TiledRenderer
+        with TiledRenderer(mesh, args.accelerator, n_workers=args.n_workers, tile_size=args.tile_size) as renderer:
+            # the first render pays for worker start-up
+            renderer.render(args.tile_size, args.tile_size, args.eye, args.field_of_view)
+            t0 = time.perf_counter()
+            hits = renderer.render(args.width, args.height, args.eye, args.field_of_view)
+            render_seconds = time.perf_counter() - t0
+    else:
+        t0 = time.perf_counter()
+        hits = render(mesh, origins, directions, args.accelerator)
+        render_seconds = time.perf_counter() - t0
+
+    if args.output is not None:
+        save_image(shade(mesh, hits, origins, directions, args.light_coords), args.width, args.height, args.output)
+
+    n_rays = args.width * args.height
+    print(json.dumps({
+        "n_triangles": int(mesh.faces.shape[0]),
+        "n_rays": n_rays,
+        "n_hits": int(hits.hit.sum()),
+        "render_seconds": render_seconds,
+        "rays_per_second": n_rays / render_seconds if render_seconds > 0 else float("inf"),
+    }, indent=2))
@@ -0,0 +1,159 @@
+""" Tile-parallel ray tracing on a process pool, with scene and image shared through memory-mapped files. """
+import os
+import shutil
+import logging
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from cloth.geometry.bvh import BVH
+from cloth.geometry.triangle_mesh import TriangleMesh
+from cloth.ray_tracing.intersect import RayHits, TriangleSet
+from cloth.ray_tracing.render import build_scene, camera_rays, trace
+
+
+logger = logging.getLogger(__name__)
+Tile = Tuple[int, int, int, int]  # row_start, row_end, column_start, column_end
+
+# per worker process: set once by the pool initializer, never pickled per task
+_worker_scene: Optional[Tuple[TriangleSet, Optional[BVH]]] = None
+_worker_outputs: Dict[str, Dict[str, np.ndarray]] = {}
+
+
+def image_tiles(width: int, height: int, tile_size: int) -> List[Tile]:
+    return [
+        (row, min(row + tile_size, height), column, min(column + tile_size, width))
+        for row in range(0, height, tile_size)
+        for column in range(0, width, tile_size)
+    ]
+
+
+def load_arrays(directory: str, mmap_mode: str) -> Dict[str, np.ndarray]:
+    return {
+        filename[:-len(".npy")]: np.load(os.path.join(directory, filename), mmap_mode=mmap_mode)
+        for filename in os.listdir(directory)
+        if filename.endswith(".npy")
+    }
+
+
+def init_worker(scene_dir: str) -> None:
+    global _worker_scene
+    arrays = load_arrays(scene_dir, "r")
+    bvh = BVH.from_arrays(arrays, "bvh") if "bvh_n_levels" in arrays else None
+    _worker_scene = (TriangleSet.from_arrays(arrays, "triangles"), bvh)
+
+
+def render_tile(output_dir: str, width: int, height: int, eye: Sequence[float], field_of_view: float, tile: Tile) -> Tile:
+    """ Traces one tile and writes it straight into the shared (H, W) output arrays """
+    if output_dir not in _worker_outputs:
+        _worker_outputs.clear()
+        _worker_outputs[output_dir] = load_arrays(output_dir, "r+")
+    outputs = _worker_outputs[output_dir]
+    origins, directions = camera_rays(width, height, eye, field_of_view, tile=tile)
+    hits = trace(*_worker_scene, origins, directions)
+    row_start, row_end, column_start, column_end = tile
+    shape = (row_end - row_start, column_end - column_start)
+    outputs["depth"][row_start:row_end, column_start:column_end] = hits.depth.reshape(shape)
+    outputs["face"][row_start:row_end, column_start:column_end] = hits.face.reshape(shape)
+    outputs["barycentrics"][row_start:row_end, column_start:column_end] = hits.barycentrics.reshape(*shape, 3)
+    return tile
+
+
+class TiledRenderer:
+    """
+    with TiledRenderer(mesh, n_workers=32) as renderer:
+        hits = renderer.render(512, 512, on_tile=lambda tile, hits: ...)
+
+    The scene (triangles and BVH) is built once in the parent and saved as .npy files under scratch_dir
+    (a tmpfs such as /dev/shm when available), which every worker np.load-s with mmap_mode="r" once, in
+    the pool initializer: the OS shares the pages, nothing is pickled per task. The output image lives in
+    memory-mapped files too, so a task only carries its tile bounds in and out; finished tiles are already
+    in the image when on_tile(tile, hits) is called for them, in completion order, with hits holding
+    (rows, columns) views of the tile for progressive display.
+
+    Workers trace tiles with the same single-process code as cloth.ray_tracing.render, so throughput grows
+    with n_workers as long as there are several tiles per worker (tile_size) to balance uneven tiles.
+    """
+
+    def __init__(
+        self,
+        mesh: TriangleMesh,
+        accelerator: str = "auto",
+        n_workers: Optional[int] = None,
+        tile_size: int = 32,
+        scratch_dir: Optional[str] = None,
+    ):
+        if scratch_dir is None and os.path.isdir("/dev/shm"):
+            scratch_dir = "/dev/shm"
+        self.scratch_dir = tempfile.mkdtemp(prefix="cloth_ray_tracing_", dir=scratch_dir)
+        self.tile_size = tile_size
+        self.n_workers = n_workers or os.cpu_count()
+        self.n_renders = 0
+
+        triangles, bvh = build_scene(mesh, accelerator)
+        arrays = triangles.to_arrays("triangles")
+        if bvh is not None:
+            arrays.update(bvh.to_arrays("bvh"))
+        scene_dir = os.path.join(self.scratch_dir, "scene")
+        os.makedirs(scene_dir)
+        for name, array in arrays.items():
+            np.save(os.path.join(scene_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        self.executor = ProcessPoolExecutor(max_workers=self.n_workers, initializer=init_worker, initargs=(scene_dir,))
+        logger.info(f"Tiled renderer with {self.n_workers=} {tile_size=} {self.scratch_dir=}")
+
+    def make_outputs(self, width: int, height: int) -> Tuple[str, Dict[str, np.ndarray]]:
+        # a fresh directory per render: workers key their open memmaps by it
+        output_dir = os.path.join(self.scratch_dir, f"output_{self.n_renders}")
+        self.n_renders += 1
+        os.makedirs(output_dir)
+        outputs = {}
+        for name, dtype, shape, fill in (
+            ("depth", np.float32, (height, width), np.inf),
+            ("face", np.int64, (height, width), -1),
+            ("barycentrics", np.float32, (height, width, 3), 0.0),
+        ):
+            outputs[name] = np.lib.format.open_memmap(os.path.join(output_dir, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape)
+            outputs[name][...] = fill
+            outputs[name].flush()
+        return output_dir, outputs
+
+    def render(
+        self,
+        width: int,
+        height: int,
+        eye: Sequence[float] = (0.0, 0.0, 3.0),
+        field_of_view: float = 30.0,
+        on_tile: Optional[Callable[[Tile, RayHits], None]] = None,
+    ) -> RayHits:
+        """ Same result as render.render on camera_rays(width, height, eye, field_of_view) """
+        output_dir, outputs = self.make_outputs(width, height)
+        futures = [
+            self.executor.submit(render_tile, output_dir, width, height, tuple(eye), field_of_view, tile)
+            for tile in image_tiles(width, height, self.tile_size)
+        ]
+        for future in as_completed(futures):
+            tile = future.result()
+            if on_tile is not None:
+                row_start, row_end, column_start, column_end = tile
+                on_tile(tile, RayHits(
+                    depth=outputs["depth"][row_start:row_end, column_start:column_end],
+                    face=outputs["face"][row_start:row_end, column_start:column_end],
+                    barycentrics=outputs["barycentrics"][row_start:row_end, column_start:column_end],
+                ))
+        hits = RayHits(
+            depth=np.array(outputs["depth"]).reshape(-1),
+            face=np.array(outputs["face"]).reshape(-1),
+            barycentrics=np.array(outputs["barycentrics"]).reshape(-1, 3),
+        )
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return hits
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def __enter__(self) -> "TiledRenderer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,152 @@
+""" Headless simulation driver: steps a cloth as fast as possible, no OpenGL/glfw/PIL needed.
+python -m cloth.simulate --n_steps 1000 --kwargs_json '{"n_points_per_side": 100}'
+"""
+import argparse
+import json
+import logging
+import time
+import numpy as np
+from typing import Dict, Any, Optional
+from cloth.drawables.spring_mass_grid_square import SpringMassGridSquare
+from cloth.force_field.wind_cylinder_field import WindCylinderField
+from cloth.checkpoint import Checkpointer, load_checkpoint
+from cloth.profiler import get_profiler
+from cloth.backends.registry import with_threads
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n_steps", type=int, help="Number of simulation steps", default=1000)
+    parser.add_argument("--delta_t_seconds", type=float, help="Simulation timestep", default=0.01)
+    parser.add_argument("--kwargs_json", type=str, help="Kwargs for SpringMassGridSquare in json format", default=r"{}")
+    parser.add_argument("--n_threads", type=int, help="Evaluate forces on this many threads (the threaded backend)", default=1)
+    parser.add_argument("--checkpoint_dir", type=str, help="Save simulation checkpoints here", default=None)
+    parser.add_argument("--checkpoint_every", type=int, help="Steps between checkpoints", default=500)
+    parser.add_argument("--resume", type=str, help="Checkpoint file to continue from; --n_steps more steps are run", default=None)
+    parser.add_argument("--profile", action="store_true", help="Time every step's stages and report their percentiles")
+    parser.add_argument("--profile_window", type=int, help="Steps kept for --profile percentiles", default=300)
+    parser.add_argument("--profile_trace", type=str, help="Also write the last --profile_window steps as a Chrome trace json here", default=None)
+    parser.add_argument("--log_level", type=str, help="Python logging level", default="WARNING")
+    return parser
+
+
+def make_model(**kwargs) -> SpringMassGridSquare:
+    # Same scene as cloth.main
+    return SpringMassGridSquare(
+        side=0.5,
+        texture_bounds=None,
+        wind_field=WindCylinderField(
+            origin=np.array([0.25, -0.25, 5.0], dtype=np.float32),
+            direction=np.array([0.0, 0.0, -1.0], dtype=np.float32),
+            radius=0.1,
+            coefficient=0.05,
+        ),
+        **kwargs,
+    )
+
+
+def state_statistics(model: SpringMassGridSquare) -> Dict[str, Any]:
+    ends = model.spring_end_points
+    spring_lengths = np.linalg.norm(model.vertices[ends[:, 1]] - model.vertices[ends[:, 0]], axis=1)
+    strain = spring_lengths / model.spring_resting_lengths[:, 0] - 1.0
+    speed = np.linalg.norm(model.velocity, axis=1)
+    return {
+        "t": model.t,
+        "n_vertices": int(model.vertices.shape[0]),
+        "n_springs": int(ends.shape[0]),
+        "finite": bool(np.isfinite(model.vertices).all() and np.isfinite(model.velocity).all()),
+        "centroid": model.vertices.mean(axis=0).tolist(),
+        "bounds_min": model.vertices.min(axis=0).tolist(),
+        "bounds_max": model.vertices.max(axis=0).tolist(),
+        "max_speed": float(speed.max()),
+        "mean_speed": float(speed.mean()),
+        "max_abs_strain": float(np.abs(strain).max()),
+        "mean_abs_strain": float(np.abs(strain).mean()),
+        **self_collision_statistics(model),
+        **obstacle_statistics(model),
+    }
+
+
+def self_collision_statistics(model: SpringMassGridSquare) -> Dict[str, Any]:
+    if model.self_collision is None:
+        return {}
+    collision = model.self_collision
+    return {
+        "self_collision_cell_size": collision.cell_size,
+        "self_collision_mean_candidate_pairs": collision.total_candidate_pairs / max(collision.n_steps, 1),
+        "self_collision_last_candidate_pairs": collision.last_candidate_pairs,
+        "self_collision_last_contacts": collision.last_contacts,
+    }
+
+
+def obstacle_statistics(model: SpringMassGridSquare) -> Dict[str, Any]:
+    if not model.obstacles:
+        return {}
+    return {
+        "obstacle_last_candidate_pairs": [obstacle.last_candidate_pairs for obstacle in model.obstacles],
+        "obstacle_last_contacts": [obstacle.last_contacts for obstacle in model.obstacles],
+    }
+
+
+def run(
+    n_steps: int,
+    delta_t_seconds: float,
+    model_kwargs: Dict[str, Any],
+    checkpoint_dir: Optional[str] = None,
+    checkpoint_every: int = 500,
+    resume: Optional[str] = None,
+    profile: bool = False,
+    profile_window: int = 300,
+    profile_trace: Optional[str] = None,
+) -> Dict[str, Any]:
+    profiler = get_profiler()
+    profiler.configure(profile or profile_trace is not None, profile_window, 0 if profile_trace is None else profile_window)
+    t0 = time.perf_counter()
+    model = make_model(**model_kwargs)
+    step_index = 0 if resume is None else load_checkpoint(resume, model)
+    checkpointer = None if checkpoint_dir is None else Checkpointer(checkpoint_dir, checkpoint_every)
+    init_seconds = time.perf_counter() - t0
+
+    tic = model.t
+    t0 = time.perf_counter()
+    for _ in range(n_steps):
+        with profiler.frame():
+            tic = tic + delta_t_seconds
+            with profiler.scope("update"):
+                model.update(tic)
+            step_index += 1
+            if checkpointer is not None:
+                checkpointer.maybe_save(model, step_index)
+    step_seconds = time.perf_counter() - t0
+    if profile_trace is not None:
+        profiler.export_chrome_trace(profile_trace)
+
+    return {
+        "n_steps": n_steps,
+        "delta_t_seconds": delta_t_seconds,
+        "init_seconds": init_seconds,
+        "step_seconds": step_seconds,
+        "steps_per_second": n_steps / step_seconds if step_seconds > 0 else float("inf"),
+        "final_state": state_statistics(model),
+        **({"profile": profiler.percentiles()} if profiler.enabled else {}),
+    }
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+    logging.basicConfig(level=args.log_level)
+    report = run(
+        args.n_steps,
+        args.delta_t_seconds,
+        with_threads(json.loads(args.kwargs_json), args.n_threads),
+        checkpoint_dir=args.checkpoint_dir,
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        profile=args.profile,
+        profile_window=args.profile_window,
+        profile_trace=args.profile_trace,
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,10 @@
+# Kept free of OpenGL/PIL imports so that simulation-only code can use it
+from dataclasses import dataclass
+
+
+@dataclass
+class TextureBounds:
+    bottom: float = 1.0
+    top: float = 0.0
+    left: float = 0.0
+    right: float = 1.0
@@ -0,0 +1,65 @@
+""" On-disk cache for mesh topology (elements, springs, incidence operators) that only depends on grid parameters. """
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from typing import Any, Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class TopologyCache:
+    """
+    cache = TopologyCache("cloth/cache/")
+    arrays = cache.get_or_compute("springs", (n_points_per_side, offsets), compute_fn)
+
+    Each entry is a directory {cache_dir}/{name}_{hash(key)}/ holding one .npy per array.
+    Entries are written to a temporary directory and renamed into place, so concurrent runs of a sweep
+    never see partial entries. With mmap=True arrays are loaded read-only via np.load(mmap_mode="r").
+    """
+
+    def __init__(self, cache_dir: str, mmap: bool = True):
+        self.cache_dir = cache_dir
+        self.mmap = mmap
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_dir(self, name: str, key: Any) -> str:
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{name}_{digest}")
+
+    def load(self, name: str, key: Any) -> Optional[Dict[str, np.ndarray]]:
+        entry_dir = self.entry_dir(name, key)
+        if not os.path.isdir(entry_dir):
+            return None
+        return {
+            filename[:-len(".npy")]: np.load(os.path.join(entry_dir, filename), mmap_mode="r" if self.mmap else None)
+            for filename in os.listdir(entry_dir)
+            if filename.endswith(".npy")
+        }
+
+    def save(self, name: str, key: Any, arrays: Dict[str, np.ndarray]) -> None:
+        entry_dir = self.entry_dir(name, key)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{name}_", dir=self.cache_dir)
+        for array_name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{array_name}.npy"), np.asarray(array))
+        with open(os.path.join(tmp_dir, "key.json"), "w") as f:
+            json.dump(key, f)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # somebody else finished the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def get_or_compute(self, name: str, key: Any, compute: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        arrays = self.load(name, key)
+        if arrays is not None:
+            logger.info(f"Loaded {name} topology from cache {key=}")
+            return arrays
+        arrays = compute()
+        self.save(name, key, arrays)
+        logger.info(f"Saved {name} topology to cache {key=}")
+        return arrays
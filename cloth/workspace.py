@@ -0,0 +1,33 @@
+""" Preallocated scratch arrays, so that per-step kernels can write their temporaries with out= instead of allocating. """
+import numpy as np
+from typing import Any, Dict, Tuple
+
+
+class Workspace:
+    """
+    workspace = Workspace()  # one per model
+    lengths = workspace.array("spring_lengths", (S, 1))  # allocated on the first call only
+    np.sqrt(squared_lengths, out=lengths)
+
+    Buffers are keyed by (name, shape, dtype): the same name with another shape is another buffer, so
+    kernels on different meshes never thrash each other's. Contents are garbage until written, and are
+    overwritten by the next kernel asking for the same buffer - results meant to outlive a step must be copied.
+    """
+
+    def __init__(self):
+        self.buffers: Dict[Tuple[str, Tuple[int, ...], Any], np.ndarray] = {}
+
+    def array(self, name: str, shape: Tuple[int, ...], dtype=np.float32) -> np.ndarray:
+        key = (name, shape, dtype)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = self.buffers[key] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def rows(self, name: str, n_rows: int, capacity: int, row_shape: Tuple[int, ...] = (), dtype=np.float32) -> np.ndarray:
+        """ The first n_rows of a (capacity, *row_shape) buffer: for row counts that change from call to call """
+        return self.array(name, (capacity,) + row_shape, dtype)[:n_rows]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self.buffers.values())
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from cloth.backends.parity import SCENES, check_scene, get_parser
+from cloth.simulate import make_model
+
+# the tolerances `python -m cloth.backends.parity` checks by default
+FORCE_TOLERANCE = get_parser().get_default("force_tolerance")
+POSITION_TOLERANCE = get_parser().get_default("position_tolerance")
+N_POINTS_PER_SIDE = 12
+N_STEPS = 30
+
+
+@pytest.mark.parametrize("scene", list(SCENES))
+def test_numba_matches_numpy(scene):
+    pytest.importorskip("numba")
+    result = check_scene(scene, N_POINTS_PER_SIDE, "numba", N_STEPS, 0.01)
+    # not the NumPy fallback
+    assert result["backend"] == "numba"
+    assert result["relative_force_error"] <= FORCE_TOLERANCE
+    assert result["position_error"] <= POSITION_TOLERANCE
+
+
+@pytest.mark.parametrize("scene", list(SCENES))
+def test_threaded_matches_numpy_exactly(scene):
+    # small chunks, so that a small grid is still split between several threads
+    result = check_scene(scene, N_POINTS_PER_SIDE, "threaded", N_STEPS, 0.01, backend_kwargs={"n_threads": 3, "min_chunk_size": 16})
+    assert result["backend"] == "threaded"
+    assert result["relative_force_error"] == 0.0
+    assert result["position_error"] == 0.0
+
+
+@pytest.mark.parametrize("backend", ["numba", "threaded"])
+def test_coinciding_spring_end_points(backend):
+    if backend == "numba":
+        pytest.importorskip("numba")
+    forces = []
+    for name in ("numpy", backend):
+        model = make_model(n_points_per_side=5, backend=name)
+        # the spring between vertices 0 and 1 has zero length
+        model.vertices[1] = model.vertices[0]
+        forces.append(model.force().copy())
+    reference, candidate = forces
+    assert np.isfinite(reference).all()
+    assert np.abs(candidate - reference).max() <= FORCE_TOLERANCE * np.abs(reference).max()
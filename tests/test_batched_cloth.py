@@ -0,0 +1,52 @@
+import os
+import numpy as np
+from cloth.batched_cloth import BatchedSpringMassEngine
+from cloth.backends.parity import wind_cylinder
+from cloth.drawables.spring_mass_grid_square import SpringMassGridSquare
+from cloth.simulate import make_model
+
+OBSTACLE = {"obj_path": os.path.join(os.path.dirname(__file__), os.pardir, "icosphere.obj"), "scale": 0.12, "translation": [0.0, -0.2, 0.08]}
+
+
+def step_alone_and_batched(cloth_kwargs, n_steps: int = 150):
+    alone = [SpringMassGridSquare(side=0.5, **kwargs) for kwargs in cloth_kwargs]
+    engine = BatchedSpringMassEngine([SpringMassGridSquare(side=0.5, **kwargs) for kwargs in cloth_kwargs])
+    for i in range(n_steps):
+        t = 0.01 * (i + 1)
+        for cloth in alone:
+            cloth.update(t)
+        engine.update(t)
+    return alone, engine
+
+
+def test_batched_matches_cloths_stepped_alone():
+    wind = wind_cylinder(0.25, -0.25)
+    alone, engine = step_alone_and_batched([
+        # one field shared by two cloths, one of their own, and none
+        {"n_points_per_side": 12, "wind_field": wind},
+        {"n_points_per_side": 7, "wind_field": wind, "uniform_spring_stiffness": 80.0},
+        {"n_points_per_side": 9, "wind_field": wind_cylinder(0.1, -0.1, coefficient=0.2)},
+        {"n_points_per_side": 5},
+    ])
+    for cloth, packed in zip(alone, engine.cloths):
+        assert packed.t == cloth.t
+        np.testing.assert_array_equal(packed.vertices, cloth.vertices)
+        np.testing.assert_array_equal(packed.velocity, cloth.velocity)
+        # the cloths' state stays a view into the packed arrays
+        assert np.shares_memory(packed.vertices, engine.vertices)
+
+
+def test_batched_applies_each_cloths_collisions():
+    alone, engine = step_alone_and_batched([
+        {"n_points_per_side": 12, "wind_field": wind_cylinder(0.25, -0.25), "obstacles": [OBSTACLE]},
+        {"n_points_per_side": 10, "wind_field": wind_cylinder(0.25, -0.25), "self_collision_kwargs": {}},
+        {"n_points_per_side": 8},
+    ], n_steps=300)
+    for cloth, packed in zip(alone, engine.cloths):
+        np.testing.assert_array_equal(packed.vertices, cloth.vertices)
+        np.testing.assert_array_equal(packed.velocity, cloth.velocity)
+    # the obstacle did change the draped cloth
+    free = make_model(n_points_per_side=12)
+    for i in range(300):
+        free.update(0.01 * (i + 1))
+    assert np.abs(free.vertices - alone[0].vertices).max() > 1e-2
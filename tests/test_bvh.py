@@ -0,0 +1,68 @@
+import os
+import warnings
+import numpy as np
+import pytest
+from cloth.geometry.triangle_mesh import TriangleMesh, load_obj, subdivide
+from cloth.ray_tracing.intersect import TriangleSet, build_triangle_bvh, intersect_brute_force, intersect_bvh
+from cloth.ray_tracing.rays import pinhole_rays
+
+ICOSPHERE_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "icosphere.obj")
+
+
+def icospheres() -> TriangleMesh:
+    """ A subdivided sphere in front of a coarse one, so rays have several hits to choose the closest from """
+    sphere = load_obj(ICOSPHERE_PATH)
+    return TriangleMesh.concatenate([
+        subdivide(subdivide(sphere, onto_sphere=True), onto_sphere=True).transformed(0.5, (0.1, 0.0, 0.5)),
+        sphere.transformed(0.8, (-0.2, 0.1, -0.5)),
+    ])
+
+
+def triangle_soup() -> TriangleMesh:
+    """ Small random triangles, overlapping and intersecting each other """
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(-0.6, 0.6, (2000, 1, 3))
+    vertices = (centers + rng.normal(0.0, 0.05, (2000, 3, 3))).reshape(-1, 3).astype(np.float32)
+    return TriangleMesh(vertices, np.arange(vertices.shape[0], dtype=np.int64).reshape(-1, 3))
+
+
+def rays():
+    """ Camera rays sharing an origin, and random rays from inside the scene in every direction """
+    camera_origin, camera_directions = pinhole_rays(48, 48, pixel_size=1.0 / 48)
+    rng = np.random.default_rng(1)
+    directions = rng.standard_normal((2000, 3)).astype(np.float32)
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    # some exactly axis-parallel directions: infinite inverse directions in the slab test
+    directions[:3] = np.eye(3, dtype=np.float32)
+    origins = rng.uniform(-0.3, 0.3, (2000, 3)).astype(np.float32)
+    return [(camera_origin, camera_directions), (origins, directions)]
+
+
+@pytest.mark.parametrize("method", ["sah", "lbvh"])
+@pytest.mark.parametrize("make_mesh", [icospheres, triangle_soup])
+def test_bvh_closest_hits_match_brute_force(method, make_mesh):
+    mesh = make_mesh()
+    triangles = TriangleSet.from_mesh(mesh)
+    bvh = build_triangle_bvh(mesh, method)
+    for origins, directions in rays():
+        expected = intersect_brute_force(triangles, origins, directions)
+        hits = intersect_bvh(triangles, bvh, origins, directions, max_rays=1000)
+        assert expected.hit.any()
+        np.testing.assert_array_equal(hits.hit, expected.hit)
+        # both intersect in float32, through differently arranged Moller-Trumbore arithmetic
+        np.testing.assert_allclose(hits.depth[hits.hit], expected.depth[expected.hit], atol=1e-5)
+        # faces differ only where two triangles are hit at the same depth, e.g. on a shared edge
+        different = hits.face != expected.face
+        np.testing.assert_allclose(hits.depth[different], expected.depth[different], atol=1e-5)
+        np.testing.assert_allclose(hits.points(origins, directions)[hits.hit], expected.points(origins, directions)[expected.hit], atol=1e-5)
+
+
+def test_rays_in_a_slab_plane_do_not_warn():
+    # a flat triangle's box has lower z == upper z == 0, and these rays run in that plane: 0 * inf in the slab test
+    mesh = TriangleMesh(np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32), np.array([[0, 1, 2]], dtype=np.int64))
+    origins = np.array([[-1.0, 0.2, 0.0], [0.2, -1.0, 0.0]], dtype=np.float32)
+    directions = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        hits = intersect_bvh(TriangleSet.from_mesh(mesh), build_triangle_bvh(mesh), origins, directions)
+    assert not hits.hit.any()
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from cloth.checkpoint import STATE_ARRAYS, Checkpointer, StateRecorder, StateReplay, decode_object, encode_object, latest_checkpoint, load_checkpoint
+from cloth.force_field.composite_field import CompositeField
+from cloth.force_field.modulated_field import ModulatedField
+from cloth.backends.parity import wind_cylinder
+from cloth.simulate import make_model
+from cloth.timeseries import AbsoluteSine
+
+DELTA_T_SECONDS = 0.01
+
+
+def run(model, first_frame: int, last_frame: int, checkpointer=None, recorder=None) -> None:
+    t = model.t
+    for frame_index in range(first_frame + 1, last_frame + 1):
+        t += DELTA_T_SECONDS
+        model.update(t)
+        if recorder is not None:
+            recorder.record(model)
+        if checkpointer is not None:
+            checkpointer.maybe_save(model, frame_index)
+
+
+@pytest.mark.parametrize("model_kwargs", [
+    {},
+    {"integrator": "implicit_euler"},
+    {"integrator": "position_based", "self_collision_kwargs": {}},
+])
+def test_resume_is_bit_identical(tmp_path, model_kwargs):
+    reference = make_model(n_points_per_side=12, **model_kwargs)
+    # a time-dependent field, restored from the checkpoint rather than from the constructor kwargs
+    reference.wind_field = CompositeField([reference.wind_field, ModulatedField(wind_cylinder(0.0, 0.0, coefficient=0.2), AbsoluteSine(2.0))])
+    checkpointer = Checkpointer(str(tmp_path), 40)
+    run(reference, 0, 120, checkpointer=checkpointer)
+    assert latest_checkpoint(str(tmp_path)) == checkpointer.path(120)
+
+    resumed = make_model(n_points_per_side=12, **model_kwargs)
+    frame_index = load_checkpoint(checkpointer.path(40), resumed)
+    assert frame_index == 40
+    run(resumed, frame_index, 120)
+    assert resumed.t == reference.t
+    for name in STATE_ARRAYS:
+        np.testing.assert_array_equal(getattr(resumed, name), getattr(reference, name))
+
+
+def test_replay_matches_recording(tmp_path):
+    model = make_model(n_points_per_side=8)
+    run(model, 0, 5)
+    recorded = []
+    with StateRecorder(str(tmp_path), model.vertices.shape[0], first_frame_index=5) as recorder:
+        for frame_index in range(6, 11):
+            run(model, frame_index - 1, frame_index, recorder=recorder)
+            recorded.append((model.t, model.vertices.copy()))
+    # a frame cut short by a crash is ignored: its time was written, only part of its vertices
+    with open(tmp_path / "times.f64", "ab") as f:
+        f.write(np.float64(1.0).tobytes())
+    with open(tmp_path / "vertices.f32", "ab") as f:
+        f.write(np.zeros((3, 3), dtype=np.float32).tobytes())
+
+    replay = StateReplay(str(tmp_path))
+    assert len(replay) == 5 and replay.first_frame_index == 5
+    target = make_model(n_points_per_side=8)
+    for frame, (t, vertices) in enumerate(recorded):
+        replay.apply(target, frame)
+        assert target.t == t
+        np.testing.assert_array_equal(target.vertices, vertices)
+
+
+def test_decode_only_restores_fields_and_schedules():
+    field = CompositeField([wind_cylinder(0.1, 0.0), ModulatedField(wind_cylinder(0.0, 0.0), AbsoluteSine(2.0))])
+    decoded = decode_object(encode_object(field))
+    assert isinstance(decoded, CompositeField)
+    assert encode_object(decoded) == encode_object(field)
+    for class_name in ("subprocess.Popen", "cloth.simulate.SpringMassGridSquare", "cloth.timeseries_extra.Schedule"):
+        with pytest.raises(ValueError):
+            decode_object({"class": class_name, "attributes": {}})
+    # allowed modules, but not a class
+    with pytest.raises(ValueError):
+        decode_object({"class": "cloth.force_field.composite_field.np", "attributes": {}})
@@ -0,0 +1,44 @@
+import numpy as np
+from cloth.drawables.square import Square
+from cloth.drawables.spring_mass_grid_square import SpringMassGridSquare
+from cloth.incidence import IncidenceOperator
+from cloth.workspace import Workspace
+
+
+def operators():
+    elements = Square.grid_elements(7)
+    springs = SpringMassGridSquare.grid_springs(7, ((1, 0), (0, 1), (1, 1), (0, 2)))
+    vertex_to_spring = IncidenceOperator.vertex_to_spring(springs, 49)
+    # unsorted rows with repeats, and rows without entries
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, 30, 200)
+    rows[rows % 7 == 3] = 0
+    return [
+        IncidenceOperator.vertex_to_element(elements, 49),
+        vertex_to_spring,
+        vertex_to_spring.absolute(),
+        vertex_to_spring.row_block(10, 30),
+        IncidenceOperator(rows, rng.integers(0, 40, 200), rng.standard_normal(200), (30, 40)),
+        IncidenceOperator(rows, rng.integers(0, 40, 200), None, (30, 40)),
+        IncidenceOperator(np.zeros(0, np.int64), np.zeros(0, np.int64), None, (5, 8)),
+    ]
+
+
+def test_matmul_matches_dense():
+    rng = np.random.default_rng(1)
+    for operator in operators():
+        values = rng.standard_normal((operator.shape[1], 3)).astype(np.float32)
+        expected = operator.todense().astype(np.float64) @ values
+        np.testing.assert_allclose(operator @ values, expected, rtol=1e-5, atol=1e-5)
+        # into a strided out, reusing one workspace
+        out = np.full((operator.shape[0], 6), np.nan, dtype=np.float32)[:, ::2]
+        workspace = Workspace()
+        for _ in range(2):
+            operator.matmul(values, out=out, workspace=workspace)
+        np.testing.assert_allclose(out, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_arrays_round_trip():
+    for operator in operators():
+        restored = IncidenceOperator.from_arrays(operator.to_arrays("operator"), "operator", operator.shape)
+        np.testing.assert_array_equal(restored.todense(), operator.todense())
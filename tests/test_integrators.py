@@ -0,0 +1,68 @@
+import numpy as np
+from cloth.simulate import make_model
+
+# stiff springs at a large timestep: beyond explicit Euler's stability limit
+STIFFNESS = 5000.0
+DELTA_T_SECONDS = 0.1
+N_STEPS = 50
+
+
+def run(integrator: str, **integrator_kwargs):
+    model = make_model(n_points_per_side=10, integrator=integrator, integrator_kwargs=integrator_kwargs, uniform_spring_stiffness=STIFFNESS)
+    with np.errstate(all="ignore"):
+        for i in range(N_STEPS):
+            model.update(DELTA_T_SECONDS * (i + 1))
+    return model
+
+
+def max_strain(model) -> float:
+    ends = model.spring_end_points
+    lengths = np.linalg.norm(model.vertices[ends[:, 1]] - model.vertices[ends[:, 0]], axis=1)
+    return float(np.abs(lengths / model.spring_resting_lengths[:, 0] - 1.0).max())
+
+
+def assert_stable(model, strain_tolerance: float):
+    assert np.isfinite(model.vertices).all() and np.isfinite(model.velocity).all()
+    # the cloth hangs from its fixed corners instead of flying off
+    assert np.abs(model.vertices).max() < 1.0
+    assert max_strain(model) < strain_tolerance
+
+
+def test_explicit_euler_blows_up():
+    model = run("explicit_euler")
+    assert not np.isfinite(model.vertices).all()
+
+
+def test_implicit_euler_is_stable():
+    model = run("implicit_euler")
+    assert_stable(model, 0.05)
+
+
+def test_conjugate_gradient_solves_to_tolerance():
+    model = run("implicit_euler", tolerance=1e-6, max_iterations=500)
+    integrator = model.integrator
+    rng = np.random.default_rng(0)
+    jacobian_product, stiffness_diagonal = integrator.spring_jacobian_product(model)
+    mass_term = model.mass + DELTA_T_SECONDS * model.damping_force_coefficient
+
+    def system_product(p):
+        return mass_term * p - DELTA_T_SECONDS**2 * jacobian_product(p)
+
+    rhs = rng.standard_normal(model.vertices.shape).astype(np.float32)
+    solution = integrator.conjugate_gradient(system_product, rhs, mass_term + DELTA_T_SECONDS**2 * stiffness_diagonal)
+    assert integrator.last_iterations < integrator.max_iterations
+    assert np.linalg.norm(system_product(solution) - rhs) <= 1e-4 * np.linalg.norm(rhs)
+
+
+def test_position_based_is_stable():
+    assert_stable(run("position_based"), 0.05)
+    assert_stable(run("position_based", batching="jacobi"), 0.2)
+
+
+def test_position_based_colors_share_no_vertex():
+    model = run("position_based")
+    colors = model.integrator.colors
+    assert np.array_equal(np.sort(np.concatenate(colors)), np.arange(model.spring_end_points.shape[0]))
+    for springs in colors:
+        ends = model.spring_end_points[springs].reshape(-1)
+        assert np.unique(ends).shape[0] == ends.shape[0]
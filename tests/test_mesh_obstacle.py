@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pytest
+from cloth.geometry.bvh import BVH
+from cloth.geometry.triangle_mesh import closest_points_on_triangles
+from cloth.simulate import make_model
+
+ICOSPHERE = {"obj_path": os.path.join(os.path.dirname(__file__), os.pardir, "icosphere.obj"), "scale": 0.12, "translation": [0.0, -0.2, 0.08]}
+
+
+def closest_points_brute_force(points: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray, n: int = 200) -> np.ndarray:
+    """ The nearest of a barycentric grid of (n + 1)(n + 2) / 2 points on each triangle, corners and edges included """
+    u, v = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing="ij")
+    on_triangle = u + v <= n
+    u, v = u[on_triangle] / n, v[on_triangle] / n  # G
+    samples = a[:, None] + u[None, :, None] * (b - a)[:, None] + v[None, :, None] * (c - a)[:, None]  # P, G, 3
+    nearest = np.argmin(np.linalg.norm(samples - points[:, None], axis=2), axis=1)  # P
+    return samples[np.arange(points.shape[0]), nearest]
+
+
+def test_closest_points_in_every_voronoi_region():
+    a, b, c = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32)
+    points_and_expected = [
+        ([-1.0, -1.0, 0.5], [0.0, 0.0, 0.0]),  # vertex a
+        ([2.0, -0.5, -0.5], [1.0, 0.0, 0.0]),  # vertex b
+        ([-0.5, 2.0, 0.3], [0.0, 1.0, 0.0]),  # vertex c
+        ([0.5, -1.0, 0.2], [0.5, 0.0, 0.0]),  # edge ab
+        ([-1.0, 0.25, -0.2], [0.0, 0.25, 0.0]),  # edge ac
+        ([1.0, 1.0, 0.7], [0.5, 0.5, 0.0]),  # edge bc
+        ([0.2, 0.3, 1.0], [0.2, 0.3, 0.0]),  # face, above
+        ([0.1, 0.1, -2.0], [0.1, 0.1, 0.0]),  # face, below
+    ]
+    points = np.array([point for point, _ in points_and_expected], dtype=np.float32)
+    expected = np.array([closest for _, closest in points_and_expected], dtype=np.float32)
+    n_points = points.shape[0]
+    closest = closest_points_on_triangles(points, np.tile(a, (n_points, 1)), np.tile(b, (n_points, 1)), np.tile(c, (n_points, 1)))
+    np.testing.assert_allclose(closest, expected, atol=1e-6)
+
+
+def test_closest_points_match_brute_force():
+    rng = np.random.default_rng(0)
+    n_points = 300
+    a, b, c = rng.standard_normal((3, n_points, 3)).astype(np.float32)
+    points = (2.0 * rng.standard_normal((n_points, 3))).astype(np.float32)
+    closest = closest_points_on_triangles(points, a, b, c)
+    brute_force = closest_points_brute_force(points, a, b, c)
+    distance = np.linalg.norm(points - closest, axis=1)
+    brute_force_distance = np.linalg.norm(points - brute_force, axis=1)
+    # never farther than the best grid point, and the grid is within half a cell of any point on the triangle
+    assert np.all(distance <= brute_force_distance + 1e-5)
+    np.testing.assert_allclose(closest, brute_force, atol=0.03)
+
+
+@pytest.mark.parametrize("build", [BVH.build_lbvh, BVH.build_binned_sah])
+def test_overlap_pairs_match_all_pairs(build):
+    rng = np.random.default_rng(1)
+    lower = rng.uniform(-1.0, 1.0, size=(500, 3)).astype(np.float32)
+    upper = lower + rng.uniform(0.0, 0.1, size=(500, 3)).astype(np.float32)
+    query_lower = rng.uniform(-1.0, 1.0, size=(200, 3)).astype(np.float32)
+    query_upper = query_lower + rng.uniform(0.0, 0.3, size=(200, 3)).astype(np.float32)
+    bvh = build(lower, upper, leaf_size=4)
+    queries, primitives = bvh.overlap_pairs(query_lower, query_upper)
+    pairs = set(zip(queries.tolist(), primitives.tolist()))
+    assert len(pairs) == queries.shape[0]
+    overlap = np.all((query_lower[:, None] <= upper[None]) & (query_upper[:, None] >= lower[None]), axis=2)  # Q, N
+    expected = set(zip(*(indices.tolist() for indices in np.nonzero(overlap))))
+    assert expected
+    assert pairs == expected
+
+
+def test_cloth_dropped_on_icosphere_stays_outside():
+    model = make_model(n_points_per_side=12, obstacles=[ICOSPHERE])
+    obstacle = model.obstacles[0]
+    n_contacts = 0
+    for i in range(300):
+        model.update(0.01 * (i + 1))
+        n_contacts += obstacle.last_contacts
+    assert n_contacts > 0
+    # the icosphere is convex: a point is inside when it is behind every face
+    signed_distance = np.einsum("vfk,fk->vf", model.vertices[:, None] - obstacle.triangles[None, :, 0], obstacle.face_normals)  # V, F
+    assert np.all(signed_distance.max(axis=1) > 0)
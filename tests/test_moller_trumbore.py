@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import pytest
+from cloth.geometry.triangle_mesh import TriangleMesh, load_obj
+from cloth.ray_tracing.intersect import TriangleSet, intersect_brute_force, moller_trumbore_pairs
+
+ICOSPHERE_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "icosphere.obj")
+# vertices 0, 1, 2 at the origin, x and y: barycentrics of (x, y, 0) are (1 - x - y, x, y)
+TRIANGLE = TriangleMesh(
+    vertices=np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32),
+    faces=np.array([[0, 1, 2]], dtype=np.int64),
+)
+# origin, direction, expected depth (inf for a miss), expected barycentrics
+RAYS = {
+    "front": ([0.2, 0.3, 1.0], [0.0, 0.0, -1.0], 1.0, [0.5, 0.2, 0.3]),
+    "oblique": ([0.0, 0.0, 1.0], [0.25, 0.25, -1.0], 1.0, [0.5, 0.25, 0.25]),
+    "long_direction": ([0.2, 0.3, 1.0], [0.0, 0.0, -4.0], 0.25, [0.5, 0.2, 0.3]),
+    "backface": ([0.2, 0.3, -2.0], [0.0, 0.0, 1.0], 2.0, [0.5, 0.2, 0.3]),
+    "edge_01": ([0.5, 0.0, 1.0], [0.0, 0.0, -1.0], 1.0, [0.5, 0.5, 0.0]),
+    "edge_12": ([0.5, 0.5, 1.0], [0.0, 0.0, -1.0], 1.0, [0.0, 0.5, 0.5]),
+    "parallel_in_plane": ([-1.0, 0.2, 0.0], [1.0, 0.0, 0.0], np.inf, [0.0, 0.0, 0.0]),
+    "parallel_above": ([-1.0, 0.2, 0.5], [1.0, 0.0, 0.0], np.inf, [0.0, 0.0, 0.0]),
+    "miss_outside": ([0.8, 0.8, 1.0], [0.0, 0.0, -1.0], np.inf, [0.0, 0.0, 0.0]),
+    "miss_behind_origin": ([0.2, 0.3, 1.0], [0.0, 0.0, 1.0], np.inf, [0.0, 0.0, 0.0]),
+}
+
+
+@pytest.mark.parametrize("name", list(RAYS))
+def test_single_triangle_hits(name):
+    origin, direction, depth, barycentrics = RAYS[name]
+    hits = intersect_brute_force(
+        TriangleSet.from_mesh(TRIANGLE),
+        np.array([origin], dtype=np.float32),
+        np.array([direction], dtype=np.float32),
+    )
+    assert hits.depth[0] == pytest.approx(depth, abs=1e-6)
+    assert hits.face[0] == (-1 if np.isinf(depth) else 0)
+    np.testing.assert_allclose(hits.barycentrics[0], barycentrics, atol=1e-6)
+
+    # the per-pair form used by BVH traversal agrees
+    t, u, v = moller_trumbore_pairs(
+        np.array([origin], dtype=np.float32), np.array([direction], dtype=np.float32), TriangleSet.from_mesh(TRIANGLE), np.zeros(1, dtype=np.int64),
+    )
+    assert t[0] == pytest.approx(depth, abs=1e-6)
+    if np.isfinite(depth):
+        np.testing.assert_allclose([1.0 - u[0] - v[0], u[0], v[0]], barycentrics, atol=1e-6)
+
+
+@pytest.mark.parametrize("max_pairs", [1, 7, 500])
+def test_chunking_does_not_change_hits(max_pairs):
+    triangles = TriangleSet.from_mesh(load_obj(ICOSPHERE_PATH))
+    rng = np.random.default_rng(0)
+    # from outside the unit sphere, aimed at points around it so that some rays miss
+    origins = rng.standard_normal((300, 3))
+    origins = (3.0 * origins / np.linalg.norm(origins, axis=1, keepdims=True)).astype(np.float32)
+    directions = (rng.uniform(-1.5, 1.5, size=(300, 3)) - origins).astype(np.float32)
+    expected = intersect_brute_force(triangles, origins, directions)
+    assert expected.hit.any() and not expected.hit.all()
+    chunked = intersect_brute_force(triangles, origins, directions, max_pairs=max_pairs)
+    np.testing.assert_array_equal(chunked.face, expected.face)
+    # BLAS picks other kernels for other block shapes, so only the last bit of the matmuls may change
+    np.testing.assert_allclose(chunked.depth, expected.depth, rtol=1e-6)
+    np.testing.assert_allclose(chunked.barycentrics, expected.barycentrics, atol=1e-5)
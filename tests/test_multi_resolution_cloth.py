@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from cloth.drawables.multi_resolution_cloth import MultiResolutionCloth, grid_prolongation
+from cloth.incidence import IncidenceOperator
+
+
+class Camera:
+    def __init__(self, pos: np.ndarray):
+        self.pos = pos
+
+
+@pytest.mark.parametrize("interpolation", ["cubic", "linear"])
+def test_prolongation_reproduces_coarse_vertices(interpolation):
+    n_coarse, factor = 5, 4
+    n_fine = factor * (n_coarse - 1) + 1
+    prolongation = IncidenceOperator.from_arrays(grid_prolongation(n_fine, n_coarse, interpolation), "prolongation", (n_fine**2, n_coarse**2))
+    coarse = np.random.default_rng(0).standard_normal((n_coarse**2, 3)).astype(np.float32)
+    fine = prolongation @ coarse
+    # fine vertex (factor i, factor j) sits on coarse vertex (i, j)
+    rows, columns = np.divmod(np.arange(n_coarse**2), n_coarse)
+    np.testing.assert_array_equal(fine[factor * rows * n_fine + factor * columns], coarse)
+
+
+def test_prolongation_keeps_a_flat_grid_flat():
+    n_fine, n_coarse = 13, 4
+    prolongation = IncidenceOperator.from_arrays(grid_prolongation(n_fine, n_coarse), "prolongation", (n_fine**2, n_coarse**2))
+    # an affine function of the grid coordinates is interpolated exactly, including next to the edges
+    def plane(n):
+        rows, columns = np.divmod(np.arange(n**2), n)
+        u, v = rows / (n - 1), columns / (n - 1)
+        return np.stack((u, v, 0.3 * u - 0.2 * v + 0.1), axis=1).astype(np.float32)
+
+    np.testing.assert_allclose(prolongation @ plane(n_coarse), plane(n_fine), atol=1e-6)
+
+
+def test_level_selection_has_hysteresis():
+    cloth = MultiResolutionCloth(side=0.5, n_points_per_side=5, render_points_per_side=(17, 9), lod_distances=(2.5,), lod_hysteresis=0.1)
+    centroid = cloth.vertices.mean(axis=0)
+    assert cloth.select_level() == 0  # no camera
+    cloth.camera = Camera(centroid)
+    levels = []
+    # away from the cloth and back: a level is only left 10% past the 2.5 threshold, at 2.75 and 2.25
+    for distance in (2.4, 2.6, 2.8, 2.6, 2.4, 2.2, 2.4):
+        cloth.camera.pos = centroid + np.array([0.0, 0.0, distance], dtype=np.float32)
+        # as update_vertices_buffer does
+        cloth.level_index = cloth.select_level()
+        levels.append(cloth.level_index)
+    assert levels == [0, 0, 1, 1, 1, 0, 0]
@@ -0,0 +1,45 @@
+import os
+import numpy as np
+import cloth.ray_tracing.progressive as progressive
+from cloth.geometry.triangle_mesh import load_obj
+from cloth.ray_tracing.progressive import ProgressiveRenderer
+
+ICOSPHERE_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "icosphere.obj")
+
+
+def test_stops_at_max_samples_with_exact_running_statistics(monkeypatch):
+    # every sample shaded, per pass: (active pixels, samples_per_pass)
+    passes = []
+    progressive_shade = progressive.shade
+
+    def recording_shade(*args, **kwargs):
+        samples = progressive_shade(*args, **kwargs)
+        passes.append(samples.reshape(-1, 4).astype(np.float64))
+        return samples
+
+    monkeypatch.setattr(progressive, "shade", recording_shade)
+    # a zero tolerance never converges, so every pixel runs to max_samples
+    renderer = ProgressiveRenderer(load_obj(ICOSPHERE_PATH, scale=0.75), 16, 12, samples_per_pass=4, min_samples=4, max_samples=12, tolerance=0.0)
+    renderer.render(max_passes=100)
+    assert renderer.n_passes == 3
+    assert not renderer.active.any()
+    assert np.all(renderer.n_samples == 12)
+
+    samples = np.concatenate(passes, axis=1)  # P, 12
+    # silhouette pixels have samples on and off the sphere, so not every variance is 0
+    assert np.any(samples.std(axis=1) > 0)
+    mean = samples.mean(axis=1)
+    np.testing.assert_allclose(renderer.mean, mean, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(renderer.squared_deviations, np.sum((samples - mean[:, None]) ** 2, axis=1), rtol=1e-10, atol=1e-15)
+    np.testing.assert_allclose(renderer.standard_error(), samples.std(axis=1, ddof=1) / np.sqrt(12), rtol=1e-6, atol=1e-15)
+
+
+def test_flat_pixels_stop_at_min_samples():
+    renderer = ProgressiveRenderer(load_obj(ICOSPHERE_PATH, scale=0.75), 16, 12, samples_per_pass=4, min_samples=8, max_samples=64)
+    renderer.render()
+    assert not renderer.active.any()
+    # pixels missing the sphere only ever see 0: they converge as soon as they may
+    background = renderer.mean == 0
+    assert background.any()
+    assert np.all(renderer.n_samples[background] == 8)
+    assert renderer.n_samples.max() > 8
@@ -0,0 +1,58 @@
+import numpy as np
+from cloth.collision.spatial_hash import SpatialHashGrid
+from cloth.simulate import make_model
+
+
+def close_pairs(points: np.ndarray, distance: float, reference: np.ndarray = None):
+    """ All pairs (i < j) closer than distance, by brute force; with reference, only pairs at least distance apart there """
+    first, second = np.triu_indices(points.shape[0], 1)
+    close = np.linalg.norm(points[second] - points[first], axis=1) < distance
+    if reference is not None:
+        close &= np.linalg.norm(reference[second] - reference[first], axis=1) >= distance
+    return set(zip(first[close].tolist(), second[close].tolist()))
+
+
+def test_candidate_pairs_contain_every_close_pair():
+    rng = np.random.default_rng(0)
+    # around the origin, so cells with negative coordinates are hashed too
+    points = rng.uniform(-0.5, 0.5, size=(400, 3)).astype(np.float32)
+    cell_size = 0.1
+    grid = SpatialHashGrid(cell_size)
+    grid.build(points)
+    first, second = grid.candidate_pairs()
+    assert np.all(first < second)
+    candidates = set(zip(first.tolist(), second.tolist()))
+    # no pair twice
+    assert len(candidates) == first.shape[0]
+    expected = close_pairs(points, cell_size)
+    assert expected
+    assert expected <= candidates
+
+
+def folded_model():
+    """ The bottom half of the cloth folded onto the top half, half a thickness above it """
+    model = make_model(n_points_per_side=10, self_collision_kwargs={})
+    thickness = model.self_collision.thickness
+    vertices = model.vertices
+    bottom = vertices[:, 1] < 0
+    vertices[bottom, 1] = -vertices[bottom, 1]
+    vertices[bottom, 2] += 0.5 * thickness
+    return model
+
+
+def test_folded_cloth_is_pushed_apart():
+    model = folded_model()
+    self_collision = model.self_collision
+    assert close_pairs(model.vertices, self_collision.thickness, self_collision.rest_vertices)
+    self_collision.apply(model)
+    assert self_collision.last_contacts > 0
+    assert not close_pairs(model.vertices, self_collision.thickness, self_collision.rest_vertices)
+
+
+def test_fixed_vertices_stay_pinned():
+    model = folded_model()
+    # the fixed top corners are under folded vertices
+    fixed = model.vertices[model.fixed_vertices].copy()
+    model.self_collision.apply(model)
+    assert model.self_collision.last_contacts > 0
+    np.testing.assert_array_equal(model.vertices[model.fixed_vertices], fixed)
@@ -0,0 +1,31 @@
+import os
+import numpy as np
+from cloth.geometry.triangle_mesh import load_obj
+from cloth.ray_tracing.render import camera_rays, render
+from cloth.ray_tracing.tiled import TiledRenderer, image_tiles
+
+ICOSPHERE_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "icosphere.obj")
+
+
+def test_image_tiles_cover_the_image_once():
+    coverage = np.zeros((37, 50), dtype=np.int64)
+    for row_start, row_end, column_start, column_end in image_tiles(50, 37, 16):
+        coverage[row_start:row_end, column_start:column_end] += 1
+    assert np.all(coverage == 1)
+
+
+def test_tiled_matches_single_process(tmp_path):
+    # neither side is a multiple of the tile size, so the last row and column of tiles are partial
+    width, height = 50, 37
+    mesh = load_obj(ICOSPHERE_PATH, scale=0.75)
+    expected = render(mesh, *camera_rays(width, height), accelerator="sah")
+    assert expected.hit.any() and not expected.hit.all()
+    tiles = []
+    with TiledRenderer(mesh, accelerator="sah", n_workers=2, tile_size=16, scratch_dir=str(tmp_path)) as renderer:
+        hits = renderer.render(width, height, on_tile=lambda tile, tile_hits: tiles.append(tile))
+    assert sorted(tiles) == sorted(image_tiles(width, height, 16))
+    np.testing.assert_array_equal(hits.depth, expected.depth)
+    np.testing.assert_array_equal(hits.face, expected.face)
+    np.testing.assert_array_equal(hits.barycentrics, expected.barycentrics)
+    # the scratch files are gone
+    assert os.listdir(tmp_path) == []